@@ -0,0 +1,156 @@
+# batch_recommendations.py
+"""
+Recommendations for many users at once, e.g. for nightly digest emails
+
+Run offline from the repository root (reads the saved index snapshot):
+    python -m batch_recommendations --output digests.jsonl [--user-id alice --user-id bob]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+
+import numpy as np
+
+from bm25_index import keyword_query
+from database import RECOMMENDATION_PROJECTION, decode_embedding
+from config import BATCH_SEARCH_SIZE, HYBRID_SEARCH_ENABLED, LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+async def user_context_batches(collection, user_ids, batch_size, projection=RECOMMENDATION_PROJECTION):
+    """
+    Yield lists of up to `batch_size` user contexts read through a single cursor
+
+    Args:
+        collection: Motor collection of user contexts
+        user_ids: Users to read, or None for every user
+        batch_size: Contexts per yielded list, also the cursor batch size
+        projection: Fields to read
+    """
+    query = {"user_id": {"$in": list(user_ids)}} if user_ids is not None else {}
+    batch = []
+    async for user_data in collection.find(query, projection, batch_size=batch_size):
+        batch.append(user_data)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _search(index, user_contexts, k):
+    """Top-k jobs for each user from one batched index search"""
+    embeddings = np.stack([decode_embedding(user_data["embedding"]) for user_data in user_contexts])
+    if HYBRID_SEARCH_ENABLED:
+        return index.hybrid_search_batch(embeddings, [keyword_query(u) for u in user_contexts], k=k)
+    return index.search_batch(embeddings, k=k)
+
+async def recommend_users(user_ids, collection, index, context_manager, dispatcher, pool=None,
+                          k=10, batch_size=BATCH_SEARCH_SIZE):
+    """
+    Recommend jobs to many users, yielding each user's result as soon as it is ready
+
+    User contexts are read with one Mongo cursor. Each batch of
+    `batch_size` users gets a single FAISS search over their stacked
+    embeddings. Claude's analyses then run through `dispatcher`, which
+    bounds concurrency and backs off on rate limits. Results come back in
+    completion order, not input order.
+
+    Args:
+        user_ids: Users to recommend for, or None for every user with a saved context
+        collection: Motor collection of user contexts
+        index: JobIndex to search
+        context_manager: ContextManager producing the analyses
+        dispatcher: LLMDispatcher the analysis calls go through
+        pool: WorkerPool to run searches on, or None for a plain thread
+        k: Jobs per user
+
+    Yields:
+        Dicts with user_id and either recommendations + claude_analysis, or error
+    """
+    pending = set()
+    found = set()
+
+    async def analyse(user_data, jobs):
+        try:
+            # The dispatcher does the retrying, so the client must not retry as well
+            result = await dispatcher.run(
+                context_manager.get_personalized_recommendations, user_context=user_data, job_listings=jobs,
+                max_retries=0
+            )
+            return dict(result, user_id=user_data["user_id"])
+        except Exception as e:
+            logger.error(f"Error generating recommendations for {user_data['user_id']}: {str(e)}")
+            return {"user_id": user_data["user_id"], "error": str(e)}
+
+    try:
+        async for user_contexts in user_context_batches(collection, user_ids, batch_size):
+            found.update(user_data["user_id"] for user_data in user_contexts)
+            if pool is not None:
+                results = await pool.run(_search, index, user_contexts, k)
+            else:
+                results = await asyncio.to_thread(_search, index, user_contexts, k)
+            for user_data, hits in zip(user_contexts, results):
+                pending.add(asyncio.create_task(analyse(user_data, [job for _, job in hits])))
+
+            # Hand back whatever has finished, and stop reading users while a
+            # full batch is still waiting on Claude so memory stays bounded
+            while pending:
+                done = {task for task in pending if task.done()}
+                if not done and len(pending) < batch_size:
+                    break
+                if not done:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                pending -= done
+                for task in done:
+                    yield task.result()
+
+        for user_id in user_ids or ():
+            if user_id not in found:
+                yield {"user_id": user_id, "error": "User context not found"}
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # The consumer went away (e.g. the client disconnected): stop calling Claude for it
+        for task in pending:
+            task.cancel()
+
+async def _write_digests(args):
+    from context_manager import ContextManager, create_response_cache
+    from config import FAISS_INDEX_DIR
+    from database import user_context_collection
+    from faiss_index import job_index
+    from llm_dispatcher import LLMDispatcher
+
+    if not job_index.load(FAISS_INDEX_DIR):
+        raise SystemExit(f"No index snapshot in {FAISS_INDEX_DIR}, run the job refresher first")
+    context_manager = ContextManager(api_key=os.environ.get("ANTHROPIC_API_KEY"), cache=create_response_cache())
+    dispatcher = LLMDispatcher(args.concurrency, LLM_MAX_RETRIES)
+
+    succeeded = failed = 0
+    with open(args.output, "w") as f:
+        async for result in recommend_users(
+            args.user_id, user_context_collection, job_index, context_manager, dispatcher, k=args.k
+        ):
+            f.write(json.dumps(result) + "\n")
+            if "error" in result:
+                failed += 1
+            else:
+                succeeded += 1
+    logger.info(f"Wrote {succeeded} digests to {args.output} ({failed} failed)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True, help="JSON Lines file to write one result per user to")
+    parser.add_argument("--user-id", action="append", help="user to include (repeatable); default is every user")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=LLM_MAX_CONCURRENCY, help="concurrent Claude calls")
+    args = parser.parse_args()
+    asyncio.run(_write_digests(args))
+
+if __name__ == "__main__":
+    main()
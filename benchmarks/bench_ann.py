@@ -0,0 +1,89 @@
+# benchmarks/bench_ann.py
+"""
+Compare FAISS index types on a synthetic corpus
+
+Measures recall@k against the exact flat index, single-query p50/p99
+latency and serialized bytes per vector for each operating point, so the
+FAISS_INDEX_TYPE / nprobe / efSearch settings in config.py can be picked
+with numbers.
+
+Run from the repository root:
+    python -m benchmarks.bench_ann --n 100000 --queries 500 --k 10
+"""
+import argparse
+
+import faiss
+import numpy as np
+
+from benchmarks.common import synthetic_vectors, latency_summary, timed, write_results
+from faiss_index import create_faiss_index, train_faiss_index, normalize, _search_params
+
+def recall_at_k(approx_ids, exact_ids, k):
+    """Fraction of the exact top-k found in the approximate top-k, averaged over queries"""
+    hits = sum(len(set(a[:k]) & set(e[:k])) for a, e in zip(approx_ids, exact_ids))
+    return hits / (len(exact_ids) * k)
+
+def run_operating_point(index, index_type, queries, exact_ids, k, nprobe=None, ef_search=None):
+    params = _search_params(index_type, nprobe, ef_search)
+    found = []
+    durations = []
+    for query in queries:
+        (_, ids), elapsed = timed(index.search, query.reshape(1, -1), k, params=params)
+        found.append(ids[0])
+        durations.append(elapsed)
+    result = {"index_type": index_type, "nprobe": nprobe, "ef_search": ef_search}
+    result["recall_at_k"] = recall_at_k(found, exact_ids, k)
+    result.update(latency_summary(durations))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100000, help="corpus size")
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+
+    # Draw queries from the same clusters as the corpus
+    # and normalize them, as JobIndex does, so scores are cosine similarities
+    vectors = normalize(synthetic_vectors(args.n + args.queries, args.dimension, seed=0))
+    corpus, queries = vectors[:args.n], vectors[args.n:]
+
+    results = []
+    exact_ids = None
+    for index_type in ("flat", "hnsw", "ivfpq"):
+        index = create_faiss_index(index_type, args.dimension, nlist=min(args.nlist, max(1, args.n // 39)))
+        train_seconds = 0.0
+        if not index.is_trained:
+            _, train_seconds = timed(train_faiss_index, index, corpus)
+        _, add_seconds = timed(index.add, corpus)
+        bytes_per_vector = len(faiss.serialize_index(index)) / args.n
+        print(f"{index_type}: trained in {train_seconds:.1f}s, added in {add_seconds:.1f}s, "
+              f"{bytes_per_vector:.0f} bytes/vector")
+
+        if index_type == "flat":
+            _, exact_ids = index.search(queries, args.k)
+            points = [{}]
+        elif index_type == "hnsw":
+            points = [{"ef_search": ef} for ef in args.ef_search]
+        else:
+            points = [{"nprobe": nprobe} for nprobe in args.nprobe]
+
+        for point in points:
+            result = run_operating_point(index, index_type, queries, exact_ids, args.k, **point)
+            result.update({
+                "build_seconds": train_seconds + add_seconds,
+                "bytes_per_vector": bytes_per_vector
+            })
+            results.append(result)
+            print(f"  {point or 'exact'}: recall@{args.k}={result['recall_at_k']:.3f} "
+                  f"p50={result['p50_ms']:.3f}ms p99={result['p99_ms']:.3f}ms")
+
+    write_results(args.output, {"n": args.n, "dimension": args.dimension, "k": args.k, "results": results})
+
+if __name__ == "__main__":
+    main()
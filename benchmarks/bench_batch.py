@@ -0,0 +1,109 @@
+# benchmarks/bench_batch.py
+"""
+Measure batch recommendation throughput against one request per user
+
+Runs the same users through two paths and reports users per second:
+- sequential: what calling /recommendations/{user_id} once per user does,
+  a Mongo lookup, a single-row FAISS search and a Claude call per user
+- batch: `recommend_users`, with one cursor, one FAISS search per batch
+  and Claude calls dispatched concurrently through LLMDispatcher
+Mongo and Claude are in-memory stand-ins with configurable latency; the
+Claude stand-in also enforces a requests-per-second limit with 429s.
+
+Run from the repository root:
+    python -m benchmarks.bench_batch --users 500 --n 50000 --llm-latency 0.2
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from batch_recommendations import recommend_users
+from benchmarks.bench_filtered import build_index
+from benchmarks.common import synthetic_jobs, synthetic_vectors, write_results
+from benchmarks.stand_ins import FakeCollection, StubAnthropic
+from context_manager import ContextManager
+from faiss_index import normalize
+from llm_dispatcher import LLMDispatcher
+
+async def sequential(user_ids, collection, index, context_manager, k):
+    for user_id in user_ids:
+        user_data = await collection.find_one({"user_id": user_id}, {"_id": 0})
+        hits = await asyncio.to_thread(index.search, np.array(user_data["embedding"], dtype=np.float32), k)
+        await context_manager.get_personalized_recommendations(user_data, [job for _, job in hits])
+
+async def batched(user_ids, collection, index, context_manager, dispatcher, k, batch_size):
+    first = None
+    start = time.perf_counter()
+    count = 0
+    async for result in recommend_users(user_ids, collection, index, context_manager, dispatcher, k=k,
+                                        batch_size=batch_size):
+        assert "error" not in result, result
+        first = first or time.perf_counter() - start
+        count += 1
+    return count, first
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--n", type=int, default=50000, help="jobs in the index")
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--mongo-latency", type=float, default=0.001, help="seconds per Mongo round trip")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per Claude call")
+    parser.add_argument("--rate-limit", type=int, default=50, help="Claude requests per second, 0 for none")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--sequential-users", type=int, default=50,
+                        help="users to time on the sequential path (it is slow)")
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+
+    jobs = synthetic_jobs(args.n)
+    vectors = normalize(synthetic_vectors(args.n + args.users, args.dimension, seed=0))
+    index = build_index(args.index_type, jobs, vectors[:args.n])
+    users = [
+        {"user_id": f"user-{i}", "skills": ["python", "kafka"], "preferences": "backend platform",
+         "embedding": vectors[args.n + i].tolist()}
+        for i in range(args.users)
+    ]
+    collection = FakeCollection(users, args.mongo_latency)
+    user_ids = [user["user_id"] for user in users]
+
+    client = StubAnthropic(args.llm_latency, args.rate_limit)
+    context_manager = ContextManager(api_key=None, client=client, cache=None)
+
+    subset = user_ids[:args.sequential_users]
+    start = time.perf_counter()
+    asyncio.run(sequential(subset, collection, index, context_manager, args.k))
+    sequential_rate = len(subset) / (time.perf_counter() - start)
+    print(f"sequential: {sequential_rate:.1f} users/s over {len(subset)} users")
+
+    async def run_batch():
+        dispatcher = LLMDispatcher(args.concurrency, max_retries=20)
+        result = await batched(user_ids, collection, index, context_manager, dispatcher, args.k, args.batch_size)
+        return result, dispatcher.stats()
+
+    client.messages.rejected = 0
+    start = time.perf_counter()
+    (count, first_seconds), dispatch_stats = asyncio.run(run_batch())
+    batch_rate = count / (time.perf_counter() - start)
+    print(f"batch: {batch_rate:.1f} users/s over {count} users, first result after {first_seconds * 1000:.0f}ms, "
+          f"{dispatch_stats['rate_limited']} rate-limited calls retried")
+
+    write_results(args.output, {
+        "users": args.users,
+        "llm_latency": args.llm_latency,
+        "rate_limit": args.rate_limit,
+        "concurrency": args.concurrency,
+        "sequential_users_per_second": sequential_rate,
+        "batch_users_per_second": batch_rate,
+        "batch_first_result_seconds": first_seconds,
+        "rate_limited_calls": dispatch_stats["rate_limited"],
+        "speedup": batch_rate / sequential_rate
+    })
+
+if __name__ == "__main__":
+    main()
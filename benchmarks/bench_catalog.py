@@ -0,0 +1,84 @@
+# benchmarks/bench_catalog.py
+"""
+Compare the memory of the job catalog with a list/dict of job dicts
+
+Builds the same synthetic corpus both ways and reports bytes per job
+(traced Python allocations) and lookup latency by job ID. The dict
+baseline is round-tripped through JSON so that, as with postings decoded
+from API responses or a snapshot, every string is its own object.
+For the catalog, the heap is measured after a save/load so descriptions
+come from the memory-mapped blob file, as they do in the server; the
+blob's size on disk is reported separately.
+
+Run from the repository root:
+    python -m benchmarks.bench_catalog --n 100000
+"""
+import argparse
+import gc
+import json
+import random
+import tempfile
+import tracemalloc
+
+from benchmarks.common import synthetic_jobs, latency_summary, timed, write_results
+from job_catalog import JobCatalog
+
+def traced_bytes(build):
+    """Return (object, bytes allocated while building it and still alive)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+def lookup_latency(store, ids):
+    return latency_summary([timed(store.__getitem__, job_id)[1] for job_id in ids])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+
+    payload = json.dumps(synthetic_jobs(args.n))
+    ids = random.Random(1).choices(range(1, args.n + 1), k=args.lookups)
+
+    dicts, dict_bytes = traced_bytes(lambda: {job["job_id"]: job for job in json.loads(payload)})
+    dict_lookup = lookup_latency(dicts, ids)
+    del dicts
+
+    with tempfile.TemporaryDirectory() as directory:
+        catalog = JobCatalog.from_jobs(json.loads(payload))
+        rows, blob_size = catalog.save(directory)
+        JobCatalog.commit_save(directory)
+        del catalog
+        rows_payload = json.dumps(rows)
+        del rows
+        catalog, catalog_bytes = traced_bytes(
+            lambda: JobCatalog.load(directory, json.loads(rows_payload), blob_size)
+        )
+        catalog_lookup = lookup_latency(catalog, ids)
+        del catalog
+
+    results = {
+        "n": args.n,
+        "dict": dict(bytes_per_job=dict_bytes / args.n, **dict_lookup),
+        "catalog": dict(
+            bytes_per_job=catalog_bytes / args.n,
+            blob_bytes_per_job=blob_size / args.n,
+            **catalog_lookup
+        )
+    }
+    for name, result in (("dict", results["dict"]), ("catalog", results["catalog"])):
+        print(f"{name}: {result['bytes_per_job']:.0f} heap bytes/job, "
+              f"lookup p50={result['p50_ms'] * 1000:.1f}us p99={result['p99_ms'] * 1000:.1f}us")
+    print(f"catalog description blob: {results['catalog']['blob_bytes_per_job']:.0f} bytes/job on disk (mmap)")
+
+    write_results(args.output, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/bench_chunking.py
+"""
+Compare how long job descriptions are embedded: truncate, pooled or multi
+
+For each EMBEDDING_CHUNK_MODE measures embedding throughput (texts and
+tokens per second) and retrieval quality on long descriptions. Each query
+is a requirement phrase planted near the end of one description, past the
+512 tokens truncation keeps; recall@k is the share of queries whose
+description is in the top k. Scoring per mode:
+- truncate: one vector from the first MAX_LENGTH tokens
+- pooled: one vector per text from its windows, as `batch_get_embeddings` does
+- multi: one vector per window, a description scores as its best window
+
+Run from the repository root:
+    python -m benchmarks.bench_chunking --n 200 --queries 50 --k 10
+"""
+import argparse
+import random
+
+import numpy as np
+
+from benchmarks.common import synthetic_texts, timed, write_results
+from faiss_index import normalize
+import model as embedding_model
+from model import encode_chunks, encode_texts, pool_chunks
+
+MODES = ["truncate", "pooled", "multi"]
+SKILLS = [
+    "kubernetes", "terraform", "rust", "golang", "scala", "haskell", "elixir", "kotlin", "swift", "clojure",
+    "pytorch", "tensorflow", "spark", "flink", "snowflake", "cassandra", "elasticsearch", "graphql", "webassembly",
+    "solidity", "fortran", "cobol", "verilog", "matlab", "salesforce", "sap", "tableau", "unity", "unreal", "ros"
+]
+
+def planted_corpus(n, queries, min_words, max_words, seed=0):
+    """Long descriptions, `queries` of which end with a distinctive requirement phrase"""
+    rng = random.Random(seed)
+    texts = synthetic_texts(n, min_words=min_words, max_words=max_words, seed=seed)
+    phrases = []
+    targets = rng.sample(range(n), queries)
+    for target in targets:
+        skills = rng.sample(SKILLS, 3)
+        phrase = f"must have production experience with {skills[0]}, {skills[1]} and {skills[2]}"
+        words = texts[target].split()
+        # Plant it in the last tenth of the text, well past the first 512 tokens
+        at = rng.randint(int(len(words) * 0.9), len(words))
+        texts[target] = " ".join(words[:at] + phrase.split() + words[at:])
+        phrases.append(phrase)
+    return texts, phrases, targets
+
+def recall_at_k(scores, targets, k):
+    """Share of queries (rows of `scores`) whose target description ranks in the top k"""
+    top = np.argsort(-scores, axis=1)[:, :k]
+    return float(np.mean([target in row for row, target in zip(top, targets)]))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=200, help="descriptions in the corpus")
+    parser.add_argument("--queries", type=int, default=50, help="descriptions with a planted requirement")
+    parser.add_argument("--min-words", type=int, default=600)
+    parser.add_argument("--max-words", type=int, default=1500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+
+    texts, phrases, targets = planted_corpus(args.n, args.queries, args.min_words, args.max_words)
+    tokenizer, _ = embedding_model.load_model()
+    tokens = sum(len(ids) for ids in tokenizer(texts, add_special_tokens=False, verbose=False)["input_ids"])
+    query_vectors = normalize(encode_texts(phrases, args.batch_size))
+
+    # Warm up once so lazy initialization is not measured
+    encode_texts(texts[:args.batch_size], args.batch_size)
+
+    results = []
+    for mode in MODES:
+        if mode == "truncate":
+            vectors, seconds = timed(encode_texts, texts, args.batch_size)
+            scores = query_vectors @ normalize(vectors).T
+            vector_count = len(texts)
+        else:
+            (vectors, owners, lengths), seconds = timed(encode_chunks, texts, args.batch_size)
+            vector_count = len(vectors)
+            if mode == "pooled":
+                scores = query_vectors @ normalize(pool_chunks(vectors, owners, lengths, len(texts))).T
+            else:
+                window_scores = query_vectors @ normalize(vectors).T
+                scores = np.full((len(phrases), len(texts)), -np.inf, dtype=np.float32)
+                for i in range(len(phrases)):
+                    np.maximum.at(scores[i], owners, window_scores[i])
+
+        result = {
+            "mode": mode,
+            "texts_per_second": len(texts) / seconds,
+            "tokens_per_second": tokens / seconds,
+            "vectors": vector_count,
+            "recall_at_k": recall_at_k(scores, targets, args.k)
+        }
+        results.append(result)
+        print(f"{mode}: {result['texts_per_second']:.1f} texts/s, {result['tokens_per_second']:.0f} tokens/s, "
+              f"{vector_count} vectors, recall@{args.k}={result['recall_at_k']:.3f}")
+
+    write_results(args.output, {
+        "n": args.n,
+        "queries": args.queries,
+        "mean_tokens": tokens / len(texts),
+        "k": args.k,
+        "batch_size": args.batch_size,
+        "results": results
+    })
+
+if __name__ == "__main__":
+    main()
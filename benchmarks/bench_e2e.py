@@ -0,0 +1,242 @@
+# benchmarks/bench_e2e.py
+"""
+End-to-end benchmark of ingestion, indexing, search and the HTTP API, offline
+
+Everything external is replaced by a stand-in from benchmarks/stand_ins.py:
+the job APIs by a local HTTP stub, MongoDB by an in-memory collection,
+Claude by a stub with fixed latency, and bert-base-uncased by a tiny
+randomly initialised BERT (use --model to benchmark a real one). For each
+corpus size it measures:
+- fetch: pulling the corpus from the job API stub through job_fetcher
+- build: embedding and indexing it with JobIndex.upsert
+- search: p50/p99 of vector and hybrid search for synthetic users
+- materialize: precomputing every user's recommendations for the new index
+- load: /recommendations/{user_id} and /save_user_context/ latency and
+  throughput under --concurrency concurrent clients, plus the mean time
+  per instrumented stage reported by metrics.py
+- rss: resident memory after each phase
+Embedding throughput is measured once on its own.
+
+Results carry the commit they were produced at; compare two runs with
+benchmarks/compare.py. Large corpora spend most of their time embedding;
+--synthetic-vectors fills the index with clustered random vectors instead.
+
+Run from the repository root:
+    python -m benchmarks.bench_e2e --n 1000 10000 --output e2e-$(git rev-parse --short HEAD).json
+"""
+import argparse
+import asyncio
+import datetime
+import math
+import platform
+import random
+import subprocess
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks.bench_filtered import build_index
+from benchmarks.common import (
+    latency_summary, memory_mb, synthetic_jobs, synthetic_texts, synthetic_vectors, timed, write_results
+)
+from benchmarks.stand_ins import FakeCollection, JobAPIStub, StubAnthropic, build_tiny_model
+import config
+import database
+from config import EMBEDDING_DIMENSION, FAISS_INDEX_TYPE, JOB_FETCH_MAX_PAGES
+from faiss_index import JobIndex, job_index, normalize
+from job_fetcher import fetch_jobs_from_apis_async
+from metrics import REGISTRY
+import model as embedding_model
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def rss():
+    current, peak = memory_mb()
+    return {"rss_mb": current, "peak_rss_mb": peak}
+
+def bench_embedding(texts, batch_size):
+    embedding_model.batch_get_embeddings(texts[:batch_size], batch_size)  # load and warm up
+    _, seconds = timed(embedding_model.batch_get_embeddings, texts, batch_size)
+    return {"texts": len(texts), "texts_per_second": len(texts) / seconds}
+
+def bench_fetch(raw_jobs, api_latency):
+    # Pages big enough that each source's share fits in JOB_FETCH_MAX_PAGES
+    page_size = max(100, math.ceil(len(raw_jobs) / 4 / JOB_FETCH_MAX_PAGES))
+    with JobAPIStub(raw_jobs, api_latency, page_size) as stub:
+        config.JOB_API_URLS.update(stub.urls())
+        config.API_KEYS.update(jooble="bench", careerjet="bench")
+        start = time.perf_counter()
+        jobs = asyncio.run(fetch_jobs_from_apis_async(limit=len(raw_jobs)))
+        seconds = time.perf_counter() - start
+    return jobs, {"jobs": len(jobs), "requests": stub.requests, "seconds": seconds}
+
+def bench_build(jobs, index_type, synthetic):
+    if synthetic:
+        vectors = normalize(synthetic_vectors(len(jobs), EMBEDDING_DIMENSION, seed=1))
+        index, seconds = timed(build_index, index_type, jobs, vectors)
+    else:
+        index = JobIndex(EMBEDDING_DIMENSION, index_type)
+        _, seconds = timed(index.upsert, jobs)
+    return index, {"seconds": seconds, "jobs_per_second": len(jobs) / seconds}
+
+def bench_search(index, users, k):
+    embeddings = np.stack([user["embedding"] for user in users])
+    vector = [timed(index.search, embedding, k)[1] for embedding in embeddings]
+    hybrid = [
+        timed(index.hybrid_search, user["embedding"], f"{' '.join(user['skills'])} {user['preferences']}", k)[1]
+        for user in users
+    ]
+    return {"vector": latency_summary(vector), "hybrid": latency_summary(hybrid)}
+
+async def bench_load(users, requests, concurrency, write_fraction, seed):
+    # main is imported here, once database points at the stand-in collection
+    import main
+    await main.embedding_batcher.start()
+    rng = random.Random(seed)
+    durations = {"recommendations": [], "save_user_context": []}
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(client, user):
+        async with semaphore:
+            start = time.perf_counter()
+            if rng.random() < write_fraction:
+                kind = "save_user_context"
+                response = await client.post("/save_user_context/", params={
+                    "user_id": user["user_id"], "preferences": user["preferences"], "skills": user["skills"]
+                })
+            else:
+                kind = "recommendations"
+                response = await client.get(f"/recommendations/{user['user_id']}")
+            durations[kind].append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    before = REGISTRY.snapshot().get("stage_duration_seconds", {})
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(one(client, rng.choice(users)) for _ in range(requests)))
+            seconds = time.perf_counter() - start
+    finally:
+        await main.embedding_batcher.stop()
+
+    # Mean per stage over this run only; the registry accumulates across corpus sizes
+    stage_mean_ms = {}
+    for label, after in sorted(REGISTRY.snapshot().get("stage_duration_seconds", {}).items()):
+        previous = before.get(label, {"count": 0, "sum": 0.0})
+        if after["count"] > previous["count"]:
+            stage = label.split("=", 1)[1]
+            stage_mean_ms[stage] = (after["sum"] - previous["sum"]) / (after["count"] - previous["count"]) * 1000
+    return {
+        "requests_per_second": requests / seconds,
+        "status_counts": {str(status): count for status, count in sorted(statuses.items())},
+        "latency": {kind: latency_summary(samples) for kind, samples in durations.items() if samples},
+        "stage_mean_ms": stage_mean_ms
+    }
+
+def run_corpus(n, args, collection, llm_client):
+    result = {"n": n}
+    raw_jobs = synthetic_jobs(n, seed=args.seed)
+    for job in raw_jobs:
+        del job["job_id"]  # the fetcher derives IDs as it would for real postings
+
+    jobs, result["fetch"] = bench_fetch(raw_jobs, args.api_latency)
+    result["rss_after_fetch"] = rss()
+    index, result["build"] = bench_build(jobs, args.index_type, args.synthetic_vectors)
+    result["rss_after_build"] = rss()
+
+    preferences = synthetic_texts(args.users, max_words=60, seed=args.seed + 1)
+    if args.synthetic_vectors:
+        embeddings = normalize(synthetic_vectors(args.users, EMBEDDING_DIMENSION, seed=args.seed + 2))
+    else:
+        embeddings = embedding_model.batch_get_embeddings(preferences)
+    users = [
+        {"user_id": f"user-{i}", "skills": preferences[i].split()[:5], "preferences": preferences[i],
+         "location": jobs[i % len(jobs)]["location"], "embedding": embeddings[i]}
+        for i in range(args.users)
+    ]
+    result["search"] = bench_search(index, users, args.k)
+
+    job_index.swap(index)
+    asyncio.run(database.bulk_save_user_contexts(users))
+    if config.MATERIALIZE_ENABLED:
+        import main
+        _, seconds = timed(asyncio.run, main.materializer.refresh())
+        result["materialize"] = {"seconds": seconds, "users_per_second": args.users / seconds}
+    llm_client.messages.calls = 0
+    result["load"] = asyncio.run(bench_load(users, args.requests, args.concurrency, args.write_fraction, args.seed))
+    result["load"]["llm_calls"] = llm_client.messages.calls
+    result["rss_after_load"] = rss()
+    collection.documents.clear()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, nargs="+", default=[1000, 10000], help="corpus sizes to run")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-type", default=FAISS_INDEX_TYPE)
+    parser.add_argument("--model", default="tiny",
+                        help='"tiny" for a small local BERT, or a model name or path for from_pretrained')
+    parser.add_argument("--synthetic-vectors", action="store_true",
+                        help="index random vectors instead of embedding the corpus")
+    parser.add_argument("--embed-texts", type=int, default=512, help="texts in the embedding throughput run")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000, help="HTTP requests per corpus size")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--write-fraction", type=float, default=0.1, help="share of requests saving a context")
+    parser.add_argument("--api-latency", type=float, default=0.01, help="seconds per job API request")
+    parser.add_argument("--mongo-latency", type=float, default=0.001, help="seconds per Mongo round trip")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per Claude call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+
+    if args.model == "tiny":
+        embedding_model.MODEL_NAME = build_tiny_model(tempfile.mkdtemp(prefix="tiny-bert-"))
+    else:
+        embedding_model.MODEL_NAME = args.model
+    # Cache hits would make every run after the first look free
+    embedding_model.embedding_cache = None
+
+    collection = FakeCollection(latency=args.mongo_latency)
+    database.user_context_collection = collection
+    llm_client = StubAnthropic(args.llm_latency)
+    import main as app_module
+    app_module.context_manager.client = llm_client
+    app_module.context_manager.cache = None
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": vars(args),
+        "embedding": bench_embedding(synthetic_texts(args.embed_texts, seed=args.seed), args.batch_size),
+        "rss_after_model_load": rss(),
+        "corpora": []
+    }
+    print(f"embedding: {results['embedding']['texts_per_second']:.1f} texts/s")
+
+    for n in args.n:
+        result = run_corpus(n, args, collection, llm_client)
+        results["corpora"].append(result)
+        load = result["load"]
+        print(f"n={n}: fetch {result['fetch']['seconds']:.2f}s, build {result['build']['seconds']:.2f}s, "
+              f"search p50={result['search']['vector']['p50_ms']:.2f}ms "
+              f"p99={result['search']['vector']['p99_ms']:.2f}ms, "
+              f"recommendations p50={load['latency']['recommendations']['p50_ms']:.1f}ms "
+              f"p99={load['latency']['recommendations']['p99_ms']:.1f}ms "
+              f"at {load['requests_per_second']:.1f} req/s, rss {result['rss_after_load']['rss_mb']:.0f}MB")
+
+    write_results(args.output, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_filtered.py
+"""
+Measure filtered job search against unfiltered search
+
+For each index type, runs the same queries unfiltered and under filters
+of decreasing selectivity (source, country, city, city + recent postings)
+through `JobIndex.search`, and reports p50/p99 latency, how many of the k
+requested results came back, and recall@k against an exact search over
+only the matching vectors.
+
+Run from the repository root:
+    python -m benchmarks.bench_filtered --n 100000 --queries 200 --k 10
+"""
+import argparse
+import datetime
+
+import faiss
+import numpy as np
+
+from benchmarks.common import synthetic_jobs, synthetic_vectors, latency_summary, timed, write_results
+from bm25_index import job_tokens
+from faiss_index import JobIndex, _content_hash, _job_fingerprint, normalize
+from job_catalog import JobCatalog
+from job_filters import JobAttributeIndex
+
+FILTERS = {
+    "none": None,
+    "source": {"sources": ["Greenhouse"]},
+    "country": {"location": "Country 3"},
+    "city": {"location": "City 7"},
+    "city_recent": {"location": "City 7", "posted_within_days": 90, "include_remote": False}
+}
+
+def build_index(index_type, jobs, vectors):
+    """Fill a JobIndex with precomputed vectors, bypassing the embedding model"""
+    index = JobIndex(vectors.shape[1], index_type)
+    if index.index_type == "ivfpq":
+        index._train(vectors)
+    index._add(vectors, [job["job_id"] for job in jobs])
+    index.jobs = JobCatalog.from_jobs(jobs)
+    index.attributes = JobAttributeIndex.from_jobs(jobs)
+    for job in jobs:
+        index.keywords.add(job["job_id"], job_tokens(job))
+        # Content hashes as upsert records them, so the index has a real version
+        index._content_hashes[job["job_id"]] = _content_hash(job)
+        index._fingerprint ^= _job_fingerprint(job["job_id"], index._content_hashes[job["job_id"]])
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100000, help="corpus size")
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-types", nargs="+", default=["flat", "hnsw", "ivfpq"])
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+
+    jobs = synthetic_jobs(args.n)
+    vectors = normalize(synthetic_vectors(args.n + args.queries, args.dimension, seed=0))
+    corpus, queries = vectors[:args.n], vectors[args.n:]
+    job_ids = np.array([job["job_id"] for job in jobs], dtype=np.int64)
+    attributes = JobAttributeIndex.from_jobs(jobs)
+    today = datetime.date.today()
+
+    # Exact filtered top-k: brute force over only the matching vectors
+    exact = {}
+    for name, filters in FILTERS.items():
+        matching = job_ids if filters is None else attributes.select(**filters, today=today)
+        rows = np.searchsorted(job_ids, matching)
+        flat = faiss.IndexFlatIP(args.dimension)
+        flat.add(corpus[rows])
+        _, found = flat.search(queries, args.k)
+        exact[name] = [set(matching[r] for r in row if r != -1) for row in found]
+        print(f"{name}: {len(matching)} matching jobs ({len(matching) / args.n:.2%})")
+
+    results = []
+    for index_type in args.index_types:
+        index, build_seconds = timed(build_index, index_type, jobs, corpus)
+        print(f"{index_type}: built in {build_seconds:.1f}s")
+        for name, filters in FILTERS.items():
+            durations = []
+            returned = 0
+            hits = 0
+            for i, query in enumerate(queries):
+                found, elapsed = timed(index.search, query, args.k, min_similarity=None, filters=filters)
+                durations.append(elapsed)
+                returned += len(found)
+                hits += len({job["job_id"] for _, job in found} & exact[name][i])
+            result = {
+                "index_type": index_type,
+                "filter": name,
+                "returned_fraction": returned / (len(queries) * args.k),
+                "recall_at_k": hits / max(1, sum(len(ids) for ids in exact[name]))
+            }
+            result.update(latency_summary(durations))
+            results.append(result)
+            print(f"  {name}: p50={result['p50_ms']:.2f}ms p99={result['p99_ms']:.2f}ms "
+                  f"returned={result['returned_fraction']:.0%} recall@{args.k}={result['recall_at_k']:.3f}")
+
+    write_results(args.output, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_hybrid.py
+"""
+Measure hybrid (BM25 + vector) retrieval latency and its overlap with vector-only results
+
+Builds a BM25 keyword index and a flat FAISS index over a synthetic job
+corpus, then for each query times:
+- BM25 search alone
+- vector search alone
+- the full hybrid path: both rankings plus reciprocal-rank fusion
+and reports how many of the hybrid top-k also appear in the vector-only
+top-k. Vectors are synthetic, so overlap shows how much the keyword
+ranking reshapes results rather than how relevant they are.
+
+Run from the repository root:
+    python -m benchmarks.bench_hybrid --n 100000 --queries 500 --k 10
+"""
+import argparse
+import random
+
+from benchmarks.common import synthetic_jobs, synthetic_vectors, latency_summary, timed, write_results, JOB_WORDS
+from bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+from faiss_index import create_faiss_index, normalize
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100000, help="corpus size")
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=50, help="results per ranking before fusion")
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+
+    jobs = synthetic_jobs(args.n)
+    keywords, build_seconds = timed(BM25Index.from_jobs, jobs)
+    print(f"BM25 index over {args.n} jobs built in {build_seconds:.1f}s")
+
+    vectors = normalize(synthetic_vectors(args.n + args.queries, args.dimension, seed=0))
+    index = create_faiss_index("flat", args.dimension)
+    index.add(vectors[:args.n])
+    job_ids = [job["job_id"] for job in jobs]
+
+    rng = random.Random(2)
+    queries = [
+        (vectors[args.n + i:args.n + i + 1], tokenize(" ".join(rng.sample(JOB_WORDS, rng.randint(3, 8)))))
+        for i in range(args.queries)
+    ]
+
+    keyword_times, vector_times, hybrid_times = [], [], []
+    overlap = 0
+    for query_vector, query_tokens in queries:
+        keyword_results, keyword_seconds = timed(keywords.search, query_tokens, args.candidates)
+        (_, rows), vector_seconds = timed(index.search, query_vector, args.candidates)
+        vector_ranking = [job_ids[row] for row in rows[0] if row != -1]
+        fused, fuse_seconds = timed(
+            reciprocal_rank_fusion, [vector_ranking, [job_id for _, job_id in keyword_results]]
+        )
+        keyword_times.append(keyword_seconds)
+        vector_times.append(vector_seconds)
+        hybrid_times.append(keyword_seconds + vector_seconds + fuse_seconds)
+        overlap += len({job_id for _, job_id in fused[:args.k]} & set(vector_ranking[:args.k]))
+
+    results = {
+        "n": args.n,
+        "k": args.k,
+        "candidates": args.candidates,
+        "bm25_build_seconds": build_seconds,
+        "bm25": latency_summary(keyword_times),
+        "vector": latency_summary(vector_times),
+        "hybrid": latency_summary(hybrid_times),
+        "overlap_at_k": overlap / (len(queries) * args.k)
+    }
+    for name in ("bm25", "vector", "hybrid"):
+        print(f"{name}: p50={results[name]['p50_ms']:.2f}ms p99={results[name]['p99_ms']:.2f}ms")
+    print(f"hybrid top-{args.k} overlap with vector-only: {results['overlap_at_k']:.1%}")
+
+    write_results(args.output, results)
+
+if __name__ == "__main__":
+    main()
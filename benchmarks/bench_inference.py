@@ -0,0 +1,86 @@
+# benchmarks/bench_inference.py
+"""
+Compare embedding inference backends on CPU
+
+For each backend (torch fp32, torch dynamic int8, ONNX Runtime) measures
+batched throughput, single-text p50/p99 latency and parity with the fp32
+vectors (cosine similarity per text), so INFERENCE_BACKEND in config.py
+can be picked with numbers. A backend passes parity when its lowest
+cosine agreement is at least --parity-threshold.
+
+Run from the repository root:
+    python -m benchmarks.bench_inference --n 256 --backends torch torch-int8 onnx
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from benchmarks.common import synthetic_texts, latency_summary, timed, write_results
+from config import ONNX_MODEL_PATH, TORCH_NUM_THREADS
+from inference_backends import BACKENDS, create_backend
+import model as embedding_model
+from model import encode_texts, calculate_similarity
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=256, help="texts to embed in the throughput run")
+    parser.add_argument("--latency-samples", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--parity-threshold", type=float, default=0.99)
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.n, seed=0)
+    single_texts = synthetic_texts(args.latency_samples, min_words=20, max_words=120, seed=1)
+
+    embedding_model.load_model()
+    reference_backend = create_backend("torch", embedding_model.load_fp32_model())
+    reference = encode_texts(texts, args.batch_size, inference_backend=reference_backend)
+
+    results = []
+    failed = []
+    for name in args.backends:
+        try:
+            # A fresh copy each time: the int8 backend quantizes its model in place
+            backend = create_backend(name, embedding_model.load_fp32_model(), ONNX_MODEL_PATH, TORCH_NUM_THREADS)
+        except Exception as e:
+            print(f"{name}: unavailable ({e})")
+            continue
+
+        # Warm up once so lazy initialization is not measured
+        encode_texts(texts[:args.batch_size], args.batch_size, inference_backend=backend)
+        vectors, seconds = timed(encode_texts, texts, args.batch_size, inference_backend=backend)
+        durations = [
+            timed(encode_texts, [text], 1, inference_backend=backend)[1] for text in single_texts
+        ]
+        agreement = np.array([calculate_similarity(r, v) for r, v in zip(reference, vectors)])
+
+        result = {
+            "backend": name,
+            "texts_per_second": args.n / seconds,
+            "min_cosine": float(agreement.min()),
+            "mean_cosine": float(agreement.mean()),
+            "parity": bool(agreement.min() >= args.parity_threshold)
+        }
+        result.update(latency_summary(durations))
+        results.append(result)
+        if not result["parity"]:
+            failed.append(name)
+        print(f"{name}: {result['texts_per_second']:.1f} texts/s, p50={result['p50_ms']:.1f}ms "
+              f"p99={result['p99_ms']:.1f}ms, cosine min={result['min_cosine']:.4f} "
+              f"mean={result['mean_cosine']:.4f} {'ok' if result['parity'] else 'FAILED parity'}")
+
+    write_results(args.output, {
+        "n": args.n,
+        "batch_size": args.batch_size,
+        "torch_threads": TORCH_NUM_THREADS,
+        "parity_threshold": args.parity_threshold,
+        "results": results
+    })
+    if failed:
+        sys.exit(f"Parity below {args.parity_threshold} for: {', '.join(failed)}")
+
+if __name__ == "__main__":
+    main()
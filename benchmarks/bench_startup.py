@@ -0,0 +1,129 @@
+# benchmarks/bench_startup.py
+"""
+Measure import time, model load time and memory of the embedding stack
+
+Each measurement runs in a fresh interpreter so earlier imports don't
+hide the cost:
+- import: time and peak RSS to import model, faiss_index and main
+- load: time and RSS added by the first load_model() call
+- fork: with --workers N, the parent preloads the model and forks N
+  children that each embed one text; each child reports its private and
+  proportional (PSS) memory, showing how much of the model stays shared
+  copy-on-write (Linux only)
+
+Run from the repository root:
+    python -m benchmarks.bench_startup --workers 4
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from benchmarks.common import write_results
+
+PROBE = r"""
+import json, resource, sys, time
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+result = {}
+start = time.perf_counter()
+import importlib
+importlib.import_module(sys.argv[1])
+result["import_seconds"] = time.perf_counter() - start
+result["import_rss_mb"] = rss_mb()
+
+if sys.argv[2] == "load":
+    import model
+    start = time.perf_counter()
+    model.load_model()
+    result["load_seconds"] = time.perf_counter() - start
+    result["loaded_rss_mb"] = rss_mb()
+print(json.dumps(result))
+"""
+
+FORK_PROBE = r"""
+import json, os, sys
+import model
+
+def smaps_rollup():
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return values
+
+model.preload_model()
+workers = int(sys.argv[1])
+read_fd, write_fd = os.pipe()
+children = []
+for _ in range(workers):
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        model.get_embedding("benchmark text for a forked worker")
+        m = smaps_rollup()
+        report = {
+            "rss_mb": m.get("Rss", 0),
+            "pss_mb": m.get("Pss", 0),
+            "private_mb": m.get("Private_Clean", 0) + m.get("Private_Dirty", 0),
+            "shared_mb": m.get("Shared_Clean", 0) + m.get("Shared_Dirty", 0)
+        }
+        os.write(write_fd, (json.dumps(report) + "\n").encode())
+        os._exit(0)
+    children.append(pid)
+os.close(write_fd)
+for pid in children:
+    os.waitpid(pid, 0)
+with os.fdopen(read_fd) as f:
+    reports = [json.loads(line) for line in f]
+print(json.dumps({"parent": smaps_rollup(), "workers": reports}))
+"""
+
+def run_probe(code, *args):
+    output = subprocess.run(
+        [sys.executable, "-c", code, *map(str, args)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=["model", "faiss_index", "main"])
+    parser.add_argument("--workers", type=int, default=0, help="forked workers to measure sharing with")
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+
+    results = {"imports": {}}
+    for module in args.modules:
+        try:
+            result = run_probe(PROBE, module, "import")
+        except subprocess.CalledProcessError as e:
+            print(f"{module}: import failed\n{e.stderr}")
+            continue
+        results["imports"][module] = result
+        print(f"import {module}: {result['import_seconds']:.2f}s, RSS {result['import_rss_mb']:.0f} MB")
+
+    load = run_probe(PROBE, "model", "load")
+    results["load"] = load
+    print(f"load_model: {load['load_seconds']:.2f}s, RSS {load['import_rss_mb']:.0f} -> "
+          f"{load['loaded_rss_mb']:.0f} MB")
+
+    if args.workers:
+        fork = run_probe(FORK_PROBE, args.workers)
+        results["fork"] = fork
+        for i, worker in enumerate(fork["workers"]):
+            print(f"worker {i}: RSS {worker['rss_mb']:.0f} MB, PSS {worker['pss_mb']:.0f} MB, "
+                  f"private {worker['private_mb']:.0f} MB, shared {worker['shared_mb']:.0f} MB")
+
+    write_results(args.output, results)
+
+if __name__ == "__main__":
+    main()
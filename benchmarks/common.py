@@ -0,0 +1,89 @@
+# benchmarks/common.py
+import json
+import random
+import time
+
+import numpy as np
+
+def synthetic_vectors(n, dimension=768, clusters=256, seed=0):
+    """
+    Generate clustered float32 vectors that loosely mimic text embeddings
+
+    Uniform random vectors make every ANN index look bad (there is no
+    neighbourhood structure to exploit), so points are drawn around a set
+    of random cluster centres instead.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    assignment = rng.integers(0, clusters, n)
+    noise = rng.standard_normal((n, dimension)).astype(np.float32) * 0.5
+    return centres[assignment] + noise
+
+JOB_WORDS = (
+    "python java rust go kubernetes docker aws gcp azure terraform react typescript sql postgres "
+    "mongodb kafka spark airflow pytorch tensorflow machine learning backend frontend fullstack "
+    "engineer developer senior junior lead staff principal remote hybrid onsite team build design "
+    "scalable distributed systems services api microservices data pipeline platform infrastructure "
+    "security reliability testing ci cd agile product customers experience years degree benefits"
+).split()
+
+def synthetic_texts(n, min_words=20, max_words=400, seed=0):
+    """Generate job-description-like texts with a spread of lengths"""
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(min_words, max_words + 1, n)
+    return [" ".join(rng.choice(JOB_WORDS, length)) for length in lengths]
+
+def synthetic_jobs(n, seed=0):
+    """Generate standardized job dicts with realistic field cardinalities"""
+    rng = random.Random(seed)
+    companies = [f"Company {i}" for i in range(max(1, n // 50))]
+    locations = [f"City {i}, Country {i % 40}" for i in range(300)] + ["Remote"]
+    sources = ["Jooble", "CareerJet", "Greenhouse", "Web3Career"]
+    titles = ["Software Engineer", "Backend Developer", "Data Scientist", "DevOps Engineer", "ML Engineer"]
+    descriptions = synthetic_texts(n, min_words=50, max_words=400, seed=seed)
+    return [
+        {
+            "job_id": i + 1,
+            "title": f"{rng.choice(['Senior ', 'Junior ', 'Staff ', ''])}{rng.choice(titles)}",
+            "company": rng.choice(companies),
+            "location": rng.choice(locations),
+            "description": descriptions[i],
+            "url": f"https://jobs.example.com/postings/{i + 1}",
+            "date_posted": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "source": rng.choice(sources)
+        }
+        for i in range(n)
+    ]
+
+def latency_summary(samples):
+    """Summarize a list of per-call durations in seconds as p50/p99/mean milliseconds"""
+    samples_ms = np.asarray(samples) * 1000
+    return {
+        "p50_ms": float(np.percentile(samples_ms, 50)),
+        "p99_ms": float(np.percentile(samples_ms, 99)),
+        "mean_ms": float(samples_ms.mean())
+    }
+
+def timed(func, *args, **kwargs):
+    """Call func and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def memory_mb():
+    """Current and peak resident set size of this process in MB (Linux; peak only elsewhere)"""
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return peak, peak
+
+def write_results(path, results):
+    """Write benchmark results as JSON if a path was given"""
+    if path:
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {path}")
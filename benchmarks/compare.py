@@ -0,0 +1,89 @@
+# benchmarks/compare.py
+"""
+Compare two benchmark result files, e.g. from before and after a change
+
+Every numeric metric present in both files is listed with its relative
+change. Metrics ending in _ms, seconds or _mb are better lower, and
+*_per_second and recall metrics better higher; a change for the worse
+beyond --threshold is marked as a regression. Lists of per-size results
+(bench_e2e's "corpora") are matched by their "n".
+
+Run from the repository root:
+    python -m benchmarks.compare e2e-before.json e2e-after.json --threshold 0.1 --fail-on-regression
+"""
+import argparse
+import json
+import sys
+
+HIGHER_IS_BETTER = ("per_second", "recall", "speedup")
+LOWER_IS_BETTER = ("_ms", "seconds", "_mb")
+
+def flatten(value, prefix=""):
+    """Numeric leaves of nested results as {"a.b.c": number}"""
+    if isinstance(value, bool):
+        return {}
+    if isinstance(value, (int, float)):
+        return {prefix: value}
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = ((f"n={item['n']}" if isinstance(item, dict) and "n" in item else str(i), item)
+                 for i, item in enumerate(value))
+    else:
+        return {}
+    flat = {}
+    for key, item in items:
+        if key == "params":
+            continue
+        flat.update(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+def direction(metric):
+    """1 if higher is better, -1 if lower is better, 0 if the metric is informational"""
+    name = metric.rsplit(".", 1)[-1]
+    if any(part in name for part in HIGHER_IS_BETTER):
+        return 1
+    if any(part in metric for part in LOWER_IS_BETTER):
+        return -1
+    return 0
+
+def compare(before, after, threshold):
+    """Rows (metric, before, after, relative change, verdict) for metrics in both results"""
+    old, new = flatten(before), flatten(after)
+    rows = []
+    for metric in sorted(old.keys() & new.keys()):
+        change = (new[metric] - old[metric]) / abs(old[metric]) if old[metric] else 0.0
+        better = direction(metric) * change
+        verdict = ""
+        if direction(metric) and abs(change) > threshold:
+            verdict = "improved" if better > 0 else "REGRESSED"
+        rows.append((metric, old[metric], new[metric], change, verdict))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change treated as significant")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit non-zero if anything regressed")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(f"before: {before.get('commit') or args.before}\nafter:  {after.get('commit') or args.after}\n")
+
+    rows = compare(before, after, args.threshold)
+    width = max((len(row[0]) for row in rows), default=10)
+    for metric, old, new, change, verdict in rows:
+        print(f"{metric:<{width}}  {old:>12.4g}  {new:>12.4g}  {change:>+8.1%}  {verdict}")
+
+    regressed = [row[0] for row in rows if row[4] == "REGRESSED"]
+    if regressed:
+        print(f"\n{len(regressed)} metrics regressed by more than {args.threshold:.0%}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+# benchmarks/stand_ins.py
+"""
+Local stand-ins for the services the app talks to, so benchmarks run offline
+
+- FakeCollection: in-memory Motor-like collection for user contexts
+- JobAPIStub: HTTP server answering like the four job APIs, over a synthetic corpus
+- StubAnthropic: Messages API client with fixed latency, optional rate limit and streaming
+- build_tiny_model: a small randomly initialised BERT saved to disk, loadable by model.py
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import anthropic
+import httpx
+
+from benchmarks.common import JOB_WORDS
+from config import EMBEDDING_DIMENSION
+
+def _get(document, field):
+    for part in field.split("."):
+        if not isinstance(document, dict):
+            return None
+        document = document.get(part)
+    return document
+
+def _matches(document, query):
+    # As in Mongo, equality with None also matches a missing field
+    for field, condition in query.items():
+        if isinstance(condition, dict) and "$in" in condition:
+            if _get(document, field) not in condition["$in"]:
+                return False
+        elif _get(document, field) != condition:
+            return False
+    return True
+
+def _apply(document, update):
+    for field, value in update.get("$set", {}).items():
+        *parents, last = field.split(".")
+        target = document
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[last] = value
+    for field in update.get("$unset", {}):
+        document.pop(field, None)
+
+def _project(document, projection):
+    if not projection:
+        return dict(document)
+    included = [field for field, keep in projection.items() if keep and field != "_id"]
+    if included:
+        return {field: document[field] for field in included if field in document}
+    return {field: value for field, value in document.items() if projection.get(field, 1)}
+
+class FakeCollection:
+    """
+    Motor-like collection held in memory, with a fixed latency per round trip
+
+    Supports the calls the app makes on user contexts: equality and `$in`
+    queries on dotted fields, projections, `$set`/`$unset` updates with or
+    without upsert, update_many and bulk writes of UpdateOne.
+    """
+
+    def __init__(self, documents=(), latency=0.0, key="user_id"):
+        self.key = key
+        self.latency = latency
+        self.documents = {document[key]: dict(document) for document in documents}
+
+    async def _round_trip(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def find_one(self, query, projection=None):
+        await self._round_trip()
+        if set(query) == {self.key} and not isinstance(query[self.key], dict):
+            document = self.documents.get(query[self.key])
+            return _project(document, projection) if document is not None else None
+        for document in self.documents.values():
+            if _matches(document, query):
+                return _project(document, projection)
+        return None
+
+    def find(self, query, projection=None, batch_size=None):
+        documents = [_project(d, projection) for d in self.documents.values() if _matches(d, query)]
+
+        async def cursor():
+            for i, document in enumerate(documents):
+                # One round trip per cursor batch
+                if i % (batch_size or 101) == 0:
+                    await self._round_trip()
+                yield document
+        return cursor()
+
+    def _update(self, query, update, upsert):
+        """Apply `update` to the document keyed by query[key]; returns "matched", "upserted" or None"""
+        key = query[self.key]
+        document = self.documents.get(key)
+        if document is not None and _matches(document, query):
+            _apply(document, update)
+            return "matched"
+        if document is None and upsert:
+            self.documents[key] = document = {self.key: key}
+            _apply(document, update)
+            return "upserted"
+        return None
+
+    async def update_one(self, query, update, upsert=False):
+        await self._round_trip()
+        self._update(query, update, upsert)
+
+    async def update_many(self, query, update):
+        await self._round_trip()
+        matched = [document for document in self.documents.values() if _matches(document, query)]
+        for document in matched:
+            _apply(document, update)
+        return types.SimpleNamespace(matched_count=len(matched), modified_count=len(matched))
+
+    async def bulk_write(self, operations, ordered=True):
+        await self._round_trip()
+        outcomes = [self._update(op._filter, op._doc, op._upsert) for op in operations]
+        return types.SimpleNamespace(upserted_count=outcomes.count("upserted"), modified_count=outcomes.count("matched"))
+
+    async def create_index(self, *args, **kwargs):
+        return None
+
+PAGE_SIZE = 100
+
+class JobAPIStub:
+    """
+    Local HTTP server answering like Jooble, CareerJet, Greenhouse and Web3Career
+
+    The corpus is split evenly across the four sources, each serving its
+    share in pages of `page_size` (Greenhouse in one response, as the real
+    board API does) after `latency` seconds. `urls()` returns values for
+    config.JOB_API_URLS.
+    """
+
+    SOURCES = ("jooble", "careerjet", "greenhouse", "web3career")
+
+    def __init__(self, jobs, latency=0.0, page_size=PAGE_SIZE):
+        self.latency = latency
+        self.page_size = page_size
+        self.requests = 0
+        self.shares = {source: jobs[i::len(self.SOURCES)] for i, source in enumerate(self.SOURCES)}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub._respond(self, parse_qs(urlparse(self.path).query))
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub._respond(self, {key: [value] for key, value in json.loads(body or b"{}").items()})
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name="job-api-stub", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def urls(self):
+        base = f"http://127.0.0.1:{self.server.server_port}"
+        return {source: f"{base}/{source}" for source in self.SOURCES}
+
+    def _respond(self, handler, params):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        source = urlparse(handler.path).path.strip("/").split("/")[0]
+        jobs = self.shares.get(source, [])
+        if source != "greenhouse":
+            start = (int(params.get("page", ["1"])[0]) - 1) * self.page_size
+            jobs = jobs[start:start + self.page_size]
+        body = json.dumps({"jobs": [dict(job, source=source) for job in jobs]}).encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+class _StubStream:
+    def __init__(self, messages, params):
+        self.messages = messages
+        self.params = params
+        self.final = None
+
+    async def __aenter__(self):
+        await self.messages._admit()
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        # First token after the full latency's first tenth, the rest spread over the remainder
+        words = self.messages.reply.split()
+        await asyncio.sleep(self.messages.latency / 10)
+        for word in words:
+            await asyncio.sleep(self.messages.latency * 0.9 / len(words))
+            yield word + " "
+        self.final = self.messages._message(self.params)
+
+    async def get_final_message(self):
+        return self.final or self.messages._message(self.params)
+
+class StubMessages:
+    """Messages API stand-in with fixed latency and a requests-per-second limit"""
+
+    def __init__(self, latency, rate_limit=0, reply="Stub analysis"):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.reply = reply
+        self.calls = 0
+        self.rejected = 0
+        self._window = (0, 0)  # (second, requests started in it)
+
+    async def _admit(self):
+        now = int(time.monotonic())
+        second, count = self._window
+        count = count + 1 if second == now else 1
+        self._window = (now, count)
+        if self.rate_limit and count > self.rate_limit:
+            self.rejected += 1
+            request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+            response = httpx.Response(429, headers={"retry-after": str(1 - (time.monotonic() % 1))}, request=request)
+            raise anthropic.RateLimitError("rate limited", response=response, body=None)
+        self.calls += 1
+
+    def _message(self, params):
+        # Usage as the API reports it, with input tokens estimated from the prompt size
+        prompt_chars = len(json.dumps([params.get("system"), params.get("messages")]))
+        usage = types.SimpleNamespace(
+            input_tokens=prompt_chars // 4, output_tokens=len(self.reply) // 4,
+            cache_creation_input_tokens=0, cache_read_input_tokens=0
+        )
+        return types.SimpleNamespace(content=[types.SimpleNamespace(text=self.reply)], usage=usage)
+
+    async def create(self, **params):
+        await self._admit()
+        await asyncio.sleep(self.latency)
+        return self._message(params)
+
+    def stream(self, **params):
+        return _StubStream(self, params)
+
+class StubAnthropic:
+    def __init__(self, latency, rate_limit=0):
+        self.messages = StubMessages(latency, rate_limit)
+
+    def with_options(self, **options):
+        return self
+
+def build_tiny_model(directory, layers=2, heads=12, intermediate_size=512):
+    """
+    Save a small randomly initialised BERT and a matching tokenizer to `directory`
+
+    The hidden size is EMBEDDING_DIMENSION so vectors fit the index, and
+    the vocabulary is the synthetic corpus's words, so texts tokenize to
+    about one token per word. Its vectors carry no meaning; it is there to
+    exercise tokenization, batching and the forward pass at a known cost
+    without downloading bert-base-uncased.
+
+    Returns:
+        `directory`, for model.MODEL_NAME
+    """
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    os.makedirs(directory, exist_ok=True)
+    vocab_path = os.path.join(directory, "vocab.txt")
+    with open(vocab_path, "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + sorted(set(JOB_WORDS))) + "\n")
+    tokenizer = BertTokenizerFast(vocab_file=vocab_path, do_lower_case=True)
+    config = BertConfig(
+        vocab_size=tokenizer.vocab_size, hidden_size=EMBEDDING_DIMENSION, num_hidden_layers=layers,
+        num_attention_heads=heads, intermediate_size=intermediate_size, max_position_embeddings=512
+    )
+    BertModel(config).eval().save_pretrained(directory)
+    tokenizer.save_pretrained(directory)
+    return directory
@@ -0,0 +1,221 @@
+# bm25_index.py
+import math
+import re
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from metrics import timed
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or our that the this to we will with you your"
+    .split()
+)
+TITLE_WEIGHT = 2  # Title terms count this many times toward term frequency
+
+def _as_numpy(buffer, dtype):
+    # np.frombuffer rejects empty buffers on some NumPy versions
+    return np.frombuffer(buffer, dtype=dtype) if len(buffer) else np.zeros(0, dtype=dtype)
+
+def tokenize(text):
+    """
+    Split text into lowercase keyword tokens
+
+    Keeps tokens like "c++", "c#" and "node.js" whole so exact skill names
+    can match, and drops common English stopwords.
+    """
+    return [token for token in TOKEN_PATTERN.findall(str(text or "").lower()) if token not in STOPWORDS]
+
+def job_tokens(job):
+    """Tokens indexed for a job: its title (boosted) and description"""
+    return tokenize(job.get("title", "")) * TITLE_WEIGHT + tokenize(job.get("description", ""))
+
+def keyword_query(user_context):
+    """Keyword query for a saved user context: their skills and stated preferences"""
+    return " ".join(user_context.get("skills") or []) + " " + (user_context.get("preferences") or "")
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse ranked lists of IDs with reciprocal-rank fusion
+
+    Each ID scores sum(1 / (k + rank)) over the lists it appears in, with
+    1-based ranks, so items ranked well by several retrievers rise to the
+    top without having to calibrate their raw scores against each other.
+
+    Returns:
+        List of (score, id) pairs, best first
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(((score, item) for item, score in scores.items()), key=lambda pair: -pair[0])
+
+class BM25Index:
+    """
+    Incremental inverted index with Okapi BM25 scoring
+
+    Each indexed document gets an internal row. Posting lists are compact
+    `array` buffers of (row, term frequency) that only ever grow, and are
+    scored with NumPy over zero-copy views at query time, so a query costs
+    time proportional to the postings of its terms rather than to the
+    number of documents.
+
+    Removing or re-adding a document marks its old row dead instead of
+    rewriting posting lists; dead rows still count toward document
+    frequencies (as deleted documents do in Lucene until a merge) and are
+    dropped when the owner rebuilds the index once `dead_fraction` grows.
+    Callers serialize access; `JobIndex` does so under its own lock.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._rows = {}  # job_id -> row
+        self._row_ids = array("q")  # row -> job_id
+        self._lengths = array("I")  # row -> document length in tokens
+        self._live = bytearray()  # row -> 1 while the row is current
+        self._postings = {}  # term -> (array of rows, array of term frequencies)
+        self._total_length = 0
+        self._dead = 0
+        self._norm = None  # Cached per-row length normalization, reset on add
+
+    @classmethod
+    def from_jobs(cls, jobs, k1=1.2, b=0.75):
+        """Build an index over job dicts that carry a job_id"""
+        index = cls(k1, b)
+        for job in jobs:
+            index.add(job["job_id"], job_tokens(job))
+        return index
+
+    def save(self, path):
+        """
+        Write the index, dead rows included, to `path` as a NumPy .npz file
+
+        Posting lists are stored back to back in one array per field, with
+        their terms and lengths alongside, so `load` does no tokenizing.
+        """
+        terms = list(self._postings)
+        np.savez(
+            path,
+            params=np.array([self.k1, self.b], dtype=np.float64),
+            row_ids=_as_numpy(self._row_ids, np.int64),
+            lengths=_as_numpy(self._lengths, np.uint32),
+            live=_as_numpy(self._live, np.uint8),
+            terms=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+            counts=np.array([len(self._postings[term][0]) for term in terms], dtype=np.int64),
+            rows=np.concatenate([_as_numpy(self._postings[term][0], np.int32) for term in terms] or [[]]),
+            tfs=np.concatenate([_as_numpy(self._postings[term][1], np.uint16) for term in terms] or [[]])
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by `save`"""
+        with np.load(path) as data:
+            k1, b = data["params"].tolist()
+            index = cls(k1, b)
+            index._row_ids = array("q", data["row_ids"].astype(np.int64).tobytes())
+            index._lengths = array("I", data["lengths"].astype(np.uint32).tobytes())
+            index._live = bytearray(data["live"].tobytes())
+            terms = data["terms"].tobytes().decode("utf-8").split("\n") if len(data["terms"]) else []
+            ends = np.cumsum(data["counts"]).tolist()
+            rows = data["rows"].astype(np.int32).tobytes()
+            tfs = data["tfs"].astype(np.uint16).tobytes()
+        start = 0
+        for term, end in zip(terms, ends):
+            index._postings[term] = (array("i", rows[start * 4:end * 4]), array("H", tfs[start * 2:end * 2]))
+            start = end
+        live = index._live
+        index._rows = {job_id: row for row, job_id in enumerate(index._row_ids) if live[row]}
+        index._total_length = int(np.sum(_as_numpy(index._lengths, np.uint32), dtype=np.int64))
+        index._dead = len(index._row_ids) - len(index._rows)
+        return index
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, job_id):
+        return job_id in self._rows
+
+    @property
+    def dead_fraction(self):
+        """Share of rows that belong to removed or replaced documents"""
+        return self._dead / len(self._row_ids) if len(self._row_ids) else 0.0
+
+    def add(self, job_id, tokens):
+        """Index a document's tokens, replacing any earlier version of it"""
+        self.remove(job_id)
+        row = len(self._row_ids)
+        self._rows[job_id] = row
+        self._row_ids.append(job_id)
+        self._lengths.append(len(tokens))
+        self._live.append(1)
+        self._total_length += len(tokens)
+        for term, tf in Counter(tokens).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("i"), array("H"))
+            postings[0].append(row)
+            postings[1].append(min(tf, 65535))
+        self._norm = None
+
+    def remove(self, job_id):
+        """Stop returning a document; its postings are dropped on the next rebuild"""
+        row = self._rows.pop(job_id, None)
+        if row is not None:
+            self._live[row] = 0
+            self._dead += 1
+
+    def _length_norm(self):
+        if self._norm is None:
+            lengths = np.array(self._lengths, dtype=np.float32)
+            avgdl = self._total_length / len(lengths) if self._total_length else 1.0
+            self._norm = self.k1 * (1 - self.b + self.b * lengths / avgdl)
+        return self._norm
+
+    @timed("bm25.search")
+    def search(self, query, k=10, allowed=None):
+        """
+        Score documents against a query
+
+        Args:
+            query: Query text, or a list of tokens
+            k: Number of results to return
+            allowed: Sorted int64 array of the only job IDs that may be returned, or None
+
+        Returns:
+            List of (BM25 score, job_id), best first
+        """
+        tokens = tokenize(query) if isinstance(query, str) else query
+        n = len(self._row_ids)
+        if n == 0 or not tokens or not self._rows:
+            return []
+
+        norm = self._length_norm()
+        scores = np.zeros(n, dtype=np.float32)
+        for term, qtf in Counter(tokens).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            rows = np.frombuffer(postings[0], dtype=np.int32)
+            tfs = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+            df = len(rows)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            # A row appears at most once per posting list, so fancy-index += is safe
+            scores[rows] += qtf * idf * tfs * (self.k1 + 1) / (tfs + norm[rows])
+        if self._dead:
+            scores *= np.frombuffer(self._live, dtype=np.uint8)
+
+        candidates = np.flatnonzero(scores)
+        if allowed is not None:
+            if len(allowed) == 0:
+                return []
+            ids = np.frombuffer(self._row_ids, dtype=np.int64)[candidates]
+            positions = np.minimum(np.searchsorted(allowed, ids), len(allowed) - 1)
+            candidates = candidates[allowed[positions] == ids]
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(float(scores[row]), self._row_ids[row]) for row in candidates]
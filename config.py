@@ -13,14 +13,157 @@ API_KEYS = {
     # Add other API keys as needed
 }
 
+# Job API endpoints (override to point ingestion at stand-in servers)
+JOB_API_URLS = {
+    "jooble": os.getenv("JOOBLE_API_URL", "https://jooble.org/api"),
+    "careerjet": os.getenv("CAREERJET_API_URL", "http://public.api.careerjet.net/search"),
+    "greenhouse": os.getenv("GREENHOUSE_API_URL", "https://boards-api.greenhouse.io/v1/boards/example/jobs"),
+    "web3career": os.getenv("WEB3CAREER_API_URL", "https://api.web3.career/jobs"),
+}
+
+# Job Ingestion Configuration
+JOB_FETCH_TIMEOUT = float(os.getenv("JOB_FETCH_TIMEOUT", "10"))  # Seconds per HTTP request
+JOB_SOURCE_DEADLINE = float(os.getenv("JOB_SOURCE_DEADLINE", "60"))  # Seconds per source, all pages
+JOB_FETCH_RETRIES = int(os.getenv("JOB_FETCH_RETRIES", "3"))
+JOB_FETCH_BACKOFF = float(os.getenv("JOB_FETCH_BACKOFF", "0.5"))  # Base delay in seconds, doubled per retry
+JOB_FETCH_CONCURRENCY = int(os.getenv("JOB_FETCH_CONCURRENCY", "4"))  # Concurrent requests per source
+JOB_FETCH_MAX_PAGES = int(os.getenv("JOB_FETCH_MAX_PAGES", "20"))
+
+# Job Deduplication Configuration
+JOB_DEDUP_ENABLED = os.getenv("JOB_DEDUP_ENABLED", "true").lower() == "true"  # MinHash/LSH near duplicates
+JOB_DEDUP_THRESHOLD = float(os.getenv("JOB_DEDUP_THRESHOLD", "0.8"))  # Estimated Jaccard similarity
+JOB_DEDUP_NUM_PERM = int(os.getenv("JOB_DEDUP_NUM_PERM", "128"))
+JOB_DEDUP_BANDS = int(os.getenv("JOB_DEDUP_BANDS", "16"))  # Must divide JOB_DEDUP_NUM_PERM
+
+# Background Job Refresh Configuration
+JOB_REFRESH_ENABLED = os.getenv("JOB_REFRESH_ENABLED", "true").lower() == "true"
+JOB_REFRESH_INTERVAL = float(os.getenv("JOB_REFRESH_INTERVAL", "3600"))  # Seconds between refreshes
+JOB_REFRESH_LIMIT = int(os.getenv("JOB_REFRESH_LIMIT", "100"))  # Maximum jobs kept per refresh
+
+# Request Path Concurrency Configuration
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))  # Threads running BERT and FAISS for requests
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "32"))  # Waiting calls before returning 503
+# Torch intra-op threads per call; split the cores between workers so they don't oversubscribe
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", str(max(1, (os.cpu_count() or 1) // INFERENCE_WORKERS))))
+
+# Batch Recommendation Configuration
+BATCH_SEARCH_SIZE = int(os.getenv("BATCH_SEARCH_SIZE", "256"))  # Users per batched FAISS search
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # Concurrent Claude calls for batch requests
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))  # Retries of a rate-limited Claude call
+
+# Recommendation Materialization Configuration
+# Precompute each user's top jobs when the index or their profile changes, so
+# unfiltered /recommendations requests are a single keyed read
+MATERIALIZE_ENABLED = os.getenv("MATERIALIZE_ENABLED", "true").lower() == "true"
+MATERIALIZE_K = int(os.getenv("MATERIALIZE_K", "10"))
+# Refreshes that change more than this share of jobs recompute every user instead of checking each
+MATERIALIZE_FULL_REFRESH_FRACTION = float(os.getenv("MATERIALIZE_FULL_REFRESH_FRACTION", "0.2"))
+
+# Embedding Micro-batching Configuration
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))  # Texts per coalesced batch
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))  # Wait for more requests
+
 # MongoDB Configuration
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-MONGO_DB = os.getenv("MONGO_DB", "job_recommendations")
+MONGO_DB = os.getenv("MONGO_DB", "job_recommendations")  # User contexts and caches
+# Users, jobs and chat history, in the database they have always been stored in
+MONGO_APP_DB = os.getenv("MONGO_APP_DB", "personalized_agent")
 MONGO_COLLECTION = os.getenv("MONGO_COLLECTION", "user_context")
+MONGO_USERS_COLLECTION = os.getenv("MONGO_USERS_COLLECTION", "users")
+MONGO_JOBS_COLLECTION = os.getenv("MONGO_JOBS_COLLECTION", "jobs")
+MONGO_CHAT_COLLECTION = os.getenv("MONGO_CHAT_COLLECTION", "chat_buckets")  # Chat history in fixed-size pages
+MONGO_CHAT_SUMMARY_COLLECTION = os.getenv("MONGO_CHAT_SUMMARY_COLLECTION", "chat_summaries")
+MONGO_LEGACY_CHAT_COLLECTION = os.getenv("MONGO_LEGACY_CHAT_COLLECTION", "chat_history")  # One document per user
+MONGO_LEGACY_DB = os.getenv("MONGO_LEGACY_DB", "personalized_agent")  # Where the legacy chat documents are
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))  # Connections per client
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))  # Kept open so bursts skip the handshake
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_BULK_BATCH_SIZE = int(os.getenv("MONGO_BULK_BATCH_SIZE", "1000"))  # Operations per bulk_write
+
+# Chat History Configuration
+CHAT_BUCKET_SIZE = int(os.getenv("CHAT_BUCKET_SIZE", "100"))  # Messages per stored page
+CHAT_MAX_BUCKETS = int(os.getenv("CHAT_MAX_BUCKETS", "50"))  # Pages kept per user before compaction, 0 keeps all
+CHAT_HISTORY_LIMIT = int(os.getenv("CHAT_HISTORY_LIMIT", "50"))  # Messages returned by default
 
 # FAISS Configuration
 EMBEDDING_DIMENSION = 768
 FAISS_SIMILARITY_THRESHOLD = 0.75
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")  # "flat", "hnsw" or "ivfpq"
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "200"))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "1024"))
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "64"))  # Sub-quantizers; must divide EMBEDDING_DIMENSION
+FAISS_PQ_NBITS = int(os.getenv("FAISS_PQ_NBITS", "8"))
+FAISS_TRAIN_SAMPLE_SIZE = int(os.getenv("FAISS_TRAIN_SAMPLE_SIZE", "100000"))
+FAISS_INDEX_DIR = os.getenv("FAISS_INDEX_DIR", "data/faiss_index")  # On-disk index snapshot
+FAISS_MAX_STALE_FRACTION = float(os.getenv("FAISS_MAX_STALE_FRACTION", "0.2"))  # HNSW rebuild trigger
+# Filtered search may visit up to this many times the usual nprobe / efSearch to find k matches
+FILTER_MAX_WIDENING = int(os.getenv("FILTER_MAX_WIDENING", "64"))
+# Filters matching at most this many jobs are scored exactly against just those vectors
+FILTER_EXACT_MAX = int(os.getenv("FILTER_EXACT_MAX", "2048"))
+FILTER_SELECTOR_CACHE_SIZE = int(os.getenv("FILTER_SELECTOR_CACHE_SIZE", "64"))  # Distinct filters kept resolved
+
+# Inference Backend Configuration
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")  # "torch", "torch-int8" or "onnx"
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", "data/onnx/bert-base-uncased.onnx")  # Exported on first use
+
+# Model Loading Configuration
+# Warm up in the background at startup so the first request doesn't load the model
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+# Load the model when main.py is imported; with a pre-forking server
+# (e.g. gunicorn --preload -k uvicorn.workers.UvicornWorker) workers share it copy-on-write
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "false").lower() == "true"
+
+# Hybrid Retrieval Configuration
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"  # BM25 fused with vectors
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))  # Results per ranking before fusion
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))  # Reciprocal-rank fusion constant
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+BM25_MAX_DEAD_FRACTION = float(os.getenv("BM25_MAX_DEAD_FRACTION", "0.2"))  # Keyword index rebuild trigger
+
+# Long Text Embedding Configuration
+# "truncate" embeds the first 512 tokens; "pooled" embeds overlapping token windows and
+# averages them into one vector; "multi" also indexes one vector per job window and
+# scores each job by its best window (single-vector embeddings such as profiles stay pooled).
+# Switching modes re-embeds every indexed job on the next refresh; saved profile
+# embeddings keep the old mode until the profile is saved again
+EMBEDDING_CHUNK_MODE = os.getenv("EMBEDDING_CHUNK_MODE", "truncate")
+EMBEDDING_CHUNK_TOKENS = int(os.getenv("EMBEDDING_CHUNK_TOKENS", "256"))  # Tokens per window, at most 510
+EMBEDDING_CHUNK_OVERLAP = int(os.getenv("EMBEDDING_CHUNK_OVERLAP", "64"))  # Tokens shared by adjacent windows
+EMBEDDING_MAX_CHUNKS = int(os.getenv("EMBEDDING_MAX_CHUNKS", "16"))  # Per text; longer texts are sampled evenly
+
+# Embedding Cache Configuration
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "data/embedding_cache")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+EMBEDDING_CACHE_FLUSH_SECONDS = float(os.getenv("EMBEDDING_CACHE_FLUSH_SECONDS", "5"))  # Max age of unwritten entries
+
+# LLM Response Cache Configuration
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))  # Seconds a cached analysis stays valid
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))  # In-memory tier
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")  # "memory", "disk" or "mongo"
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "data/llm_cache")
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "100000"))
+LLM_CACHE_COLLECTION = os.getenv("LLM_CACHE_COLLECTION", "llm_response_cache")
+
+# Recommendation Prompt Configuration
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))  # Estimated tokens for the job listings section
+PROMPT_DESCRIPTION_CHARS = int(os.getenv("PROMPT_DESCRIPTION_CHARS", "300"))  # Description excerpt per job
+# Mark the system prompt and job listings as cacheable with Anthropic prompt caching
+# (prefixes shorter than the model's minimum, 1024 tokens for Sonnet, are simply not cached)
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() == "true"
+
+# Metrics Configuration
+# Add a Server-Timing header with per-stage durations to every response
+METRICS_TIMING_HEADER = os.getenv("METRICS_TIMING_HEADER", "false").lower() == "true"
+# Serve /debug/profile, which runs a sampling profiler over all threads on demand
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
 
 # API Endpoints
 API_HOST = os.getenv("API_HOST", "http://127.0.0.1")
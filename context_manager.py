@@ -1,63 +1,218 @@
 # context_manager.py
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
+import asyncio
 import json
-from typing import Dict, List, Any
+import logging
+import time
+from typing import Dict, List, Any, AsyncIterator, Optional, Tuple
+from config import (
+    LLM_CACHE_ENABLED, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_BACKEND, LLM_CACHE_DIR,
+    LLM_CACHE_DISK_MAX_ENTRIES, LLM_CACHE_COLLECTION,
+    PROMPT_TOKEN_BUDGET, PROMPT_DESCRIPTION_CHARS, PROMPT_CACHE_ENABLED
+)
+from metrics import observe_stage, timed_stage
+from prompt_builder import build_job_listings, build_user_profile
+from response_cache import ResponseCache, SQLiteResponseStore, MongoResponseStore, make_response_key
+
+logger = logging.getLogger(__name__)
+
+# Token counters reported by the Messages API for each call
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """
+    Build the configured LLM response cache, or None when it is disabled
+    
+    A persistent tier that cannot be opened is logged and skipped, leaving
+    the in-memory tier on its own.
+    """
+    if not LLM_CACHE_ENABLED:
+        return None
+    store = None
+    try:
+        if LLM_CACHE_BACKEND == "disk":
+            store = SQLiteResponseStore(LLM_CACHE_DIR, LLM_CACHE_DISK_MAX_ENTRIES)
+        elif LLM_CACHE_BACKEND == "mongo":
+            from database import db
+            collection = db[LLM_CACHE_COLLECTION]
+            store = MongoResponseStore(collection, LLM_CACHE_TTL)
+    except Exception as e:
+        logger.error(f"Error opening {LLM_CACHE_BACKEND} response cache, using memory only: {str(e)}")
+    return ResponseCache(LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES, store)
 
 class ContextManager:
-    def __init__(self, api_key: str):
-        self.client = Anthropic(api_key=api_key)
+    MODEL = "claude-3-7-sonnet-20250219"
+    MAX_TOKENS = 1000
+    # Everything that is the same for every request lives here, ahead of the
+    # per-request content, so it can be served from Anthropic's prompt cache
+    SYSTEM_PROMPT = (
+        "You are an AI job recommendation assistant. "
+        "Use the provided context to match users with the most relevant job listings. "
+        "Based on the user's profile and the available job listings, recommend the most suitable jobs. "
+        "Explain why each job matches the user's skills and preferences. "
+        "Also suggest skills the user might want to develop to improve their job prospects."
+    )
+    
+    def __init__(self, api_key: str, client: Any = None, cache: Optional[ResponseCache] = None,
+                 token_budget: int = PROMPT_TOKEN_BUDGET, description_chars: int = PROMPT_DESCRIPTION_CHARS,
+                 prompt_cache: bool = PROMPT_CACHE_ENABLED):
+        self.client = client or AsyncAnthropic(api_key=api_key)
+        self.cache = cache
+        self.token_budget = token_budget
+        self.description_chars = description_chars
+        self.prompt_cache = prompt_cache
+        self.usage = dict.fromkeys(("calls",) + USAGE_FIELDS, 0)
         
+    def build_prompt(self, user_context: Dict, job_listings: List[Dict]) -> Tuple[str, str, List[Dict]]:
+        """
+        Build the two parts of the user message: job listings, then the user's profile
+        
+        Job listings are compacted and trimmed to the token budget (see
+        `build_job_listings`). They come first so that requests about the
+        same jobs, such as a batch of similar users, share a cacheable prefix.
+        
+        Returns:
+            Tuple (job listings section, user profile section, the job dicts the
+            listings section includes, in the order Claude numbers them)
+        """
+        job_listings_text, included = build_job_listings(job_listings, self.token_budget, self.description_chars)
+        return job_listings_text, build_user_profile(user_context), included
+    
+    def prompt_listings(self, job_listings: List[Dict]) -> List[Dict]:
+        """The job listings a prompt about `job_listings` shows Claude, i.e. what its "Job N" refers to"""
+        return build_job_listings(job_listings, self.token_budget, self.description_chars)[1]
+    
     def generate_recommendation_message(self, user_context: Dict, job_listings: List[Dict]) -> str:
         """
         Creates a structured message for Claude with user context and job listings
         """
-        # Format user context for Claude
-        user_profile = (
-            f"User Profile:\n"
-            f"Skills: {', '.join(user_context.get('skills', []))}\n"
-            f"Experience: {user_context.get('experience', 'Not specified')}\n"
-            f"Job Preferences: {user_context.get('preferences', 'Not specified')}\n"
-            f"Location: {user_context.get('location', 'Not specified')}\n"
-        )
+        return "\n\n".join(self.build_prompt(user_context, job_listings)[:2])
+    
+    async def get_personalized_recommendations(self, user_context: Dict, job_listings: List[Dict],
+                                               max_retries: Optional[int] = None) -> Dict:
+        """
+        Get personalized job recommendations using Claude and the Model Context Protocol
         
-        # Format job listings
-        job_listings_text = "Available Job Listings:\n"
-        for i, job in enumerate(job_listings, 1):
-            job_listings_text += (
-                f"Job {i}:\n"
-                f"Title: {job.get('title', 'Unknown')}\n"
-                f"Company: {job.get('company', 'Unknown')}\n"
-                f"Description: {job.get('description', 'No description available')[:300]}...\n"
-                f"Location: {job.get('location', 'Remote/Not specified')}\n\n"
-            )
-        
-        # Create the complete context message
-        message = (
-            f"{user_profile}\n\n"
-            f"{job_listings_text}\n\n"
-            "Based on the user's profile and the available job listings, recommend the most suitable jobs. "
-            "Explain why each job matches the user's skills and preferences. "
-            "Also suggest skills the user might want to develop to improve their job prospects."
-        )
+        Args:
+            user_context: User profile to recommend jobs for
+            job_listings: Candidate jobs from the vector search
+            max_retries: Retries the client makes itself for this call, overriding
+                its default; 0 when the caller retries (see LLMDispatcher)
+        
+        Returns:
+            Dict with recommendations (the listings Claude was shown, after
+            de-duplication and the token budget, numbered as in its analysis),
+            claude_analysis, and usage: the call's token counts, or None when
+            the analysis came from the response cache
+        """
+        *prompt, included = self.build_prompt(user_context, job_listings)
+        cache_key = self._cache_key("\n\n".join(prompt))
+        user_id = user_context.get("user_id")
         
-        return message
+        usage = None
+        analysis = await self._cache_call("get", cache_key)
+        if analysis is None:
+            client = self.client if max_retries is None else self.client.with_options(max_retries=max_retries)
+            with timed_stage("claude.create"):
+                response = await client.messages.create(**self._request_params(*prompt))
+            analysis = response.content[0].text
+            usage = self._record_usage(getattr(response, "usage", None), user_id)
+            await self._cache_call("put", cache_key, analysis, user_id)
+        
+        return {
+            "recommendations": included,
+            "claude_analysis": analysis,
+            "usage": usage
+        }
     
-    def get_personalized_recommendations(self, user_context: Dict, job_listings: List[Dict]) -> Dict:
+    async def stream_personalized_recommendations(self, user_context: Dict, job_listings: List[Dict]) -> AsyncIterator[str]:
         """
-        Get personalized job recommendations using Claude and the Model Context Protocol
+        Stream Claude's analysis of the job listings as text chunks
+        
+        Yields each text delta as soon as the API produces it, so callers can
+        show the vector-search matches first and render the analysis as it arrives.
+        A cached analysis is yielded as a single chunk; a streamed one is cached
+        only once it has completed. Its "Job N" numbers refer to
+        `prompt_listings(job_listings)`.
         """
-        message = self.generate_recommendation_message(user_context, job_listings)
+        *prompt, _ = self.build_prompt(user_context, job_listings)
+        cache_key = self._cache_key("\n\n".join(prompt))
+        user_id = user_context.get("user_id")
         
-        response = self.client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=1000,
-            system="You are an AI job recommendation assistant. Use the provided context to match users with the most relevant job listings.",
-            messages=[
-                {"role": "user", "content": message}
-            ]
-        )
+        cached = await self._cache_call("get", cache_key)
+        if cached is not None:
+            yield cached
+            return
         
+        chunks = []
+        start = time.perf_counter()
+        with timed_stage("claude.stream"):
+            async with self.client.messages.stream(**self._request_params(*prompt)) as stream:
+                async for text in stream.text_stream:
+                    if not chunks:
+                        observe_stage("claude.first_token", time.perf_counter() - start)
+                    chunks.append(text)
+                    yield text
+                final = await stream.get_final_message()
+        
+        self._record_usage(getattr(final, "usage", None), user_id)
+        await self._cache_call("put", cache_key, "".join(chunks), user_id)
+    
+    def usage_stats(self) -> Dict[str, Any]:
+        """Token totals over every Claude call, and the share of input tokens read from the prompt cache"""
+        stats = dict(self.usage)
+        total_input = stats["input_tokens"] + stats["cache_creation_input_tokens"] + stats["cache_read_input_tokens"]
+        stats["cache_read_fraction"] = stats["cache_read_input_tokens"] / total_input if total_input else 0.0
+        return stats
+    
+    async def invalidate_user(self, user_id: str):
+        """Forget cached analyses for a user whose context changed"""
+        await self._cache_call("invalidate_user", user_id)
+    
+    async def invalidate_all(self):
+        """Forget every cached analysis, e.g. after the job index changed"""
+        await self._cache_call("clear")
+    
+    async def _cache_call(self, method: str, *args):
+        """Call a cache method, off the event loop when a persistent tier does blocking I/O"""
+        if self.cache is None:
+            return None
+        func = getattr(self.cache, method)
+        if self.cache.store is None:
+            return func(*args)
+        return await asyncio.to_thread(func, *args)
+    
+    def _cache_key(self, message: str) -> str:
+        return make_response_key(self.MODEL, self.SYSTEM_PROMPT, self.MAX_TOKENS, message)
+    
+    def _record_usage(self, usage: Any, user_id: Optional[str]) -> Optional[Dict[str, int]]:
+        """Add one call's token counts to the running totals and log them"""
+        if usage is None:
+            return None
+        counts = {field: getattr(usage, field, None) or 0 for field in USAGE_FIELDS}
+        self.usage["calls"] += 1
+        for field, count in counts.items():
+            self.usage[field] += count
+        logger.info(
+            f"Claude call for {user_id}: {counts['input_tokens']} input tokens "
+            f"(+{counts['cache_read_input_tokens']} cache read, +{counts['cache_creation_input_tokens']} cache write), "
+            f"{counts['output_tokens']} output tokens"
+        )
+        return counts
+    
+    def _request_params(self, job_listings_text: str, user_profile: str) -> Dict[str, Any]:
+        """Keyword arguments shared by blocking and streaming Messages API calls"""
+        system = {"type": "text", "text": self.SYSTEM_PROMPT}
+        job_block = {"type": "text", "text": job_listings_text}
+        if self.prompt_cache:
+            # Cache breakpoints: the system prompt alone, and the system prompt plus these job listings
+            system["cache_control"] = {"type": "ephemeral"}
+            job_block["cache_control"] = {"type": "ephemeral"}
         return {
-            "recommendations": job_listings,
-            "claude_analysis": response.content[0].text
+            "model": self.MODEL,
+            "max_tokens": self.MAX_TOKENS,
+            "system": [system],
+            "messages": [
+                {"role": "user", "content": [job_block, {"type": "text", "text": user_profile}]}
+            ]
         }
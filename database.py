@@ -1,38 +1,394 @@
-from pymongo import MongoClient
-import os
+import datetime
+import hashlib
+import logging
+import math
 
-# Load MongoDB Connection String from Environment Variables
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+import numpy as np
+from bson.binary import Binary
+from pymongo import MongoClient, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+from motor.motor_asyncio import AsyncIOMotorClient
+from metrics import timed, timed_stage
+from config import (
+    MONGO_URI, MONGO_DB, MONGO_APP_DB, MONGO_COLLECTION, MONGO_USERS_COLLECTION, MONGO_JOBS_COLLECTION,
+    MONGO_CHAT_COLLECTION, MONGO_CHAT_SUMMARY_COLLECTION, MONGO_LEGACY_DB, MONGO_LEGACY_CHAT_COLLECTION,
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_BULK_BATCH_SIZE, CHAT_BUCKET_SIZE, CHAT_MAX_BUCKETS, CHAT_HISTORY_LIMIT
+)
 
-# Initialize MongoDB Client
-client = MongoClient(MONGO_URI)
+logger = logging.getLogger(__name__)
+
+# Connection pool settings shared by the sync and async clients
+CLIENT_OPTIONS = {
+    "maxPoolSize": MONGO_MAX_POOL_SIZE,
+    "minPoolSize": MONGO_MIN_POOL_SIZE,
+    "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+    "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    "retryWrites": True
+}
+
+# Fields each read actually needs, so documents never ship more than that
+CONTEXT_FIELDS = ("user_id", "skills", "experience", "preferences", "location")
+PROFILE_PROJECTION = {"_id": 0, **{field: 1 for field in CONTEXT_FIELDS}}
+RECOMMENDATION_PROJECTION = {**PROFILE_PROJECTION, "embedding": 1}
+# Profile plus the precomputed top-k jobs, for the read path that needs no search
+MATERIALIZED_PROJECTION = {**PROFILE_PROJECTION, "recommendations": 1}
+# What recomputing a user's recommendations needs
+MATERIALIZE_PROJECTION = {**RECOMMENDATION_PROJECTION, "profile_stamp": 1, "recommendations": 1}
+
+# Initialize MongoDB Client (blocking code: scripts, caches offloaded to threads)
+client = MongoClient(MONGO_URI, **CLIENT_OPTIONS)
+
+# Async client for request handlers, so Mongo I/O never blocks the event loop
+async_client = AsyncIOMotorClient(MONGO_URI, **CLIENT_OPTIONS)
 
 # Access Database
-db = client["personalized_agent"]
+db = client[MONGO_DB]
+async_db = async_client[MONGO_DB]
+# Users, jobs and chat history stay where they were first stored
+app_db = client[MONGO_APP_DB]
+async_app_db = async_client[MONGO_APP_DB]
 
 # Define Collections
-users_collection = db["users"]
-jobs_collection = db["jobs"]
-chat_collection = db["chat_history"]
+users_collection = app_db[MONGO_USERS_COLLECTION]
+jobs_collection = app_db[MONGO_JOBS_COLLECTION]
+# Chat history is stored as pages ("buckets") of up to CHAT_BUCKET_SIZE messages:
+# {user_id, ts (first message), last_ts, count, messages: [{role, message, ts}]}
+chat_collection = app_db[MONGO_CHAT_COLLECTION]
+chat_summary_collection = app_db[MONGO_CHAT_SUMMARY_COLLECTION]
+user_context_collection = async_db[MONGO_COLLECTION]
+
+def encode_embedding(vector):
+    """Pack an embedding as little-endian float32 bytes, 4 bytes per dimension"""
+    return Binary(np.ascontiguousarray(vector, dtype="<f4").tobytes())
+
+def decode_embedding(value):
+    """
+    Turn a stored embedding back into a float32 vector
+
+    Packed embeddings are wrapped without copying (the array is read-only);
+    documents written before embeddings were packed hold a list of doubles,
+    which is converted.
+    """
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype="<f4")
+    return np.asarray(value, dtype=np.float32)
+
+# Pages started in the same millisecond are told apart by their IDs
+NEWEST_PAGES_FIRST = [("ts", DESCENDING), ("_id", DESCENDING)]
+
+async def ensure_indexes():
+    """
+    Create the indexes lookups rely on
+
+    Failures (e.g. duplicate user IDs already stored) are logged rather than
+    raised, so the API still starts against a database that needs cleaning up.
+    """
+    try:
+        await user_context_collection.create_index([("user_id", ASCENDING)], unique=True)
+    except PyMongoError as e:
+        logger.error(f"Error creating unique user_id index on {MONGO_COLLECTION}: {str(e)}")
+    try:
+        chat = async_app_db[MONGO_CHAT_COLLECTION]
+        # Newest pages first for recent-history reads and pagination
+        await chat.create_index([("user_id", ASCENDING)] + NEWEST_PAGES_FIRST)
+        # Only each user's open (not yet full) page is indexed here, so appends find it in O(1)
+        await chat.create_index(
+            [("user_id", ASCENDING)],
+            name="open_bucket",
+            partialFilterExpression={"count": {"$lt": CHAT_BUCKET_SIZE}}
+        )
+        await async_app_db[MONGO_CHAT_SUMMARY_COLLECTION].create_index([("user_id", ASCENDING)], unique=True)
+    except PyMongoError as e:
+        logger.error(f"Error creating chat history indexes: {str(e)}")
+
+# Function to load one user's context for recommendations
+@timed("mongo.get_user_context")
+async def get_user_context(user_id, projection=RECOMMENDATION_PROJECTION):
+    user_data = await user_context_collection.find_one({"user_id": user_id}, projection)
+    if user_data and "embedding" in user_data:
+        with timed_stage("mongo.decode_embedding"):
+            user_data["embedding"] = decode_embedding(user_data["embedding"])
+    return user_data
+
+# Function to store one user's context, replacing the saved fields
+@timed("mongo.save_user_context")
+async def save_user_context(user_data):
+    await user_context_collection.update_one(
+        {"user_id": user_data["user_id"]},
+        _profile_update(user_data),
+        upsert=True
+    )
+
+# Function to store many user contexts with bulk writes, e.g. for profile imports
+@timed("mongo.bulk_save_user_contexts")
+async def bulk_save_user_contexts(contexts, batch_size=MONGO_BULK_BATCH_SIZE):
+    """
+    Upsert user contexts in unordered bulk_write batches
+
+    Unordered batches let the server apply writes in parallel and keep going
+    past a failed document; failures are logged and counted.
+
+    Returns:
+        Dict with upserted, modified and failed counts
+    """
+    counts = {"upserted": 0, "modified": 0, "failed": 0}
+    for start in range(0, len(contexts), batch_size):
+        operations = [
+            UpdateOne({"user_id": user_data["user_id"]}, _profile_update(user_data), upsert=True)
+            for user_data in contexts[start:start + batch_size]
+        ]
+        try:
+            result = await user_context_collection.bulk_write(operations, ordered=False)
+            counts["upserted"] += result.upserted_count
+            counts["modified"] += result.modified_count
+        except PyMongoError as e:
+            details = getattr(e, "details", None) or {}
+            counts["upserted"] += details.get("nUpserted", 0)
+            counts["modified"] += details.get("nModified", 0)
+            counts["failed"] += len(details.get("writeErrors", [])) or len(operations)
+            logger.error(f"Error bulk saving user contexts: {str(e)}")
+    return counts
+
+def _packed(user_data):
+    if user_data.get("embedding") is None:
+        return user_data
+    return dict(user_data, embedding=encode_embedding(user_data["embedding"]))
+
+def profile_stamp(user_data):
+    """Hash of the profile fields recommendations are computed from"""
+    digest = hashlib.sha1()
+    if user_data.get("embedding") is not None:
+        digest.update(np.ascontiguousarray(user_data["embedding"], dtype="<f4").tobytes())
+    digest.update(" ".join(user_data.get("skills") or []).encode("utf-8"))
+    digest.update(b"\x1f" + (user_data.get("preferences") or "").encode("utf-8"))
+    return digest.hexdigest()
+
+def _profile_update(user_data):
+    # Recommendations computed from the previous profile go in the same write,
+    # so no read can pair them with the new one
+    return {
+        "$set": dict(_packed(user_data), profile_stamp=profile_stamp(user_data)),
+        "$unset": {"recommendations": ""}
+    }
+
+# Function to store precomputed recommendations
+@timed("mongo.save_materialized_recommendations")
+async def save_materialized_recommendations(records, batch_size=MONGO_BULK_BATCH_SIZE):
+    """
+    Store each user's precomputed recommendations with unordered bulk writes
+
+    A record is only written if the user's profile still has the stamp it
+    was computed from; a profile saved in the meantime wins.
+
+    Args:
+        records: List of (user_id, profile stamp, recommendations dict)
+
+    Returns:
+        Number of users updated
+    """
+    operations = [
+        UpdateOne({"user_id": user_id, "profile_stamp": stamp}, {"$set": {"recommendations": recommendations}})
+        for user_id, stamp, recommendations in records
+    ]
+    updated = 0
+    for start in range(0, len(operations), batch_size):
+        try:
+            result = await user_context_collection.bulk_write(operations[start:start + batch_size], ordered=False)
+            updated += result.modified_count
+        except PyMongoError as e:
+            logger.error(f"Error saving materialized recommendations: {str(e)}")
+    return updated
+
+# Function to mark unaffected users' recommendations current for a new index version
+async def restamp_recommendations(user_ids, old_version, new_version):
+    try:
+        await user_context_collection.update_many(
+            {"user_id": {"$in": list(user_ids)}, "recommendations.index_version": old_version},
+            {"$set": {"recommendations.index_version": new_version}}
+        )
+    except PyMongoError as e:
+        logger.error(f"Error restamping materialized recommendations: {str(e)}")
 
 # Function to add a user
+@timed("mongo.add_user")
 def add_user(user_data):
     users_collection.insert_one(user_data)
 
 # Function to get user by ID
+@timed("mongo.get_user")
 def get_user(user_id):
     return users_collection.find_one({"_id": user_id})
 
+def _utcnow():
+    # BSON dates have millisecond precision; truncate so stored and in-memory values compare equal
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
 # Function to store chat message
+@timed("mongo.save_chat_message")
 def save_chat_message(user_id, message, role="user"):
-    chat_collection.update_one(
-        {"user_id": user_id},
-        {"$push": {"chat": {"role": role, "message": message}}},
+    """
+    Append a message to the user's open chat page, starting a new page when it is full
+
+    Each append touches one bounded page, however long the history is.
+    Starting a page also compacts the history down to CHAT_MAX_BUCKETS pages.
+    """
+    now = _utcnow()
+    result = chat_collection.update_one(
+        {"user_id": user_id, "count": {"$lt": CHAT_BUCKET_SIZE}},
+        {
+            "$push": {"messages": {"role": role, "message": message, "ts": now}},
+            "$inc": {"count": 1},
+            "$set": {"last_ts": now},
+            "$setOnInsert": {"ts": now}
+        },
         upsert=True
     )
+    if result.upserted_id is not None and CHAT_MAX_BUCKETS:
+        compact_chat_history(user_id, CHAT_MAX_BUCKETS)
+
+def _bucket_messages(buckets):
+    messages = [message for bucket in buckets for message in bucket.get("messages", [])]
+    # Pages started concurrently can interleave, so order by message time
+    messages.sort(key=lambda message: message["ts"])
+    return messages
+
+# Function to fetch the most recent chat messages
+@timed("mongo.get_chat_history")
+def get_chat_history(user_id, limit=CHAT_HISTORY_LIMIT):
+    """
+    Return the user's last `limit` messages, oldest first
+
+    Reads only the newest pages, and `$slice` trims each one server-side,
+    so the cost depends on `limit` rather than on the length of the history.
+    """
+    pages = math.ceil(limit / CHAT_BUCKET_SIZE) + 1  # +1: the newest page may be nearly empty
+    buckets = chat_collection.find(
+        {"user_id": user_id},
+        {"_id": 0, "messages": {"$slice": -limit}}
+    ).sort(NEWEST_PAGES_FIRST).limit(pages)
+    return _bucket_messages(buckets)[-limit:]
+
+# Function to page backwards through chat history
+@timed("mongo.get_chat_page")
+def get_chat_page(user_id, before=None, limit=CHAT_HISTORY_LIMIT):
+    """
+    Return up to `limit` messages sent before `before`, oldest first
+
+    Messages are ordered by time, then by their page and position in it, so
+    messages sent within the same millisecond still fall on exactly one page.
+
+    Args:
+        user_id: User whose history to read
+        before: Cursor returned by the previous call; None starts from the newest message
+        limit: Messages per page
+
+    Returns:
+        Tuple (messages, cursor for the next older page or None when there is none)
+    """
+    query = {"user_id": user_id}
+    if before is not None:
+        # Pages ordered as the cursor's own page or older can hold earlier messages
+        ts, page_id, _ = before
+        query["$or"] = [{"ts": {"$lt": ts}}, {"ts": ts, "_id": {"$lte": page_id}}]
+    pages = math.ceil(limit / CHAT_BUCKET_SIZE) + 1
+    buckets = chat_collection.find(query, {"messages": 1}).sort(NEWEST_PAGES_FIRST).limit(pages)
+    keyed = sorted(
+        ((message["ts"], bucket["_id"], position), message)
+        for bucket in buckets
+        for position, message in enumerate(bucket.get("messages", []))
+    )
+    if before is not None:
+        keyed = [(key, message) for key, message in keyed if key < tuple(before)]
+    keyed = keyed[-limit:]
+    # A short page means the history ran out
+    return [message for _, message in keyed], keyed[0][0] if len(keyed) == limit else None
+
+# Function to fetch the summary of compacted chat history
+def get_chat_summary(user_id):
+    summary = chat_summary_collection.find_one({"user_id": user_id}, {"_id": 0, "summary": 1})
+    return summary["summary"] if summary else None
+
+# Function to drop (or summarize) old chat pages
+@timed("mongo.compact_chat_history")
+def compact_chat_history(user_id, keep_buckets=CHAT_MAX_BUCKETS, summarize=None):
+    """
+    Keep only the user's newest `keep_buckets` pages of chat history
+
+    Args:
+        user_id: User whose history to compact
+        keep_buckets: Pages to keep; 0 keeps everything
+        summarize: Optional callable (previous summary or None, list of dropped
+            messages) -> new summary text, stored in the summaries collection
+            so old context survives in condensed form
+
+    Returns:
+        Number of messages removed
+    """
+    if not keep_buckets:
+        return 0
+    oldest_kept = chat_collection.find(
+        {"user_id": user_id}, {"ts": 1}
+    ).sort(NEWEST_PAGES_FIRST).skip(keep_buckets - 1).limit(1)
+    oldest_kept = next(iter(oldest_kept), None)
+    if oldest_kept is None:
+        return 0
+    old = {"user_id": user_id, "ts": {"$lt": oldest_kept["ts"]}}
+
+    if summarize is not None:
+        dropped = _bucket_messages(chat_collection.find(old, {"_id": 0, "messages": 1}))
+        if dropped:
+            try:
+                summary = summarize(get_chat_summary(user_id), dropped)
+                chat_summary_collection.update_one(
+                    {"user_id": user_id},
+                    {"$set": {"summary": summary, "through_ts": dropped[-1]["ts"]}},
+                    upsert=True
+                )
+            except Exception as e:
+                # Keep the pages rather than lose history we failed to summarize
+                logger.error(f"Error summarizing chat history for {user_id}: {str(e)}")
+                return 0
+
+    removed = sum(bucket["count"] for bucket in chat_collection.find(old, {"count": 1}))
+    chat_collection.delete_many(old)
+    return removed
+
+# Function to move chat history from the old one-document-per-user layout into pages
+def migrate_legacy_chat_history():
+    """
+    Split each legacy {user_id, chat: [...]} document into chat pages
 
-# Function to fetch chat history
-def get_chat_history(user_id):
-    chat = chat_collection.find_one({"user_id": user_id})
-    return chat["chat"] if chat else []
+    Legacy messages carry no timestamps, so they are spread one millisecond
+    apart ending at the legacy document's creation time, which keeps their
+    order. Migrated documents are deleted from the legacy collection,
+    MONGO_LEGACY_CHAT_COLLECTION in MONGO_LEGACY_DB.
 
+    Returns:
+        Number of users migrated
+    """
+    legacy = client[MONGO_LEGACY_DB][MONGO_LEGACY_CHAT_COLLECTION]
+    migrated = 0
+    for doc in legacy.find({}):
+        chat = doc.get("chat", [])
+        start = doc["_id"].generation_time - datetime.timedelta(milliseconds=len(chat))
+        messages = [
+            {"role": m.get("role", "user"), "message": m.get("message"), "ts": start + datetime.timedelta(milliseconds=i)}
+            for i, m in enumerate(chat)
+        ]
+        buckets = [
+            {
+                "user_id": doc["user_id"],
+                "ts": page[0]["ts"],
+                "last_ts": page[-1]["ts"],
+                "count": len(page),
+                "messages": page
+            }
+            for page in (messages[i:i + CHAT_BUCKET_SIZE] for i in range(0, len(messages), CHAT_BUCKET_SIZE))
+        ]
+        if buckets:
+            chat_collection.insert_many(buckets)
+        legacy.delete_one({"_id": doc["_id"]})
+        migrated += 1
+    return migrated
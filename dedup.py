@@ -0,0 +1,192 @@
+# dedup.py
+import functools
+import logging
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAX_HASH = np.uint64((1 << 32) - 1)
+SHINGLE_SIZE = 3  # Words per shingle
+# Multipliers combining word hashes into a shingle hash
+SHINGLE_MIXERS = (np.uint64(0x9E3779B1), np.uint64(0x85EBCA77))
+UNSPECIFIED_LOCATIONS = {"", "remote/not specified", "not specified", "unknown"}
+
+@functools.lru_cache(maxsize=131072)
+def _word_hash(word):
+    return zlib.crc32(word.encode("utf-8"))
+
+def _normalize(text):
+    return re.sub(r"[^\w]+", " ", str(text or "").lower()).strip()
+
+def shingle_hashes(text):
+    """
+    Hash the word 3-grams of `text` into a sorted array of unique uint32 values
+
+    Words are hashed once each (and memoized in a bounded cache, as job text
+    reuses a small vocabulary), then combined into shingle hashes with vectorized NumPy
+    arithmetic. Texts shorter than a shingle hash their words instead.
+    """
+    words = _normalize(text).split()
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    hashes = np.fromiter((_word_hash(w) for w in words), dtype=np.uint64, count=len(words))
+    if len(words) >= SHINGLE_SIZE:
+        hashes = (
+            hashes[:-2] * SHINGLE_MIXERS[0] + hashes[1:-1] * SHINGLE_MIXERS[1] + hashes[2:]
+        ) & MAX_HASH
+    return np.unique(hashes)
+
+class MinHasher:
+    """
+    MinHash signatures over uint32 shingle hashes with `num_perm` hash functions
+
+    Uses multiply-shift hashing, (a * x + b) mod 2^64 keeping the top 32
+    bits, which is universal for odd `a` and needs no modulo by a prime.
+    """
+
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64)
+
+    def signature(self, hashes):
+        """Return the (num_perm,) signature of a shingle-hash array"""
+        if len(hashes) == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        # uint64 arithmetic wraps on overflow, which is the mod 2^64 we want
+        permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) >> np.uint64(32)
+        return permuted.min(axis=1)
+
+def _same_place(a, b):
+    """Whether two clusters' places (a location, or None if unspecified) could be the same posting's"""
+    return a is None or b is None or a == b
+
+def _pick_canonical(group):
+    # Most informative posting wins; the job ID breaks ties so the choice is stable across refreshes
+    return max(group, key=lambda job: (len(job.get("description", "")), -job["job_id"]))
+
+def _merge(group):
+    canonical = dict(_pick_canonical(group))
+    urls = []
+    sources = []
+    for job in group:
+        for url in job.get("source_urls", [job.get("url")]):
+            if url and url != "#" and url not in urls:
+                urls.append(url)
+        for source in job.get("sources", [job.get("source")]):
+            if source and source not in sources:
+                sources.append(source)
+    canonical["source_urls"] = urls
+    canonical["sources"] = sources
+    # Keep the cluster's location even when the canonical posting had none
+    if _normalize(canonical.get("location")) in UNSPECIFIED_LOCATIONS:
+        located = [job for job in group if _normalize(job.get("location")) not in UNSPECIFIED_LOCATIONS]
+        if located:
+            canonical["location"] = located[0]["location"]
+    return canonical
+
+def deduplicate_jobs(jobs, threshold=0.8, num_perm=128, bands=16):
+    """
+    Collapse exact and near-duplicate standardized jobs
+
+    Exact duplicates share a job ID (same posting URL, or same title,
+    company and location when there is no URL). Near duplicates are found
+    with MinHash over word shingles of title, company and description,
+    bucketed by LSH banding so only jobs that collide in some band are ever
+    compared; expected cost is linear in the number of jobs. Candidate
+    pairs are kept when their estimated Jaccard similarity is at least
+    `threshold` and their clusters' locations agree (or one is unspecified),
+    so the same role posted for two cities stays two jobs, even when a
+    posting without a location resembles both.
+
+    Each group of duplicates becomes one canonical job (the one with the
+    longest description) carrying `source_urls` and `sources` merged from
+    the whole group.
+
+    Args:
+        jobs: Standardized job dicts with a job_id
+        threshold: Minimum estimated Jaccard similarity for near duplicates
+        num_perm: MinHash signature length; must be divisible by `bands`
+        bands: LSH bands; more bands find less similar pairs
+
+    Returns:
+        Tuple (deduplicated jobs in first-seen order, stats dict)
+    """
+    # Exact duplicates first: they need no hashing at all
+    by_id = {}
+    for job in jobs:
+        by_id.setdefault(job["job_id"], []).append(job)
+    groups = list(by_id.values())
+    exact_duplicates = len(jobs) - len(groups)
+
+    # Union-find over the exact groups
+    parent = list(range(len(groups)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    hasher = MinHasher(num_perm)
+    rows = num_perm // bands
+    signatures = np.stack([
+        hasher.signature(shingle_hashes(
+            f"{group[0].get('title', '')} {group[0].get('company', '')} {group[0].get('description', '')}"
+        ))
+        for group in groups
+    ]) if groups else np.zeros((0, num_perm), dtype=np.uint64)
+
+    locations = [_normalize(group[0].get("location")) for group in groups]
+    # Each cluster's location, kept at its root; None while the cluster only has unspecified ones
+    places = [None if location in UNSPECIFIED_LOCATIONS else location for location in locations]
+    compared = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        band_values = signatures[:, band * rows:(band + 1) * rows]
+        for i in range(len(groups)):
+            buckets[band_values[i].tobytes()].append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            # Compare each member with the first one at the same location and the
+            # first unlocated one; unlocated members with the first at every location
+            first_at = {}
+            for i in members:
+                place = places[i]
+                first = first_at.setdefault(place, i)
+                if place is None:
+                    candidates = [first] + [j for other, j in first_at.items() if other is not None]
+                else:
+                    candidates = [first, first_at.get(None, i)]
+                for j in candidates:
+                    if j == i or (j, i) in compared:
+                        continue
+                    compared.add((j, i))
+                    root_i, root_j = find(i), find(j)
+                    if root_i == root_j or not _same_place(places[root_i], places[root_j]):
+                        continue
+                    similarity = np.count_nonzero(signatures[i] == signatures[j]) / num_perm
+                    if similarity >= threshold:
+                        parent[root_i] = root_j
+                        places[root_j] = places[root_j] or places[root_i]
+
+    clusters = {}
+    for i, group in enumerate(groups):
+        clusters.setdefault(find(i), []).extend(group)
+    deduplicated = [_merge(group) for group in clusters.values()]
+
+    stats = {
+        "input": len(jobs),
+        "exact_duplicates": exact_duplicates,
+        "near_duplicates": len(groups) - len(deduplicated),
+        "output": len(deduplicated),
+        "dedup_ratio": 1 - len(deduplicated) / len(jobs) if jobs else 0.0,
+        "pairs_compared": len(compared)
+    }
+    return deduplicated, stats
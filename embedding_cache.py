@@ -0,0 +1,199 @@
+# embedding_cache.py
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATABASE_FILE = "embeddings.sqlite"
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different copies of a text share a cache entry"""
+    return re.sub(r"\s+", " ", text).strip()
+
+def make_cache_key(text, model_name, pooling_strategy, max_length):
+    """
+    Build a content-addressed cache key for an embedding
+
+    Args:
+        text: Input text that was embedded
+        model_name: Name of the model producing the embedding
+        pooling_strategy: Pooling strategy used ('mean', 'cls', or 'max')
+        max_length: Token truncation length used
+
+    Returns:
+        Hex digest identifying the embedding
+    """
+    payload = f"{model_name}\x1f{pooling_strategy}\x1f{max_length}\x1f{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    Disk-backed LRU cache of embedding vectors, shared by every process using the directory
+
+    Entries live in a SQLite database in WAL mode: each process opens its
+    own connection, SQLite serialises their writes, and a crash rolls an
+    unfinished write back instead of leaving a key pointing at another
+    key's vector. Each entry carries the time it was last used; eviction
+    deletes the least recently used entries once the database holds more
+    than `max_entries`.
+
+    Writes are buffered. New vectors and the recency of hits are written
+    in one transaction at most every `flush_interval` seconds or
+    `flush_size` entries, and by `flush`. A process looking up a key it
+    put but has not flushed yet is served from its buffer.
+    """
+
+    def __init__(self, cache_dir, max_entries, dimension, flush_interval=5.0, flush_size=256):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.dimension = dimension
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._pending = {}  # key -> vector bytes not yet written
+        self._touched = {}  # key -> last use not yet written
+        self._last_flush = time.monotonic()
+        self._connection = None
+        self._pid = None
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._connect()
+        logger.info(f"Embedding cache opened with {len(self)} entries in {self.cache_dir}")
+
+    @property
+    def _database_path(self):
+        return os.path.join(self.cache_dir, DATABASE_FILE)
+
+    def _connect(self):
+        """(Re)open this process's connection, e.g. in a worker forked after the cache was created"""
+        connection = sqlite3.connect(self._database_path, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB, last_used REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            row = connection.execute("SELECT value FROM meta WHERE name = 'dimension'").fetchone()
+            if row is not None and int(row[0]) != self.dimension:
+                logger.warning("Embedding cache dimension changed, discarding cached vectors")
+                connection.execute("DELETE FROM embeddings")
+            connection.execute("INSERT OR REPLACE INTO meta VALUES ('dimension', ?)", (str(self.dimension),))
+        self._connection = connection
+        self._pid = os.getpid()
+
+    def _db(self):
+        """This process's connection; call before touching the write buffers"""
+        # A connection must not be used across fork: the child opens its own, keeps the
+        # inherited one referenced so closing it can't touch the parent's WAL, and leaves
+        # the parent's buffered writes to the parent
+        if self._pid != os.getpid():
+            self._inherited = self._connection
+            self._pending.clear()
+            self._touched.clear()
+            self._connect()
+        return self._connection
+
+    def get(self, key):
+        """Return a copy of the cached vector for `key`, or None on a miss"""
+        with self._lock:
+            db = self._db()
+            data = self._pending.get(key)
+            if data is None:
+                row = db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                data = row[0] if row is not None else None
+            if data is None:
+                self.misses += 1
+                return None
+            self._touched[key] = time.time()
+            self.hits += 1
+            self._flush_if_due()
+            return np.frombuffer(data, dtype=np.float32).copy()
+
+    def put(self, key, vector):
+        """Store `vector` under `key`; it is written with the next flush"""
+        with self._lock:
+            self._db()
+            self._pending[key] = np.asarray(vector, dtype=np.float32).tobytes()
+            self._touched[key] = time.time()
+            self._flush_if_due()
+
+    def _flush_if_due(self):
+        if (len(self._pending) + len(self._touched) >= self.flush_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not (self._pending or self._touched):
+            return
+        try:
+            with self._db() as connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                    [(key, data, self._touched.get(key, time.time())) for key, data in self._pending.items()]
+                )
+                connection.executemany(
+                    "UPDATE embeddings SET last_used = max(last_used, ?) WHERE key = ?",
+                    [(used, key) for key, used in self._touched.items() if key not in self._pending]
+                )
+                excess = connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    connection.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+                    )
+                    self.evictions += excess
+        except sqlite3.Error as e:
+            # Losing buffered entries only costs re-embedding them
+            logger.error(f"Error writing embedding cache: {str(e)}")
+        self._pending.clear()
+        self._touched.clear()
+
+    def flush(self):
+        """Write buffered vectors and recency to disk"""
+        with self._lock:
+            self._db()
+            self._flush()
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            db = self._db()
+            self._pending.clear()
+            self._touched.clear()
+            with db as connection:
+                connection.execute("DELETE FROM embeddings")
+
+    def stats(self):
+        """Return hit/miss counters and occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": self._count(),
+                "max_entries": self.max_entries
+            }
+
+    def _count(self):
+        stored = self._db().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return stored + len(self._pending)
+
+    def __len__(self):
+        with self._lock:
+            return self._count()
@@ -0,0 +1,155 @@
+# embedding_service.py
+import asyncio
+import logging
+import time
+
+from metrics import Histogram
+from model import batch_get_embeddings
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+QUEUE_DEPTH_BUCKETS = [0, 1, 2, 4, 8, 16, 32, 64, 128, 256]
+WAIT_MS_BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into padded batches
+
+    Callers await `embed(text)`, which enqueues the text and a future. A
+    background task takes the first waiting request, keeps collecting for
+    up to `max_wait` seconds or until `max_batch_size` texts are waiting,
+    and runs them through `batch_get_embeddings` as a single batch on the
+    worker pool. Each caller's future then resolves with its own vector.
+    Under load many requests share one forward pass; at low load a request
+    waits at most `max_wait` longer than it would on its own.
+
+    While a batch runs, the next one keeps collecting. At most
+    `max_in_flight` batches (by default one per pool worker) run at once;
+    when every slot is taken the next batch waits for one, taking in
+    requests that arrive meanwhile up to `max_batch_size`.
+    """
+
+    def __init__(self, pool, max_batch_size=32, max_wait=0.005, pooling_strategy="mean", max_in_flight=None):
+        self.pool = pool
+        self.max_in_flight = max_in_flight or pool.workers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.pooling_strategy = pooling_strategy
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_depths = Histogram(QUEUE_DEPTH_BUCKETS)
+        self.queue_wait_ms = Histogram(WAIT_MS_BUCKETS)
+        self._queue = None
+        self._slots = None
+        self._task = None
+        self._batches = set()
+
+    async def start(self):
+        """Start collecting requests; must be called from the serving event loop"""
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop collecting, finish the batches already taken and fail any requests still queued
+
+        Requests the background task had already taken off the queue for
+        the next batch are embedded like any other batch, so their callers
+        never wait on a future nobody will resolve.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding service stopped"))
+
+    async def embed(self, text):
+        """
+        Embed one text as part of the next batch
+
+        Returns:
+            float32 numpy array of shape (EMBEDDING_DIMENSION,)
+        """
+        if self._task is None:
+            raise RuntimeError("Embedding service is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = []
+            has_slot = False
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                await self._slots.acquire()
+                has_slot = True
+            except asyncio.CancelledError:
+                # Stopped mid-collection: the requests already taken still get embedded
+                if batch:
+                    self._dispatch(batch, has_slot)
+                raise
+            # Take whatever else is already waiting, up to a full batch
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self._dispatch(batch, has_slot)
+
+    def _dispatch(self, batch, has_slot):
+        self.queue_depths.observe(self._queue.qsize())
+        self.batch_sizes.observe(len(batch))
+        task = asyncio.create_task(self._run_batch(batch))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+        if has_slot:
+            task.add_done_callback(lambda _: self._slots.release())
+
+    async def _run_batch(self, batch):
+        started = time.perf_counter()
+        for _, _, enqueued in batch:
+            self.queue_wait_ms.observe((started - enqueued) * 1000)
+        texts = [text for text, _, _ in batch]
+        try:
+            embeddings = await self.pool.run(
+                batch_get_embeddings, texts, self.max_batch_size, self.pooling_strategy
+            )
+        except Exception as e:
+            logger.error(f"Error embedding batch of {len(batch)}: {str(e)}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+    def stats(self):
+        """Return batch-size, queue-depth and queue-wait histograms"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_in_flight": self.max_in_flight,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batch_sizes": self.batch_sizes.snapshot(),
+            "queue_depths": self.queue_depths.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot()
+        }
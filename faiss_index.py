@@ -1,58 +1,871 @@
 import faiss
 import numpy as np
-from model import get_embedding
+import datetime
+import fcntl
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from model import batch_get_embeddings, batch_get_chunk_embeddings
+from job_fetcher import make_job_id
+from job_catalog import JobCatalog
+from bm25_index import BM25Index, job_tokens, reciprocal_rank_fusion
+from job_filters import JobAttributeIndex, active_filters
+from metrics import timed
+from rwlock import ReadWriteLock
+from config import (
+    FAISS_INDEX_TYPE, FAISS_HNSW_M, FAISS_HNSW_EF_CONSTRUCTION, FAISS_HNSW_EF_SEARCH,
+    FAISS_IVF_NLIST, FAISS_IVF_NPROBE, FAISS_PQ_M, FAISS_PQ_NBITS, FAISS_TRAIN_SAMPLE_SIZE,
+    FAISS_SIMILARITY_THRESHOLD, BM25_K1, BM25_B, BM25_MAX_DEAD_FRACTION, HYBRID_CANDIDATES, HYBRID_RRF_K,
+    FILTER_MAX_WIDENING, FILTER_SELECTOR_CACHE_SIZE, FILTER_EXACT_MAX,
+    EMBEDDING_CHUNK_MODE, EMBEDDING_CHUNK_TOKENS, EMBEDDING_CHUNK_OVERLAP, EMBEDDING_MAX_CHUNKS
+)
+
+logger = logging.getLogger(__name__)
 
 # FAISS setup
 dimension = 768  # Dimension of BERT embeddings
-faiss_index = faiss.IndexFlatL2(dimension)  # L2 distance (Euclidean)
-job_list = []  # Store job details for lookup after similarity search
 
-def build_faiss_index(jobs):
+INDEX_FILE = "jobs.index"
+METADATA_FILE = "jobs.json"
+KEYWORDS_FILE = "keywords.npz"
+CURRENT_FILE = "CURRENT"  # Names the live snapshot directory
+LOCK_FILE = ".lock"
+SNAPSHOT_PREFIX = "snapshot-"
+STAGING_PREFIX = ".staging-"
+METRIC = "inner_product"  # Vectors are L2-normalized, so inner product is cosine similarity
+
+def create_faiss_index(index_type=FAISS_INDEX_TYPE, dimension=dimension, nlist=FAISS_IVF_NLIST):
     """
-    Build a FAISS index from job descriptions
+    Create an empty FAISS inner-product index of the configured type
+    
+    Callers must add and query L2-normalized vectors (see `normalize`) so
+    that scores are cosine similarities.
     
     Args:
-        jobs: List of job dictionaries containing description field
+        index_type: "flat" (exact), "hnsw" (graph-based ANN) or "ivfpq"
+            (inverted lists with product-quantized codes, needs training)
+        dimension: Vector dimension
+        nlist: Number of IVF cells for "ivfpq"
+        
+    Returns:
+        FAISS index without ID mapping
+    """
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dimension)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = FAISS_HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = FAISS_HNSW_EF_SEARCH
+        return index
+    if index_type == "ivfpq":
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFPQ(
+            quantizer, dimension, nlist, FAISS_PQ_M, FAISS_PQ_NBITS, faiss.METRIC_INNER_PRODUCT
+        )
+        index.nprobe = FAISS_IVF_NPROBE
+        return index
+    raise ValueError(f"Unknown FAISS index type: {index_type}")
+
+def train_faiss_index(index, vectors, sample_size=FAISS_TRAIN_SAMPLE_SIZE):
+    """Train an index on a random sample of at most `sample_size` vectors"""
+    if len(vectors) > sample_size:
+        rows = np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)
+        vectors = vectors[rows]
+    index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+
+def normalize(vectors):
+    """
+    Return a float32 copy of `vectors` with each row scaled to unit L2 norm
+    
+    Zero rows (e.g. embeddings of invalid text) are left as zeros.
+    """
+    vectors = np.array(vectors, dtype=np.float32)
+    vectors = vectors.reshape(-1, vectors.shape[-1])
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def _search_params(index_type, nprobe=None, ef_search=None, selector=None):
     """
-    global job_list
-    job_list = jobs
+    Per-query search parameters, or None to use the index defaults
     
-    # Create embeddings for all job descriptions
-    embeddings = np.vstack([get_embedding(job["description"]) for job in jobs])
+    A `selector` (a FAISS IDSelector) restricts the search to the job IDs it
+    accepts; IVF and HNSW indexes need `nprobe` / `ef_search` set alongside it.
+    """
+    extra = {"sel": selector} if selector is not None else {}
+    if index_type == "ivfpq" and nprobe is not None:
+        return faiss.SearchParametersIVF(nprobe=nprobe, **extra)
+    if index_type == "hnsw" and ef_search is not None:
+        return faiss.SearchParametersHNSW(efSearch=ef_search, **extra)
+    return faiss.SearchParameters(**extra) if extra else None
+
+def _filter_key(filters):
+    """Hashable form of a filter dict; list values are order-insensitive"""
+    return tuple(sorted(
+        (name, tuple(sorted(value)) if isinstance(value, (list, tuple, set)) else value)
+        for name, value in filters.items()
+    ))
+
+def _content_hash(job):
+    """Hash of the text that gets embedded, used to skip re-embedding unchanged jobs"""
+    text = job.get("description", "")
+    if EMBEDDING_CHUNK_MODE != "truncate":
+        # Changing how texts are chunked changes every vector, so it re-embeds every job
+        text = f"{EMBEDDING_CHUNK_MODE}:{EMBEDDING_CHUNK_TOKENS}/{EMBEDDING_CHUNK_OVERLAP}/{EMBEDDING_MAX_CHUNKS}\x1f{text}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def _job_fingerprint(job_id, content_hash):
+    """64-bit value XORed into JobIndex.version for each indexed job"""
+    return int.from_bytes(hashlib.sha1(f"{job_id}:{content_hash}".encode()).digest()[:8], "big")
+
+class JobIndex:
+    """
+    FAISS index of job embeddings keyed by stable job ID
+    
+    Vectors are L2-normalized before they are added or queried, so the
+    inner-product scores the index returns are cosine similarities.
+
+    Vectors are stored under job IDs (in an IndexIDMap2, or directly in the
+    IVF lists for "ivfpq") so individual jobs can be upserted and deleted
+    without touching the rest of the index. Job metadata is kept in
+    a job ID -> job dict map alongside it. Searches share a read lock, so
+    concurrent searches (e.g. from the inference WorkerPool's threads) run
+    in parallel inside FAISS; mutations take it exclusively, and `swap`
+    replaces the whole state at once so that readers holding a reference
+    to this object always see a consistent index.
     
-    # Add vectors to the index
-    faiss_index.add(embeddings)
+    HNSW graphs cannot remove vectors, so for "hnsw" deleted or replaced
+    vectors stay in the graph as stale entries that search over-fetches past
+    and skips. Each embedding of a job is added under a fresh vector ID
+    mapped back to the job, so a stale vector is recognised by its ID no
+    longer being the job's current one, even while the job itself is live.
+    Rebuilding the index with `build_faiss_index` compacts them.
     
+    Job metadata lives in a JobCatalog, which stores descriptions in a blob
+    that is memory-mapped from the snapshot after `load` or `save`.
+    
+    A BM25 keyword index over titles and descriptions is kept in step with
+    the vectors for `hybrid_search`. It is saved with each snapshot, and
+    rebuilt from the catalog on `load` only for snapshots that lack it.
+    
+    With EMBEDDING_CHUNK_MODE "multi" each job is stored as one vector per
+    token window of its description, all under the job's ID. FAISS returns
+    a job's windows in score order, so keeping the first hit per job scores
+    every job by its best-matching window (max over chunks).
+    
+    Searches can be filtered by location, source and posting date (see
+    `JobAttributeIndex.select`). The filter is applied inside FAISS with an
+    ID selector rather than to the results afterwards, so a selective
+    filter still returns k matches instead of whatever survives of the
+    global top-k. Filters matching only a few jobs skip the index and
+    score those jobs' vectors directly.
+    """
+
+    def __init__(self, dimension=dimension, index_type=FAISS_INDEX_TYPE):
+        self.dimension = dimension
+        self.index_type = index_type
+        self._lock = ReadWriteLock()
+        self._selector_lock = threading.Lock()  # `_selectors` is filled in by concurrent searches
+        self.index = self._new_index()
+        self.jobs = JobCatalog()  # job_id -> job, stored compactly
+        self.keywords = BM25Index(BM25_K1, BM25_B)
+        self.attributes = JobAttributeIndex()  # location/source/date -> job IDs, for filters
+        self._selectors = {}  # filter key -> (matching job IDs, IDSelector), reset on change
+        self._content_hashes = {}  # job_id -> hash of the embedded description
+        self._stale = 0  # vectors left behind by deletes on indexes without remove support
+        # Most vectors any job can have; searches over-fetch by this much to return k distinct jobs
+        self._vectors_per_job = EMBEDDING_MAX_CHUNKS if EMBEDDING_CHUNK_MODE == "multi" else 1
+        self._vector_counts = {}  # job_id -> number of vectors, for jobs with more than one
+        self._fingerprint = 0  # XOR of _job_fingerprint over indexed jobs, see `version`
+        # HNSW only: job_id -> current vector ID, its inverse, and the next unused vector ID
+        self._vector_ids = {}
+        self._vector_owners = {}
+        self._next_vector_id = 0
+
+    def _new_index(self, nlist=FAISS_IVF_NLIST):
+        index = create_faiss_index(self.index_type, self.dimension, nlist)
+        if self.index_type == "ivfpq":
+            # IVF lists store IDs themselves and do not renumber on removal, which an
+            # ID map wrapped around them would assume
+            return index
+        # IndexIDMap2 can also look vectors up by job ID, for exact filtered search
+        return faiss.IndexIDMap2(index)
+
+    def _train(self, embeddings):
+        """Train an IVF-PQ index on the first batch, shrinking it to fit small corpora"""
+        n = len(embeddings)
+        if n < 2 ** FAISS_PQ_NBITS:
+            logger.warning(
+                f"Only {n} vectors to train IVF-PQ ({2 ** FAISS_PQ_NBITS} needed), using a flat index"
+            )
+            self.index_type = "flat"
+            self.index = self._new_index()
+            return
+        # Aim for at least ~39 training points per cell, as FAISS recommends
+        nlist = min(FAISS_IVF_NLIST, max(1, n // 39))
+        self.index = self._new_index(nlist)
+        train_faiss_index(self.index, embeddings)
+        logger.info(f"Trained IVF-PQ index with {nlist} cells on {min(n, FAISS_TRAIN_SAMPLE_SIZE)} vectors")
+
+    def _remove(self, ids):
+        if self.index_type == "hnsw":
+            for job_id in ids.tolist():
+                vector_id = self._vector_ids.pop(job_id, None)
+                if vector_id is not None:
+                    del self._vector_owners[vector_id]
+                    self._stale += self._vector_counts.get(job_id, 1)
+        else:
+            self.index.remove_ids(ids)
+
+    def _add(self, embeddings, job_ids):
+        """
+        Add vectors, one job ID per row (several rows per job when chunked)
+
+        On HNSW the rows are stored under a fresh vector ID per job; other
+        index types store them under the job ID itself.
+        """
+        job_ids = np.asarray(job_ids, dtype=np.int64)
+        if self.index_type == "hnsw":
+            unique, rows = np.unique(job_ids, return_inverse=True)
+            fresh = np.arange(self._next_vector_id, self._next_vector_id + len(unique), dtype=np.int64)
+            self._next_vector_id += len(unique)
+            for job_id, vector_id in zip(unique.tolist(), fresh.tolist()):
+                self._vector_ids[job_id] = vector_id
+                self._vector_owners[vector_id] = job_id
+            job_ids = fresh[rows]
+        self.index.add_with_ids(embeddings, job_ids)
+
+    def _to_vector_ids(self, job_ids):
+        """Current vector IDs of indexed jobs, for ID selectors and reconstruct"""
+        job_ids = np.asarray(job_ids, dtype=np.int64)
+        if self.index_type != "hnsw":
+            return job_ids
+        return np.array([self._vector_ids[job_id] for job_id in job_ids.tolist()], dtype=np.int64)
+
+    def _to_job_ids(self, vector_ids):
+        """Job IDs of search hits, with -1 for padding and for vectors that were superseded or deleted"""
+        if self.index_type != "hnsw":
+            return vector_ids
+        return [self._vector_owners.get(vector_id, -1) for vector_id in vector_ids.tolist()]
+
+    def __len__(self):
+        return len(self.jobs)
+
+    @timed("index.upsert")
+    def upsert(self, jobs):
+        """
+        Add new jobs and update changed ones
+
+        Only jobs that are new or whose description changed are embedded;
+        metadata-only changes just replace the stored job dict.
+
+        Args:
+            jobs: List of job dictionaries containing description field
+
+        Returns:
+            Number of jobs that were (re-)embedded
+        """
+        pending = {}
+        for job in jobs:
+            job_id = job.get("job_id", make_job_id(job))
+            pending[job_id] = dict(job, job_id=job_id)
+
+        with self._lock.read():
+            changed = [
+                job_id for job_id, job in pending.items()
+                if self._content_hashes.get(job_id) != _content_hash(job)
+            ]
+
+        if changed:
+            # Embed and tokenize outside the lock so searches are not blocked on BERT
+            texts = [pending[job_id]["description"] for job_id in changed]
+            if EMBEDDING_CHUNK_MODE == "multi":
+                embeddings, owners = batch_get_chunk_embeddings(texts)
+                row_ids = np.array(changed, dtype=np.int64)[owners]
+                counts = np.bincount(owners, minlength=len(changed))
+            else:
+                embeddings = batch_get_embeddings(texts)
+                row_ids = np.array(changed, dtype=np.int64)
+                counts = np.ones(len(changed), dtype=np.int64)
+            embeddings = normalize(embeddings)
+            ids = np.array(changed, dtype=np.int64)
+            tokens = [job_tokens(pending[job_id]) for job_id in changed]
+
+        with self._lock.write():
+            if changed:
+                # Older ivfpq snapshots wrap the IVF index in an ID map that was
+                # never marked trained, so ask the IVF index itself
+                if self.index_type == "ivfpq" and not faiss.extract_index_ivf(self.index).is_trained:
+                    self._train(embeddings)
+                self._remove(ids)
+                self._add(embeddings, row_ids)
+                for job_id, count in zip(changed, counts.tolist()):
+                    if count > 1:
+                        self._vector_counts[job_id] = int(count)
+                    else:
+                        self._vector_counts.pop(job_id, None)
+                for job_id, job_terms in zip(changed, tokens):
+                    self.keywords.add(job_id, job_terms)
+            for job_id, job in pending.items():
+                self.jobs[job_id] = job
+                self.attributes.add(job_id, job)
+                content_hash = _content_hash(job)
+                previous = self._content_hashes.get(job_id)
+                if previous != content_hash:
+                    if previous is not None:
+                        self._fingerprint ^= _job_fingerprint(job_id, previous)
+                    self._fingerprint ^= _job_fingerprint(job_id, content_hash)
+                self._content_hashes[job_id] = content_hash
+            self._selectors.clear()
+            self._compact_keywords()
+
+        logger.info(f"Upserted {len(pending)} jobs ({len(changed)} embedded), index holds {len(self.jobs)}")
+        return len(changed)
+
+    def delete(self, job_ids):
+        """
+        Remove jobs from the index
+
+        Args:
+            job_ids: Iterable of job IDs to remove
+
+        Returns:
+            Number of jobs removed
+        """
+        with self._lock.write():
+            job_ids = [job_id for job_id in job_ids if job_id in self.jobs]
+            if job_ids:
+                self._remove(np.array(job_ids, dtype=np.int64))
+            for job_id in job_ids:
+                del self.jobs[job_id]
+                self._fingerprint ^= _job_fingerprint(job_id, self._content_hashes.pop(job_id))
+                self._vector_counts.pop(job_id, None)
+                self.keywords.remove(job_id)
+                self.attributes.remove(job_id)
+            if job_ids:
+                self._selectors.clear()
+            self._compact_keywords()
+        return len(job_ids)
+
+    def _compact_keywords(self):
+        """Rebuild the keyword index once too many of its rows are dead"""
+        if self.keywords.dead_fraction > BM25_MAX_DEAD_FRACTION:
+            self.keywords = BM25Index.from_jobs(self.jobs.values(), BM25_K1, BM25_B)
+
+    def sync(self, jobs):
+        """
+        Make the index hold exactly `jobs`
+        
+        Upserts every job (embedding only new or changed descriptions) and
+        deletes indexed jobs that are no longer present.
+        
+        Returns:
+            Tuple (number embedded, number removed)
+        """
+        embedded = self.upsert(jobs)
+        current = {job.get("job_id", make_job_id(job)) for job in jobs}
+        with self._lock.read():
+            missing = [job_id for job_id in self.jobs if job_id not in current]
+        removed = self.delete(missing)
+        return embedded, removed
+
+    @property
+    def version(self):
+        """
+        Stamp of the indexed jobs and their descriptions, for results computed from them
+
+        It only depends on which jobs are indexed with which content, so
+        processes that loaded the same snapshot agree on it and a restart
+        does not change it.
+        """
+        return f"{self._fingerprint:016x}"
+
+    def content_hashes(self):
+        """Copy of job_id -> description hash, to tell later which jobs changed"""
+        with self._lock.read():
+            return dict(self._content_hashes)
+
+    def reconstruct(self, job_ids):
+        """
+        Stored vectors of the given jobs, as an array of shape (len(job_ids), dimension)
+
+        Returns:
+            The vectors, or None when this index cannot give them back (see `_can_reconstruct`)
+        """
+        with self._lock.read():
+            if not self._can_reconstruct():
+                return None
+            return self.index.reconstruct_batch(self._to_vector_ids(job_ids))
+
+    def get_jobs(self, job_ids, version):
+        """
+        Job dicts for stored job IDs, if the index is still at `version`
+
+        Returns:
+            Jobs in the given order (skipping any no longer indexed), or None
+            if the index changed since `version`
+        """
+        with self._lock.read():
+            if self.version != version:
+                return None
+            return [self.jobs[job_id] for job_id in job_ids if job_id in self.jobs]
+
+    @property
+    def stale_fraction(self):
+        """Share of vectors in the index that no longer belong to a live job"""
+        with self._lock.read():
+            return self._stale / self.index.ntotal if self.index.ntotal else 0.0
+
+    @timed("index.search_batch")
+    def search_batch(self, user_embeddings, k=5, nprobe=None, ef_search=None,
+                     min_similarity=FAISS_SIMILARITY_THRESHOLD):
+        """
+        Search for many users at once with a single FAISS call
+
+        Args:
+            user_embeddings: Array of shape (n_users, dimension)
+            k, nprobe, ef_search, min_similarity: As for `search`
+
+        Returns:
+            One list of (similarity, job_dict) tuples per user, in input order
+        """
+        user_embeddings = normalize(user_embeddings)
+
+        with self._lock.read():
+            if self.index.ntotal == 0:
+                return [[] for _ in range(len(user_embeddings))]
+            fetch_k = min(k * self._vectors_per_job + self._stale, self.index.ntotal)
+            params = _search_params(self.index_type, nprobe, ef_search)
+            D, I = self.index.search(user_embeddings, fetch_k, params=params)
+            return [self._collect(D[row], I[row], k, min_similarity) for row in range(len(user_embeddings))]
+
+    @timed("index.hybrid_search_batch")
+    def hybrid_search_batch(self, user_embeddings, query_texts, k=5, candidates=HYBRID_CANDIDATES,
+                            rrf_k=HYBRID_RRF_K, **search_kwargs):
+        """
+        `hybrid_search` for many users, with one batched FAISS call for the vector side
+
+        Returns:
+            One list of (fused score, job_dict) tuples per user, in input order
+        """
+        with self._lock.read():
+            vector_results = self.search_batch(user_embeddings, candidates, **search_kwargs)
+            return [
+                self.fuse(vector_hits, query_text, k, candidates, rrf_k)
+                for vector_hits, query_text in zip(vector_results, query_texts)
+            ]
+
+    def fuse(self, vector_hits, query_text, k=5, candidates=HYBRID_CANDIDATES, rrf_k=HYBRID_RRF_K):
+        """
+        Fuse one user's vector hits with a BM25 search by reciprocal rank
+
+        Args:
+            vector_hits: (similarity, job_dict) tuples from `search_batch`, best first
+
+        Returns:
+            List of tuples (fused score, job_dict), best first
+        """
+        with self._lock.read():
+            vector_ranking = [job["job_id"] for _, job in vector_hits]
+            keyword_ranking = [job_id for _, job_id in self.keywords.search(query_text, candidates)]
+            fused = reciprocal_rank_fusion([vector_ranking, keyword_ranking], rrf_k)[:k]
+            return [(score, self.jobs[job_id]) for score, job_id in fused]
+
+    def _filter_selector(self, filters):
+        """
+        Return (matching job IDs, FAISS ID selector) for a filter dict, cached until the jobs change
+
+        Returns None when the filter does not restrict anything (no values, or only empty ones).
+        """
+        filters = active_filters(filters)
+        if not filters:
+            return None
+        # Relative date filters select different jobs from one day to the next
+        key = (datetime.date.today(), _filter_key(filters))
+        with self._selector_lock:
+            if key not in self._selectors:
+                ids = self.attributes.select(**filters)
+                cached = (ids, faiss.IDSelectorBatch(self._to_vector_ids(ids))) if ids is not None else None
+                if len(self._selectors) >= FILTER_SELECTOR_CACHE_SIZE:
+                    del self._selectors[next(iter(self._selectors))]
+                self._selectors[key] = cached
+            return self._selectors[key]
+
+    @timed("index.search")
+    def search(self, user_embedding, k=5, nprobe=None, ef_search=None,
+               min_similarity=FAISS_SIMILARITY_THRESHOLD, filters=None):
+        """
+        Search for similar jobs given a user embedding
+
+        Args:
+            user_embedding: Numpy array of user preferences embedding
+            k: Number of results to return
+            nprobe: IVF cells to visit for this query ("ivfpq" only)
+            ef_search: HNSW search breadth for this query ("hnsw" only)
+            min_similarity: Drop results with a lower cosine similarity (None keeps all)
+            filters: Keyword arguments for `JobAttributeIndex.select` (location,
+                sources, posted_within_days, include_remote), or None for no filter
+
+        Returns:
+            List of tuples (similarity, job_dict), most similar first
+        """
+        # Normalize so inner-product scores are cosine similarities
+        user_embedding = normalize(user_embedding)
+
+        with self._lock.read():
+            if self.index.ntotal == 0:
+                return []
+            # Over-fetch past stale vectors and extra chunk vectors so k live jobs can still be returned
+            fetch_k = min(k * self._vectors_per_job + self._stale, self.index.ntotal)
+            selection = self._filter_selector(filters)
+            if selection is None:
+                params = _search_params(self.index_type, nprobe, ef_search)
+                D, I = self.index.search(user_embedding, fetch_k, params=params)
+                return self._collect(D[0], I[0], k, min_similarity)
+
+            matching, selector = selection
+            if len(matching) == 0:
+                return []
+            if len(matching) <= FILTER_EXACT_MAX and self._can_reconstruct():
+                # Scoring a few matching vectors directly beats walking the index for them
+                vector_ids = self._to_vector_ids(matching)
+                similarities = self.index.reconstruct_batch(vector_ids) @ user_embedding[0]
+                order = np.argsort(-similarities, kind="stable")[:k]
+                return self._collect(similarities[order], vector_ids[order], k, min_similarity)
+            fetch_k = min(fetch_k, len(matching) * self._vectors_per_job + self._stale)
+            nprobe = nprobe or FAISS_IVF_NPROBE
+            ef_search = ef_search or FAISS_HNSW_EF_SEARCH
+            max_nprobe = faiss.extract_index_ivf(self.index).nlist if self.index_type == "ivfpq" else 0
+            max_ef_search = ef_search * FILTER_MAX_WIDENING
+            # The probed cells and graph neighbourhoods hold proportionally fewer
+            # matches under a selective filter, so visit proportionally more of them
+            widening = min(math.ceil(self.index.ntotal / len(matching)), FILTER_MAX_WIDENING)
+            nprobe = min(max_nprobe, nprobe * widening)
+            ef_search = ef_search * widening
+
+            while True:
+                params = _search_params(self.index_type, nprobe, ef_search, selector)
+                D, I = self.index.search(user_embedding, fetch_k, params=params)
+                # FAISS pads with -1 when the cells or graph nodes it visited held
+                # fewer than fetch_k matches; widen the search and try again
+                exhausted = (
+                    self.index_type == "flat"
+                    or (self.index_type == "ivfpq" and nprobe >= max_nprobe)
+                    or (self.index_type == "hnsw" and ef_search >= max_ef_search)
+                )
+                if I[0][-1] != -1 or exhausted:
+                    return self._collect(D[0], I[0], k, min_similarity)
+                nprobe = min(max_nprobe, nprobe * 4)
+                ef_search = min(max_ef_search, ef_search * 4)
+
+    def _can_reconstruct(self):
+        # IVF-PQ only keeps compressed codes, snapshots from before IndexIDMap2 have no
+        # reverse map, and a job ID maps to several vectors once jobs are chunked
+        return (self.index_type != "ivfpq" and isinstance(self.index, faiss.IndexIDMap2)
+                and self._vectors_per_job == 1)
+
+    def _collect(self, similarities, vector_ids, k, min_similarity):
+        """Turn raw FAISS results into (similarity, job_dict) pairs for live jobs"""
+        results = []
+        seen = set()
+        for similarity, job_id in zip(similarities, self._to_job_ids(vector_ids)):
+            # Results are sorted by score, so nothing after this can pass
+            if min_similarity is not None and similarity < min_similarity:
+                break
+            # FAISS pads with -1 when fewer than k vectors are found
+            if job_id == -1 or job_id not in self.jobs or job_id in seen:
+                continue
+            seen.add(job_id)
+            results.append((float(similarity), self.jobs[job_id]))
+            if len(results) == k:
+                break
+        return results
+
+    @timed("index.hybrid_search")
+    def hybrid_search(self, user_embedding, query_text, k=5, candidates=HYBRID_CANDIDATES,
+                      rrf_k=HYBRID_RRF_K, **search_kwargs):
+        """
+        Search with both the vector index and BM25 keywords, fused by reciprocal rank
+
+        Exact keyword matches (skills like "Kubernetes" or "Rust") that mean-pooled
+        BERT vectors miss still reach the results through the BM25 ranking.
+
+        Args:
+            user_embedding: Numpy array of user preferences embedding
+            query_text: Keyword query, e.g. the user's skills and preferences
+            k: Number of results to return
+            candidates: Results taken from each ranking before fusion
+            rrf_k: Reciprocal-rank fusion constant
+            **search_kwargs: Passed on to `search` (nprobe, ef_search, min_similarity, filters)
+
+        Returns:
+            List of tuples (fused score, job_dict), best first
+        """
+        with self._lock.read():
+            vector_ranking = [job["job_id"] for _, job in self.search(user_embedding, candidates, **search_kwargs)]
+            selection = self._filter_selector(search_kwargs.get("filters"))
+            allowed = selection[0] if selection is not None else None
+            keyword_ranking = [job_id for _, job_id in self.keywords.search(query_text, candidates, allowed)]
+            fused = reciprocal_rank_fusion([vector_ranking, keyword_ranking], rrf_k)[:k]
+            return [(score, self.jobs[job_id]) for score, job_id in fused]
+
+    def swap(self, other):
+        """Atomically replace this index's contents with those of another JobIndex"""
+        with self._lock.write(), other._lock.write():
+            self.index_type = other.index_type
+            self.index = other.index
+            self.jobs = other.jobs
+            self.keywords = other.keywords
+            self.attributes = other.attributes
+            self._selectors = {}
+            self._content_hashes = other._content_hashes
+            self._stale = other._stale
+            self._vectors_per_job = other._vectors_per_job
+            self._vector_counts = other._vector_counts
+            self._fingerprint = other._fingerprint
+            self._vector_ids = other._vector_ids
+            self._vector_owners = other._vector_owners
+            self._next_vector_id = other._next_vector_id
+
+    def clear(self):
+        """Reset the index and job metadata in place"""
+        with self._lock.write():
+            self.index = self._new_index()
+            self.jobs = JobCatalog()
+            self.keywords = BM25Index(BM25_K1, BM25_B)
+            self.attributes = JobAttributeIndex()
+            self._selectors = {}
+            self._content_hashes = {}
+            self._stale = 0
+            self._vector_counts = {}
+            self._fingerprint = 0
+            self._vector_ids = {}
+            self._vector_owners = {}
+            self._next_vector_id = 0
+
+    @timed("index.save")
+    def save(self, directory):
+        """
+        Persist the index and its job metadata as a new snapshot
+
+        All files go into a staging directory private to this call, which is
+        renamed to snapshot-<version>-<suffix> and made live by atomically
+        replacing the CURRENT file that names it. A crash mid-save therefore
+        leaves the previous snapshot live, and processes saving to the same
+        directory never mix their files; the last one to publish wins.
+
+        Files are written under the read lock, so searches carry on while
+        only mutations wait. The job catalog is then reopened on the
+        compacted description blob, dropping descriptions that were replaced
+        or deleted since the last save; that swap alone takes the write lock,
+        and is skipped if the catalog changed in between.
+
+        Returns:
+            Path of the snapshot directory that was published
+        """
+        os.makedirs(directory, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=directory)
+        try:
+            with self._lock.read():
+                catalog = self.jobs
+                modifications = catalog.modifications
+                version = self.version
+                rows, blob_size = self._write_snapshot(staging)
+            name = f"{SNAPSHOT_PREFIX}{version}-{os.path.basename(staging)[len(STAGING_PREFIX):]}"
+            snapshot = os.path.join(directory, name)
+            with _snapshot_lock(directory, fcntl.LOCK_EX):
+                os.rename(staging, snapshot)
+                _publish_snapshot(directory, name)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        compacted = JobCatalog.load(snapshot, rows, blob_size)
+        with self._lock.write():
+            if self.jobs is catalog and catalog.modifications == modifications:
+                self.jobs = compacted
+        logger.info(f"Saved FAISS index with {len(rows)} jobs to {snapshot}")
+        return snapshot
+
+    def _write_snapshot(self, staging):
+        faiss.write_index(self.index, os.path.join(staging, INDEX_FILE))
+        rows, blob_size = self.jobs.save(staging)
+        JobCatalog.commit_save(staging)
+        self.keywords.save(os.path.join(staging, KEYWORDS_FILE))
+        with open(os.path.join(staging, METADATA_FILE), "w") as f:
+            json.dump({
+                "dimension": self.dimension,
+                "index_type": self.index_type,
+                "metric": METRIC,
+                "stale": self._stale,
+                "vectors_per_job": self._vectors_per_job,
+                "vector_counts": {str(k): v for k, v in self._vector_counts.items()},
+                "catalog": rows,
+                "blob_size": blob_size,
+                "content_hashes": {str(k): v for k, v in self._content_hashes.items()},
+                "vector_ids": {str(k): v for k, v in self._vector_ids.items()},
+                "next_vector_id": self._next_vector_id
+            }, f)
+        return rows, blob_size
+
+    @timed("index.load")
+    def load(self, directory, mmap=False):
+        """
+        Load the live index snapshot written by `save` and swap it in
+
+        The snapshot is read under a shared lock, so a concurrent `save`
+        cannot delete it halfway through. Directories holding a snapshot from
+        before versioned snapshot directories are read as they are.
+
+        Args:
+            directory: Directory `save` wrote to
+            mmap: Memory-map index data instead of reading it into RAM where supported
+
+        Returns:
+            True if a snapshot was loaded, False if none exists
+        """
+        if not os.path.isdir(directory):
+            return False
+        with _snapshot_lock(directory, fcntl.LOCK_SH):
+            loaded = self._read_snapshot(directory, mmap)
+        if loaded is None:
+            return False
+        if loaded.keywords is None:
+            # Snapshots from before keyword postings were saved re-tokenize every job
+            loaded.keywords = BM25Index.from_jobs(loaded.jobs.values(), BM25_K1, BM25_B)
+        for job in loaded.jobs.values():
+            loaded.attributes.add(job["job_id"], job)
+        self.swap(loaded)
+        logger.info(f"Loaded FAISS index with {len(self.jobs)} jobs from {directory}")
+        return True
+
+    @staticmethod
+    def _read_snapshot(directory, mmap):
+        snapshot = os.path.join(directory, current_snapshot(directory) or "")
+        index_path = os.path.join(snapshot, INDEX_FILE)
+        metadata_path = os.path.join(snapshot, METADATA_FILE)
+        if not (os.path.exists(index_path) and os.path.exists(metadata_path)):
+            return None
+
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+        if metadata.get("metric") != METRIC:
+            logger.warning(f"Ignoring FAISS snapshot in {snapshot} built with a different metric")
+            return None
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP if mmap else 0)
+
+        loaded = JobIndex(metadata["dimension"], metadata.get("index_type", "flat"))
+        loaded.index = index
+        loaded._stale = metadata.get("stale", 0)
+        if loaded.index_type == "ivfpq" and isinstance(index, faiss.IndexIDMap2):
+            # Earlier ivfpq snapshots map IDs by position, which removals desynchronize;
+            # counting every vector stale makes the next refresh rebuild the index
+            logger.warning(f"IVF-PQ snapshot in {snapshot} predates direct IDs, it will be rebuilt")
+            loaded._stale = index.ntotal
+        # Jobs embedded under an earlier chunk mode keep their vectors until they are re-embedded
+        loaded._vectors_per_job = max(loaded._vectors_per_job, metadata.get("vectors_per_job", 1))
+        loaded._vector_counts = {int(k): v for k, v in metadata.get("vector_counts", {}).items()}
+        if "catalog" in metadata:
+            try:
+                loaded.jobs = JobCatalog.load(snapshot, metadata["catalog"], metadata["blob_size"])
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring FAISS snapshot in {snapshot}: {str(e)}")
+                return None
+        else:
+            # Snapshots from before the catalog kept whole job dicts
+            loaded.jobs = JobCatalog.from_jobs(metadata["jobs"])
+        loaded._content_hashes = {int(k): v for k, v in metadata["content_hashes"].items()}
+        for job_id, content_hash in loaded._content_hashes.items():
+            loaded._fingerprint ^= _job_fingerprint(job_id, content_hash)
+        if loaded.index_type == "hnsw":
+            # HNSW snapshots from before per-embedding vector IDs stored vectors under job IDs
+            vector_ids = metadata.get("vector_ids") or {str(job_id): job_id for job_id in loaded._content_hashes}
+            loaded._vector_ids = {int(k): v for k, v in vector_ids.items()}
+            loaded._vector_owners = {v: k for k, v in loaded._vector_ids.items()}
+            loaded._next_vector_id = metadata.get("next_vector_id", 0)
+        keywords_path = os.path.join(snapshot, KEYWORDS_FILE)
+        loaded.keywords = None
+        if os.path.exists(keywords_path):
+            loaded.keywords = BM25Index.load(keywords_path)
+            loaded.keywords.k1, loaded.keywords.b = BM25_K1, BM25_B
+        return loaded
+
+@contextmanager
+def _snapshot_lock(directory, operation):
+    """Hold a shared (fcntl.LOCK_SH) or exclusive (fcntl.LOCK_EX) lock on a snapshot directory across processes"""
+    with open(os.path.join(directory, LOCK_FILE), "a") as f:
+        fcntl.flock(f, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def current_snapshot(directory):
+    """Name of the live snapshot directory under `directory`, or None if there is none"""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def saved_version(directory):
+    """`JobIndex.version` of the live snapshot under `directory`, or None if unknown"""
+    name = current_snapshot(directory)
+    if name is None or not name.startswith(SNAPSHOT_PREFIX):
+        return None
+    return name[len(SNAPSHOT_PREFIX):].split("-", 1)[0]
+
+def _publish_snapshot(directory, name):
+    """Make snapshot `name` the live one and delete the snapshots it replaces; call under the exclusive lock"""
+    current_path = os.path.join(directory, CURRENT_FILE)
+    with open(current_path + ".tmp", "w") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(current_path + ".tmp", current_path)
+    for entry in os.listdir(directory):
+        if entry.startswith(SNAPSHOT_PREFIX) and entry != name:
+            # Processes still mapping files from it keep them until they unmap
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+# Shared index used by the API; mutate it in place rather than rebinding
+job_index = JobIndex()
+
+def build_faiss_index(jobs):
+    """
+    Build a FAISS index from job descriptions
+
+    The new index is built off to the side and then swapped into `job_index`,
+    so searches keep being served from the old one until it is ready.
+
+    Args:
+        jobs: List of job dictionaries containing description field
+    """
+    new_index = JobIndex(dimension, FAISS_INDEX_TYPE)
+    new_index.upsert(jobs)
+    job_index.swap(new_index)
+
     print(f"FAISS index built with {len(jobs)} job listings")
-    return faiss_index
+    return job_index
 
 def search_similar_jobs(user_embedding, k=5):
     """
     Search for similar jobs given a user embedding
-    
+
     Args:
         user_embedding: Numpy array of user preferences embedding
         k: Number of results to return
-        
+
     Returns:
-        List of tuples (distance, job_dict)
+        List of tuples (similarity, job_dict)
     """
-    # Reshape to ensure correct dimensions
-    if len(user_embedding.shape) == 1:
-        user_embedding = user_embedding.reshape(1, -1)
-        
-    # Ensure type is float32 as required by FAISS
-    user_embedding = user_embedding.astype(np.float32)
-    
-    # Search for similar vectors
-    D, I = faiss_index.search(user_embedding, k)
-    
-    # Return job details with distances
-    results = [(D[0][i], job_list[idx]) for i, idx in enumerate(I[0])]
-    return results
+    return job_index.search(user_embedding, k)
 
 def clear_index():
     """Reset the FAISS index and job list"""
-    global faiss_index, job_list
-    faiss_index = faiss.IndexFlatL2(dimension)
-    job_list = []
+    job_index.clear()
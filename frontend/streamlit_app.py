@@ -30,28 +30,60 @@ with st.sidebar:
             st.error("Failed to save profile")
 
 # Job recommendations
+def stream_events(response):
+    """Parse a server-sent event stream into (event, data) pairs"""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+def show_job_matches(jobs):
+    st.subheader("Top Job Matches")
+    for i, job in enumerate(jobs, 1):
+        with st.expander(f"{i}. {job.get('title')} at {job.get('company', 'Company')}"):
+            st.write(f"**Location:** {job.get('location', 'Not specified')}")
+            st.write(f"**Description:** {job.get('description', 'No description available')}")
+            if 'url' in job:
+                st.markdown(f"[Apply Now]({job['url']})")
+
 st.header("Job Recommendations")
 if st.button("Get Personalized Recommendations"):
     if not user_id:
         st.warning("Please enter your User ID")
     else:
+        # Reserve the analysis slot above the matches so it fills in as tokens arrive
+        st.subheader("AI Job Match Analysis")
+        analysis_placeholder = st.empty()
+        matches_container = st.container()
+        
         with st.spinner("Finding the perfect jobs for you..."):
-            response = requests.get(f"http://127.0.0.1:8000/recommendations/{user_id}")
+            response = requests.get(
+                f"http://127.0.0.1:8000/recommendations/{user_id}/stream",
+                stream=True,
+                timeout=(5, 120)
+            )
             
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Display Claude's analysis
-                st.subheader("AI Job Match Analysis")
-                st.write(data.get("claude_analysis", "No analysis available"))
-                
-                # Display job recommendations
-                st.subheader("Top Job Matches")
-                for i, job in enumerate(data.get("recommendations", []), 1):
-                    with st.expander(f"{i}. {job.get('title')} at {job.get('company', 'Company')}"):
-                        st.write(f"**Location:** {job.get('location', 'Not specified')}")
-                        st.write(f"**Description:** {job.get('description', 'No description available')}")
-                        if 'url' in job:
-                            st.markdown(f"[Apply Now]({job['url']})")
-            else:
-                st.error("Failed to get recommendations. Please ensure your profile is saved.")
+        if response.status_code == 200:
+            analysis = ""
+            for event, data in stream_events(response):
+                if event == "recommendations":
+                    with matches_container:
+                        show_job_matches(data.get("recommendations", []))
+                    analysis_placeholder.info("Analyzing your matches...")
+                elif event == "analysis":
+                    analysis += data.get("text", "")
+                    analysis_placeholder.markdown(analysis + "▌")
+                elif event == "error":
+                    st.error(f"AI analysis failed: {data.get('detail', 'unknown error')}")
+                    break
+            analysis_placeholder.markdown(analysis or "No analysis available")
+        else:
+            st.error("Failed to get recommendations. Please ensure your profile is saved.")
@@ -0,0 +1,130 @@
+# inference_backends.py
+import logging
+import os
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+class TorchBackend:
+    """Full-precision PyTorch forward pass"""
+
+    name = "torch"
+
+    def __init__(self, model):
+        self.model = model.eval()
+
+    def __call__(self, inputs):
+        """
+        Run the encoder
+
+        Args:
+            inputs: Dict of tokenizer tensors (input_ids, attention_mask, ...)
+
+        Returns:
+            Tensor of shape (batch, seq_len, hidden) with the last hidden states
+        """
+        with torch.no_grad():
+            return self.model(**inputs).last_hidden_state
+
+class QuantizedTorchBackend(TorchBackend):
+    """
+    PyTorch with dynamic int8 quantization of the Linear layers
+
+    Weights are quantized once up front and activations on the fly, which
+    speeds up the matmuls that dominate BERT on CPU without a calibration set.
+    The Linear layers are swapped in place so their fp32 weights are freed;
+    the model passed in must not be used as an fp32 model afterwards.
+    """
+
+    name = "torch-int8"
+
+    def __init__(self, model):
+        quantized = torch.quantization.quantize_dynamic(
+            model.eval(), {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+        super().__init__(quantized)
+
+class OnnxBackend:
+    """
+    ONNX Runtime execution of the exported encoder graph
+
+    The model is exported to `onnx_path` on first use with dynamic batch and
+    sequence axes, and reused from there on later starts, which need no
+    PyTorch model at all.
+    """
+
+    name = "onnx"
+    INPUT_NAMES = ["input_ids", "attention_mask"]
+
+    def __init__(self, model, onnx_path, num_threads=None):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("The onnx backend needs the onnxruntime package") from e
+
+        if not os.path.exists(onnx_path):
+            if model is None:
+                raise ValueError(f"No exported encoder at {onnx_path} and no model to export")
+            self.export(model, onnx_path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+    @classmethod
+    def export(cls, model, onnx_path):
+        """Export the encoder's last hidden state to an ONNX graph"""
+        os.makedirs(os.path.dirname(onnx_path) or ".", exist_ok=True)
+        dummy = torch.ones((1, 8), dtype=torch.long)
+        tmp_path = onnx_path + ".tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                model.eval(),
+                (dummy, torch.ones_like(dummy)),
+                tmp_path,
+                input_names=cls.INPUT_NAMES,
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "last_hidden_state": {0: "batch", 1: "sequence"}
+                },
+                opset_version=14
+            )
+        os.replace(tmp_path, onnx_path)
+        logger.info(f"Exported ONNX encoder to {onnx_path}")
+
+    def __call__(self, inputs):
+        feeds = {name: inputs[name].numpy().astype(np.int64, copy=False) for name in self.INPUT_NAMES}
+        (last_hidden_state,) = self.session.run(["last_hidden_state"], feeds)
+        return torch.from_numpy(last_hidden_state)
+
+def needs_model(name, onnx_path=None):
+    """Whether building backend `name` needs the fp32 transformers model loaded"""
+    return name != "onnx" or not onnx_path or not os.path.exists(onnx_path)
+
+def create_backend(name, model, onnx_path=None, num_threads=None):
+    """
+    Build the inference backend called `name`
+
+    Args:
+        name: One of BACKENDS ("torch", "torch-int8" or "onnx")
+        model: Loaded fp32 transformers model the backend is derived from, or
+            None when needs_model() says it isn't needed. "torch-int8"
+            quantizes it in place.
+        onnx_path: Where the exported ONNX graph lives ("onnx" only)
+        num_threads: ONNX Runtime intra-op threads ("onnx" only)
+    """
+    if name == "torch":
+        return TorchBackend(model)
+    if name == "torch-int8":
+        return QuantizedTorchBackend(model)
+    if name == "onnx":
+        return OnnxBackend(model, onnx_path, num_threads)
+    raise ValueError(f"Unknown inference backend: {name}")
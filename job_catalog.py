@@ -0,0 +1,187 @@
+# job_catalog.py
+import mmap
+import os
+import sys
+
+DESCRIPTIONS_FILE = "descriptions.bin"
+
+# Standardized job fields stored in their own slots; anything else goes in `extra`
+FIELDS = ("title", "company", "location", "url", "date_posted", "source")
+# Low-cardinality fields shared by many postings, stored once per distinct value
+INTERNED_FIELDS = ("company", "location", "source", "date_posted")
+
+class JobRecord:
+    """One posting without its description, which lives in the catalog's blob"""
+
+    __slots__ = FIELDS + ("job_id", "desc_offset", "desc_length", "extra")
+
+    def __init__(self, job_id, fields, desc_offset, desc_length, extra=None):
+        self.job_id = job_id
+        for name in FIELDS:
+            value = fields.get(name)
+            if name in INTERNED_FIELDS and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, name, value)
+        self.desc_offset = desc_offset
+        self.desc_length = desc_length
+        self.extra = extra or None
+
+class JobCatalog:
+    """
+    Compact job store keyed by job ID (the FAISS vector ID)
+
+    Postings are kept as `__slots__` records with interned company,
+    location, source and date strings. Descriptions, the bulk of each
+    posting, are UTF-8 bytes in a blob addressed by (offset, length): the
+    part loaded from a snapshot is a read-only memory map of the snapshot's
+    blob file, and descriptions added since then go into an in-memory
+    append buffer. Replaced or deleted descriptions leave garbage behind
+    until the next `save`, which writes only live descriptions.
+
+    Lookups by job ID are a dict access; a job dict is materialized (and
+    its description decoded) only when asked for, so search only pays for
+    the k postings it returns. The mapping interface (`[]`, `get`, `in`,
+    `len`, iteration over job IDs, `values`) mirrors the dict it replaces.
+    """
+
+    def __init__(self):
+        self._records = {}  # job_id -> JobRecord
+        self._base = None  # mmap of the snapshot blob, or None
+        self._base_length = 0
+        self._buffer = bytearray()  # descriptions added since the snapshot
+        self.modifications = 0  # bumped on every change, to tell whether a saved copy is current
+
+    def _append_description(self, data):
+        offset = self._base_length + len(self._buffer)
+        self._buffer += data
+        return offset, len(data)
+
+    def description_bytes(self, job_id):
+        """
+        Return a zero-copy memoryview of a job's UTF-8 description
+
+        Release the view before the catalog is modified again; a live view
+        of the append buffer stops it from growing.
+        """
+        record = self._records[job_id]
+        start, end = record.desc_offset, record.desc_offset + record.desc_length
+        if start >= self._base_length:
+            return memoryview(self._buffer)[start - self._base_length:end - self._base_length]
+        return memoryview(self._base)[start:end]
+
+    def _materialize(self, record):
+        job = {name: getattr(record, name) for name in FIELDS}
+        job["description"] = str(self.description_bytes(record.job_id), "utf-8")
+        job["job_id"] = record.job_id
+        if record.extra:
+            job.update(record.extra)
+        return job
+
+    def __setitem__(self, job_id, job):
+        description = job.get("description", "").encode("utf-8")
+        existing = self._records.get(job_id)
+        if existing is not None and self.description_bytes(job_id) == description:
+            # Metadata-only update: keep pointing at the stored description
+            offset, length = existing.desc_offset, existing.desc_length
+        else:
+            offset, length = self._append_description(description)
+        extra = {
+            key: value for key, value in job.items()
+            if key not in FIELDS and key not in ("description", "job_id")
+        }
+        self._records[job_id] = JobRecord(job_id, job, offset, length, extra)
+        self.modifications += 1
+
+    def __getitem__(self, job_id):
+        return self._materialize(self._records[job_id])
+
+    def get(self, job_id, default=None):
+        record = self._records.get(job_id)
+        return self._materialize(record) if record is not None else default
+
+    def __delitem__(self, job_id):
+        del self._records[job_id]
+        self.modifications += 1
+
+    def __contains__(self, job_id):
+        return job_id in self._records
+
+    def __iter__(self):
+        return iter(list(self._records))
+
+    def __len__(self):
+        return len(self._records)
+
+    def keys(self):
+        return list(self._records)
+
+    def values(self):
+        """Yield every job as a dict"""
+        for record in list(self._records.values()):
+            yield self._materialize(record)
+
+    @classmethod
+    def from_jobs(cls, jobs):
+        """Build a catalog from job dicts that carry a job_id"""
+        catalog = cls()
+        for job in jobs:
+            catalog[job["job_id"]] = job
+        return catalog
+
+    def save(self, directory):
+        """
+        Write live descriptions, compacted, to a temporary blob file
+
+        The caller stores the returned rows with the rest of the snapshot and
+        renames the blob into place with `commit_save`.
+
+        Returns:
+            Tuple (records as JSON-serializable lists in blob order, blob size in bytes)
+        """
+        blob_path = os.path.join(directory, DESCRIPTIONS_FILE)
+        rows = []
+        offset = 0
+        with open(blob_path + ".tmp", "wb") as f:
+            for record in self._records.values():
+                data = self.description_bytes(record.job_id)
+                f.write(data)
+                rows.append(
+                    [record.job_id] + [getattr(record, name) for name in FIELDS]
+                    + [offset, record.desc_length, record.extra]
+                )
+                offset += record.desc_length
+        return rows, offset
+
+    @staticmethod
+    def commit_save(directory):
+        """Rename the blob written by `save` into place"""
+        blob_path = os.path.join(directory, DESCRIPTIONS_FILE)
+        os.replace(blob_path + ".tmp", blob_path)
+
+    @classmethod
+    def load(cls, directory, rows, blob_size):
+        """
+        Rebuild a catalog from rows written by `save`, memory-mapping the blob file
+
+        Raises:
+            ValueError: If the blob file is not the `blob_size` bytes the rows were saved against
+        """
+        catalog = cls()
+        blob_path = os.path.join(directory, DESCRIPTIONS_FILE)
+        if os.path.getsize(blob_path) != blob_size:
+            raise ValueError(f"{blob_path} does not match the saved job records")
+        if blob_size > 0:
+            with open(blob_path, "rb") as f:
+                catalog._base = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            catalog._base_length = len(catalog._base)
+        for row in rows:
+            job_id = row[0]
+            fields = dict(zip(FIELDS, row[1:1 + len(FIELDS)]))
+            offset, length, extra = row[1 + len(FIELDS):]
+            catalog._records[job_id] = JobRecord(job_id, fields, offset, length, extra)
+        return catalog
+
+    def blob_garbage(self):
+        """Bytes of replaced or deleted descriptions still held in the blob"""
+        live = sum(record.desc_length for record in self._records.values())
+        return self._base_length + len(self._buffer) - live
@@ -1,22 +1,62 @@
+import asyncio
+import random
 import requests
+import httpx
 from bs4 import BeautifulSoup
 import json
 import time
+import hashlib
+import itertools
 import logging
-from config import API_KEYS
+from config import (
+    API_KEYS, JOB_API_URLS, JOB_FETCH_TIMEOUT, JOB_SOURCE_DEADLINE, JOB_FETCH_RETRIES,
+    JOB_FETCH_BACKOFF, JOB_FETCH_CONCURRENCY, JOB_FETCH_MAX_PAGES,
+    JOB_DEDUP_ENABLED, JOB_DEDUP_THRESHOLD, JOB_DEDUP_NUM_PERM, JOB_DEDUP_BANDS
+)
+from dedup import deduplicate_jobs
+from metrics import timed
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Responses worth retrying; anything else is returned or raised immediately
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class JobSourceError(Exception):
+    """Raised when a job source keeps failing after all retries"""
+
 def fetch_jobs_from_apis(keywords=None, location=None, limit=100):
     """
     Fetch jobs from multiple APIs based on keywords and location
     
+    Synchronous wrapper around `fetch_jobs_from_apis_async` for callers
+    that are not already running an event loop.
+    
+    Args:
+        keywords: Job search keywords (e.g., "software engineer")
+        location: Job location (e.g., "New York")
+        limit: Maximum number of jobs to return
+        
+    Returns:
+        List of job dictionaries
+    """
+    return asyncio.run(fetch_jobs_from_apis_async(keywords, location, limit))
+
+async def fetch_jobs_from_apis_async(keywords=None, location=None, limit=100, client=None):
+    """
+    Fetch jobs from all APIs concurrently
+    
+    Every source runs at the same time over one pooled HTTP client, each
+    bounded by JOB_SOURCE_DEADLINE. A source that fails or times out only
+    loses its own remaining pages; whatever it fetched before that, and
+    everything from the other sources, is still returned.
+    
     Args:
         keywords: Job search keywords (e.g., "software engineer")
         location: Job location (e.g., "New York")
         limit: Maximum number of jobs to return
+        client: Optional httpx.AsyncClient to reuse; one is created otherwise
         
     Returns:
         List of job dictionaries
@@ -24,9 +64,6 @@ def fetch_jobs_from_apis(keywords=None, location=None, limit=100):
     if keywords is None:
         keywords = "software developer"
         
-    all_jobs = []
-    
-    # Try each API source and handle potential failures gracefully
     apis = [
         fetch_from_jooble,
         fetch_from_careerjet,
@@ -34,18 +71,46 @@ def fetch_jobs_from_apis(keywords=None, location=None, limit=100):
         fetch_from_web3career
     ]
     
-    for api_func in apis:
-        try:
-            jobs = api_func(keywords, location)
-            all_jobs.extend(jobs)
+    owns_client = client is None
+    if owns_client:
+        client = httpx.AsyncClient(
+            timeout=JOB_FETCH_TIMEOUT,
+            limits=httpx.Limits(max_connections=JOB_FETCH_CONCURRENCY * len(apis))
+        )
+        
+    # Each source appends to its own list so partial results survive a timeout
+    results = {api_func.__name__: [] for api_func in apis}
+    try:
+        outcomes = await asyncio.gather(*(
+            asyncio.wait_for(
+                api_func(client, keywords, location, limit, results[api_func.__name__]),
+                JOB_SOURCE_DEADLINE
+            )
+            for api_func in apis
+        ), return_exceptions=True)
+    finally:
+        if owns_client:
+            await client.aclose()
+    
+    for api_func, outcome in zip(apis, outcomes):
+        jobs = results[api_func.__name__]
+        if isinstance(outcome, asyncio.TimeoutError):
+            logger.error(f"Timed out fetching from {api_func.__name__}, keeping {len(jobs)} jobs")
+        elif isinstance(outcome, Exception):
+            logger.error(f"Error fetching from {api_func.__name__}: {str(outcome)}, keeping {len(jobs)} jobs")
+        else:
             logger.info(f"Retrieved {len(jobs)} jobs from {api_func.__name__}")
-        except Exception as e:
-            logger.error(f"Error fetching from {api_func.__name__}: {str(e)}")
+    
+    # Take the sources in turn so the first one cannot fill the whole limit
+    all_jobs = [
+        job for jobs in itertools.zip_longest(*results.values())
+        for job in jobs if job is not None
+    ]
     
     # If no jobs found from APIs, try web scraping as fallback
     if len(all_jobs) == 0:
         logger.warning("No jobs found from APIs, trying web scraping fallback")
-        all_jobs = scrape_jobs_from_public_sites(keywords, location)
+        all_jobs = await asyncio.to_thread(scrape_jobs_from_public_sites, keywords, location)
         
     # Standardize job format and remove duplicates
     standardized_jobs = standardize_job_data(all_jobs)
@@ -53,34 +118,92 @@ def fetch_jobs_from_apis(keywords=None, location=None, limit=100):
     # Return requested number of jobs
     return standardized_jobs[:limit]
 
-def fetch_from_jooble(keywords, location=None):
+async def _request_json(client, source, semaphore, method, url, **kwargs):
+    """
+    Send one request and decode its JSON body, retrying transient failures
+    
+    Network errors, timeouts and RETRYABLE_STATUS_CODES are retried up to
+    JOB_FETCH_RETRIES times with exponential backoff and full jitter. The
+    semaphore caps concurrent requests per source.
+    """
+    for attempt in range(JOB_FETCH_RETRIES + 1):
+        try:
+            async with semaphore:
+                response = await client.request(method, url, **kwargs)
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                response.raise_for_status()
+                return response.json()
+            error = f"HTTP {response.status_code}"
+        except httpx.TransportError as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            
+        if attempt == JOB_FETCH_RETRIES:
+            raise JobSourceError(f"{source} failed after {attempt + 1} attempts: {error}")
+        delay = random.uniform(0, JOB_FETCH_BACKOFF * 2 ** attempt)
+        logger.warning(f"{source} request failed ({error}), retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+async def _fetch_pages(source, fetch_page, limit, out, max_pages=JOB_FETCH_MAX_PAGES):
+    """
+    Collect pages from a paginated source into `out`
+    
+    Pages are requested in waves of JOB_FETCH_CONCURRENCY until a page comes
+    back empty, `limit` jobs have been collected, or `max_pages` is reached.
+    
+    Args:
+        source: Source name used in log messages
+        fetch_page: Coroutine function taking a 1-based page number and returning a list of jobs
+        limit: Stop after collecting this many jobs
+        out: List the fetched jobs are appended to
+        max_pages: Maximum number of pages to request
+    """
+    page = 1
+    while page <= max_pages and len(out) < limit:
+        wave = range(page, min(page + JOB_FETCH_CONCURRENCY, max_pages + 1))
+        pages = await asyncio.gather(*(fetch_page(p) for p in wave), return_exceptions=True)
+        
+        errors = [result for result in pages if isinstance(result, Exception)]
+        for result in pages:
+            if not isinstance(result, Exception):
+                out.extend(result)
+        if errors:
+            if len(errors) == len(pages):
+                raise errors[0]
+            logger.error(f"{source}: {len(errors)} pages failed, stopping pagination: {str(errors[0])}")
+            return
+        if any(len(result) == 0 for result in pages):
+            return
+        page = wave.stop
+
+@timed("fetch.jooble")
+async def fetch_from_jooble(client, keywords, location=None, limit=100, out=None):
     """Fetch jobs from Jooble API"""
+    out = [] if out is None else out
     if not API_KEYS.get('jooble'):
         logger.warning("Jooble API key not found, skipping")
-        return []
+        return out
         
     params = {"keywords": keywords}
     if location:
         params["location"] = location
         
-    try:
-        jooble_url = f"https://jooble.org/api/{API_KEYS['jooble']}"
-        response = requests.post(jooble_url, json=params)
-        
-        if response.status_code == 200:
-            return response.json().get("jobs", [])
-        else:
-            logger.error(f"Jooble API error: {response.status_code}")
-            return []
-    except Exception as e:
-        logger.error(f"Jooble API exception: {str(e)}")
-        return []
+    jooble_url = f"{JOB_API_URLS['jooble']}/{API_KEYS['jooble']}"
+    semaphore = asyncio.Semaphore(JOB_FETCH_CONCURRENCY)
+    
+    async def fetch_page(page):
+        data = await _request_json(client, "Jooble", semaphore, "POST", jooble_url, json=dict(params, page=page))
+        return data.get("jobs", [])
+    
+    await _fetch_pages("Jooble", fetch_page, limit, out)
+    return out
 
-def fetch_from_careerjet(keywords, location=None):
+@timed("fetch.careerjet")
+async def fetch_from_careerjet(client, keywords, location=None, limit=100, out=None):
     """Fetch jobs from CareerJet API"""
+    out = [] if out is None else out
     if not API_KEYS.get('careerjet'):
         logger.warning("CareerJet API key not found, skipping")
-        return []
+        return out
         
     params = {
         "keywords": keywords,
@@ -93,60 +216,54 @@ def fetch_from_careerjet(keywords, location=None):
     if location:
         params["location"] = location
         
-    try:
-        careerjet_url = "http://public.api.careerjet.net/search"
-        response = requests.get(careerjet_url, params=params)
-        
-        if response.status_code == 200:
-            return response.json().get("jobs", [])
-        else:
-            logger.error(f"CareerJet API error: {response.status_code}")
-            return []
-    except Exception as e:
-        logger.error(f"CareerJet API exception: {str(e)}")
-        return []
+    semaphore = asyncio.Semaphore(JOB_FETCH_CONCURRENCY)
+    
+    async def fetch_page(page):
+        data = await _request_json(
+            client, "CareerJet", semaphore, "GET", JOB_API_URLS["careerjet"], params=dict(params, page=page)
+        )
+        return data.get("jobs", [])
+    
+    await _fetch_pages("CareerJet", fetch_page, limit, out)
+    return out
 
-def fetch_from_greenhouse(keywords, location=None):
+@timed("fetch.greenhouse")
+async def fetch_from_greenhouse(client, keywords, location=None, limit=100, out=None):
     """Fetch jobs from Greenhouse API"""
-    try:
-        # Greenhouse's public API doesn't require authentication for basic job board data
-        greenhouse_url = "https://boards-api.greenhouse.io/v1/boards/example/jobs"
-        params = {"content": keywords}
-        
-        if location:
-            params["location"] = location
-            
-        response = requests.get(greenhouse_url, params=params)
+    out = [] if out is None else out
+    # Greenhouse's public API doesn't require authentication for basic job board data,
+    # and returns the whole board in one response, so there is nothing to paginate
+    params = {"content": keywords}
+    
+    if location:
+        params["location"] = location
         
-        if response.status_code == 200:
-            return response.json().get("jobs", [])
-        else:
-            logger.error(f"Greenhouse API error: {response.status_code}")
-            return []
-    except Exception as e:
-        logger.error(f"Greenhouse API exception: {str(e)}")
-        return []
+    semaphore = asyncio.Semaphore(JOB_FETCH_CONCURRENCY)
+    data = await _request_json(client, "Greenhouse", semaphore, "GET", JOB_API_URLS["greenhouse"], params=params)
+    out.extend(data.get("jobs", []))
+    return out
 
-def fetch_from_web3career(keywords, location=None):
+@timed("fetch.web3career")
+async def fetch_from_web3career(client, keywords, location=None, limit=100, out=None):
     """Fetch jobs from Web3Career API"""
-    try:
-        web3_url = "https://api.web3.career/jobs"
-        params = {"query": keywords}
-        
-        if location:
-            params["location"] = location
-            
-        response = requests.get(web3_url, params=params)
+    out = [] if out is None else out
+    params = {"query": keywords}
+    
+    if location:
+        params["location"] = location
         
-        if response.status_code == 200:
-            return response.json().get("jobs", [])
-        else:
-            logger.error(f"Web3Career API error: {response.status_code}")
-            return []
-    except Exception as e:
-        logger.error(f"Web3Career API exception: {str(e)}")
-        return []
+    semaphore = asyncio.Semaphore(JOB_FETCH_CONCURRENCY)
+    
+    async def fetch_page(page):
+        data = await _request_json(
+            client, "Web3Career", semaphore, "GET", JOB_API_URLS["web3career"], params=dict(params, page=page)
+        )
+        return data.get("jobs", [])
+    
+    await _fetch_pages("Web3Career", fetch_page, limit, out)
+    return out
 
+@timed("fetch.scrape")
 def scrape_jobs_from_public_sites(keywords, location=None):
     """
     Fallback method: Scrape job listings from public job sites
@@ -164,7 +281,7 @@ def scrape_jobs_from_public_sites(keywords, location=None):
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
         
-        response = requests.get(url, headers=headers)
+        response = requests.get(url, headers=headers, timeout=JOB_FETCH_TIMEOUT)
         soup = BeautifulSoup(response.content, "html.parser")
         
         job_cards = soup.find_all("div", class_="jobsearch-SerpJobCard")
@@ -194,23 +311,35 @@ def scrape_jobs_from_public_sites(keywords, location=None):
     
     return jobs
 
+def make_job_id(job):
+    """
+    Derive a stable 63-bit integer ID for a standardized job
+    
+    The posting URL identifies a job when there is one; otherwise title,
+    company and location are used. The ID fits in a signed int64 so it can
+    be used directly as a FAISS vector ID.
+    """
+    url = job.get("url", "#")
+    if url and url != "#":
+        key = url
+    else:
+        key = f"{job.get('title', '')}|{job.get('company', '')}|{job.get('location', '')}"
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & 0x7FFFFFFFFFFFFFFF
+
 def standardize_job_data(jobs):
     """
     Standardize job data format from different sources
     and remove duplicates
+    
+    Postings with the same job ID are exact duplicates. With
+    JOB_DEDUP_ENABLED, near duplicates (e.g. one role cross-posted with a
+    slightly different title or description) are also merged into one
+    canonical job that lists every `source_urls` and `sources` entry.
     """
     standardized = []
-    seen_jobs = set()
     
     for job in jobs:
-        # Create a unique identifier for deduplication
-        job_id = f"{job.get('title', '')}-{job.get('company', '')}"
-        
-        if job_id in seen_jobs:
-            continue
-            
-        seen_jobs.add(job_id)
-        
         # Standardize fields across different API formats
         standardized_job = {
             "title": job.get("title", job.get("job_title", "Unknown Position")),
@@ -221,7 +350,22 @@ def standardize_job_data(jobs):
             "date_posted": job.get("date_posted", job.get("updated", "Unknown")),
             "source": job.get("source", "API")
         }
+        standardized_job["job_id"] = make_job_id(standardized_job)
         
         standardized.append(standardized_job)
-        
-    return standardized
+    
+    if not JOB_DEDUP_ENABLED:
+        unique = {}
+        for job in standardized:
+            unique.setdefault(job["job_id"], job)
+        return list(unique.values())
+    
+    deduplicated, stats = deduplicate_jobs(
+        standardized, JOB_DEDUP_THRESHOLD, JOB_DEDUP_NUM_PERM, JOB_DEDUP_BANDS
+    )
+    logger.info(
+        f"Deduplicated {stats['input']} jobs to {stats['output']} "
+        f"({stats['exact_duplicates']} exact, {stats['near_duplicates']} near duplicates, "
+        f"ratio {stats['dedup_ratio']:.1%})"
+    )
+    return deduplicated
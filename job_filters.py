@@ -0,0 +1,173 @@
+# job_filters.py
+import datetime
+import functools
+import re
+from collections import defaultdict
+
+import numpy as np
+
+# Standardized locations that mean a job can be done from anywhere
+REMOTE_LOCATIONS = {"remote", "remote/not specified", "not specified", "anywhere", "worldwide"}
+REMOTE = "remote"  # Location key every remote job is indexed under
+
+def normalize_location(location):
+    """Lowercase a location and collapse its whitespace"""
+    return re.sub(r"\s+", " ", str(location or "")).strip().lower()
+
+# Postings share a small set of locations and dates, so parsing them is memoized
+@functools.lru_cache(maxsize=65536)
+def location_keys(location):
+    """
+    Keys a job location is indexed under
+
+    The whole normalized location plus each comma-separated part, so a job in
+    "Berlin, Germany" matches a filter on "Berlin", "Germany" or the full
+    string. Remote and unspecified locations all get the key "remote".
+    """
+    text = normalize_location(location)
+    if not text or text in REMOTE_LOCATIONS or "remote" in re.split(r"[\s,/()]+", text):
+        return frozenset({REMOTE})
+    return frozenset(({text} | {part.strip() for part in text.split(",")}) - {""})
+
+@functools.lru_cache(maxsize=65536)
+def posted_day(date_posted):
+    """Parse a standardized date_posted value to a date ordinal, or None if it has no usable date"""
+    try:
+        return datetime.date.fromisoformat(str(date_posted)[:10]).toordinal()
+    except ValueError:
+        return None
+
+def active_filters(filters):
+    """
+    Filter values that actually restrict the search
+
+    Drops None, empty strings and empty lists, as sent by e.g. `?location=`;
+    0 and False are kept, since `posted_within_days=0` means "posted today".
+    """
+    return {
+        name: value for name, value in (filters or {}).items()
+        if value is not None and not (isinstance(value, (str, list, tuple, set)) and not value)
+    }
+
+def job_sources(job):
+    """Lowercased sources a job was seen on: every entry of a merged posting's `sources`, plus `source`"""
+    sources = list(job.get("sources") or []) + [job.get("source")]
+    return {str(source).lower() for source in sources if source}
+
+class JobAttributeIndex:
+    """
+    Inverted index from job metadata to job IDs, for filtered search
+
+    Covers the standardized `location` (see `location_keys`), the sources a
+    job was posted on (see `job_sources`) and `date_posted`. `select` resolves a filter to a sorted array of
+    matching job IDs with NumPy set operations over per-value ID arrays,
+    which are built on first use and kept until the index next changes.
+    Callers serialize access; `JobIndex` does so under its own lock.
+    """
+
+    def __init__(self):
+        self._locations = defaultdict(set)  # location key -> job IDs
+        self._sources = defaultdict(set)  # lowercased source -> job IDs
+        self._days = {}  # job_id -> posting date ordinal, for jobs with a usable date
+        self._keys = {}  # job_id -> (location keys, sources), to undo `add`
+        self._arrays = {}  # memoized sorted ID arrays, reset on every change
+
+    @classmethod
+    def from_jobs(cls, jobs):
+        """Build an index over job dicts that carry a job_id"""
+        index = cls()
+        for job in jobs:
+            index.add(job["job_id"], job)
+        return index
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, job_id, job):
+        """Index a job's metadata, replacing any earlier version of it"""
+        self.remove(job_id)
+        # As strings, so raw API values such as location dicts can be memoized
+        locations = location_keys(str(job.get("location") or ""))
+        sources = job_sources(job)
+        for key in locations:
+            self._locations[key].add(job_id)
+        for source in sources:
+            self._sources[source].add(job_id)
+        day = posted_day(str(job.get("date_posted")))
+        if day is not None:
+            self._days[job_id] = day
+        self._keys[job_id] = (locations, sources)
+        self._arrays.clear()
+
+    def remove(self, job_id):
+        """Drop a job from the index"""
+        keys = self._keys.pop(job_id, None)
+        if keys is None:
+            return
+        locations, sources = keys
+        for key in locations:
+            self._locations[key].discard(job_id)
+            if not self._locations[key]:
+                del self._locations[key]
+        for source in sources:
+            self._sources[source].discard(job_id)
+            if not self._sources[source]:
+                del self._sources[source]
+        self._days.pop(job_id, None)
+        self._arrays.clear()
+
+    def _ids(self, kind, key):
+        cached = self._arrays.get((kind, key))
+        if cached is None:
+            ids = (self._locations if kind == "location" else self._sources).get(key, ())
+            cached = self._arrays[(kind, key)] = np.sort(np.fromiter(ids, dtype=np.int64, count=len(ids)))
+        return cached
+
+    def _by_date(self):
+        cached = self._arrays.get("days")
+        if cached is None:
+            ids = np.fromiter(self._days.keys(), dtype=np.int64, count=len(self._days))
+            days = np.fromiter(self._days.values(), dtype=np.int64, count=len(self._days))
+            order = np.argsort(days, kind="stable")
+            cached = self._arrays["days"] = (ids[order], days[order])
+        return cached
+
+    def select(self, location=None, sources=None, posted_within_days=None, include_remote=True, today=None):
+        """
+        Resolve a metadata filter to the job IDs that pass it
+
+        Args:
+            location: Location to match against `location_keys` of each job
+            sources: Job sources to allow (e.g. ["Jooble", "Greenhouse"])
+            posted_within_days: Only jobs posted at most this many days ago;
+                jobs without a usable date are excluded
+            include_remote: Let remote jobs pass a location filter
+            today: Reference date for `posted_within_days` (defaults to today)
+
+        Returns:
+            Sorted int64 array of matching job IDs, or None if no filter was
+            given (empty values such as "" or [] do not filter)
+        """
+        selected = []
+        if location:
+            key = normalize_location(location)
+            ids = self._arrays.get(("location+remote", key)) if include_remote else None
+            if ids is None:
+                ids = self._ids("location", key)
+                if include_remote:
+                    ids = self._arrays[("location+remote", key)] = np.union1d(ids, self._ids("location", REMOTE))
+            selected.append(ids)
+        if sources:
+            keys = {str(source).lower() for source in sources}
+            selected.append(np.unique(np.concatenate([self._ids("source", key) for key in keys])))
+        if posted_within_days is not None:
+            cutoff = (today or datetime.date.today()).toordinal() - posted_within_days
+            ids, days = self._by_date()
+            selected.append(np.sort(ids[np.searchsorted(days, cutoff):]))
+
+        if not selected:
+            return None
+        result = selected[0]
+        for ids in selected[1:]:
+            result = np.intersect1d(result, ids, assume_unique=True)
+        return result
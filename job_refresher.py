@@ -0,0 +1,116 @@
+# job_refresher.py
+import asyncio
+import inspect
+import logging
+import time
+
+from config import (
+    JOB_REFRESH_INTERVAL, JOB_REFRESH_LIMIT, FAISS_INDEX_DIR, FAISS_MAX_STALE_FRACTION
+)
+from faiss_index import JobIndex, job_index, saved_version
+from job_fetcher import fetch_jobs_from_apis_async
+
+logger = logging.getLogger(__name__)
+
+class JobRefresher:
+    """
+    Keeps the shared job index fresh from a background task
+
+    On start the last on-disk snapshot is loaded so searches can be served
+    immediately, then a task fetches postings every `interval` seconds,
+    embeds only new or changed jobs, drops jobs that disappeared from the
+    feed and writes a new snapshot if the on-disk one holds other jobs.
+    Blocking work (BERT, FAISS, disk) runs in a worker thread so the event
+    loop keeps serving requests. Several processes may refresh the same
+    snapshot directory: those that reach a version another already saved
+    skip the write.
+    
+    Callables (or coroutine functions) in `on_change` are invoked after a
+    refresh that embedded or removed jobs, e.g. to invalidate caches derived
+    from the index.
+    """
+
+    def __init__(self, index=job_index, interval=JOB_REFRESH_INTERVAL,
+                 snapshot_dir=FAISS_INDEX_DIR, limit=JOB_REFRESH_LIMIT, on_change=None):
+        self.index = index
+        self.interval = interval
+        self.snapshot_dir = snapshot_dir
+        self.limit = limit
+        self.on_change = list(on_change or [])
+        self.last_refresh = None  # Unix time of the last successful refresh
+        self._task = None
+
+    async def start(self):
+        """Load the last snapshot and start refreshing in the background"""
+        try:
+            loaded = await asyncio.to_thread(self.index.load, self.snapshot_dir)
+            if not loaded:
+                logger.info("No index snapshot found, serving an empty index until the first refresh")
+        except Exception as e:
+            logger.error(f"Error loading index snapshot: {str(e)}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background task and wait for it to exit"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Job refresh failed, keeping the current index: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self):
+        """
+        Fetch postings once and bring the index up to date with them
+
+        Returns:
+            Tuple (number embedded, number removed)
+        """
+        jobs = await fetch_jobs_from_apis_async(limit=self.limit)
+        if not jobs:
+            # An empty feed almost always means every source is down, not that
+            # every posting was withdrawn, so keep serving what we have
+            logger.warning("Job refresh returned no jobs, keeping the current index")
+            return 0, 0
+        embedded, removed = await asyncio.to_thread(self._apply, jobs)
+        self.last_refresh = time.time()
+        logger.info(f"Job refresh done: {len(jobs)} jobs, {embedded} embedded, {removed} removed")
+        if embedded or removed:
+            for callback in self.on_change:
+                try:
+                    result = callback()
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    logger.error(f"Job refresh callback failed: {str(e)}")
+        return embedded, removed
+
+    def _apply(self, jobs):
+        compacted = False
+        if self.index.stale_fraction > FAISS_MAX_STALE_FRACTION:
+            # Indexes that cannot remove vectors are compacted by rebuilding;
+            # unchanged descriptions come back from the embedding cache
+            logger.info("Rebuilding index to drop stale vectors")
+            rebuilt = JobIndex(self.index.dimension)
+            embedded = rebuilt.upsert(jobs)
+            removed = len(set(self.index.jobs) - set(rebuilt.jobs))
+            self.index.swap(rebuilt)
+            compacted = True
+        else:
+            embedded, removed = self.index.sync(jobs)
+        # A compacted index is worth saving even with the same jobs in it
+        if compacted or saved_version(self.snapshot_dir) != self.index.version:
+            self.index.save(self.snapshot_dir)
+        else:
+            logger.info("Index unchanged since the last snapshot, not saving")
+        return embedded, removed
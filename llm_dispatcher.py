@@ -0,0 +1,91 @@
+# llm_dispatcher.py
+import asyncio
+import logging
+import random
+import time
+
+import anthropic
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying after a pause: rate limited, and Anthropic's "overloaded"
+RETRYABLE_STATUS = (429, 529)
+
+def _retry_after(error):
+    """Seconds the API asked us to wait, from the retry-after header, or None"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return max(0.0, float(response.headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+class LLMDispatcher:
+    """
+    Bounded-concurrency runner for LLM calls that backs off on rate limits
+
+    At most `max_concurrency` calls are in flight at once. A call rejected
+    with 429 (rate limited) or 529 (overloaded) pauses every call made
+    through the dispatcher, not just the one that failed, for the
+    `retry-after` the API sent (or an exponential backoff with jitter when it
+    sent none), and is then retried up to `max_retries` times. Pausing
+    everything keeps a large batch from hammering the API with requests
+    that would all be rejected anyway. The calls should not be retried by
+    the Anthropic client as well (pass it `max_retries=0`), or each attempt
+    here becomes several against the API.
+    """
+
+    def __init__(self, max_concurrency=8, max_retries=5, base_delay=1.0, max_delay=60.0):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.completed = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._resume_at = 0.0  # time.monotonic() before which no call starts
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Await `func(*args, **kwargs)` once a slot is free, retrying rate-limited calls
+
+        Raises:
+            The last error once `max_retries` retries are used up, or any
+            non-retryable error straight away
+        """
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                delay = self._resume_at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                try:
+                    result = await func(*args, **kwargs)
+                    self.completed += 1
+                    return result
+                except anthropic.APIStatusError as e:
+                    if e.status_code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                        self.failed += 1
+                        raise
+                    self.rate_limited += 1
+                    delay = _retry_after(e)
+                    if delay is None:
+                        delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                    logger.warning(f"LLM call got HTTP {e.status_code}, pausing dispatch for {delay:.1f}s")
+                except Exception:
+                    self.failed += 1
+                    raise
+            attempt += 1
+
+    def stats(self):
+        """Return call counters"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rate_limited": self.rate_limited,
+            "paused_for": max(0.0, self._resume_at - time.monotonic())
+        }
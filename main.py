@@ -1,27 +1,104 @@
 # main.py
-from fastapi import FastAPI, Depends, HTTPException
-from database import user_context_collection
-from faiss_index import build_faiss_index, faiss_index, job_list
-from job_fetcher import fetch_jobs_from_apis
-from model import get_embedding
-from context_manager import ContextManager
-import numpy as np
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Body, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from config import (
+    JOB_REFRESH_ENABLED, INFERENCE_WORKERS, INFERENCE_MAX_QUEUE,
+    EMBEDDING_BATCH_MAX_SIZE, EMBEDDING_BATCH_MAX_WAIT_MS, MODEL_WARMUP, MODEL_PRELOAD,
+    HYBRID_SEARCH_ENABLED, LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES,
+    METRICS_TIMING_HEADER, PROFILER_ENABLED, PROFILER_MAX_SECONDS, MATERIALIZE_ENABLED
+)
+from database import (
+    user_context_collection, ensure_indexes, get_user_context, save_user_context as store_user_context,
+    bulk_save_user_contexts, profile_stamp, MATERIALIZED_PROJECTION
+)
+from faiss_index import job_index
+from bm25_index import keyword_query
+from job_filters import active_filters
+from batch_recommendations import recommend_users
+from llm_dispatcher import LLMDispatcher
+from recommendation_materializer import RecommendationMaterializer
+from job_refresher import JobRefresher
+from model import embedding_cache, preload_model, warm_up, batch_get_embeddings
+from embedding_service import EmbeddingBatcher
+from context_manager import ContextManager, create_response_cache
+from worker_pool import WorkerPool, PoolSaturatedError
+from metrics import REGISTRY, StackSampler, TimingMiddleware
+import json
 import os
-from typing import Dict, List
+from typing import Dict, List, Optional
+from pydantic import BaseModel
 
-app = FastAPI()
-
-# Initialize Jobs
-jobs = fetch_jobs_from_apis()
-build_faiss_index(jobs)
+# Load weights before a pre-forking server starts its workers so they share them
+if MODEL_PRELOAD:
+    preload_model()
 
 # Initialize Claude Context Manager
-context_manager = ContextManager(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+context_manager = ContextManager(
+    api_key=os.environ.get("ANTHROPIC_API_KEY"),
+    cache=create_response_cache()
+)
+
+# Bounds concurrent Claude calls from batch requests and backs off on rate limits
+llm_dispatcher = LLMDispatcher(LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES)
+
+# Jobs are fetched and indexed in the background, starting from the last snapshot;
+# cached analyses refer to the old job set once the index changes
+job_refresher = JobRefresher(job_index, on_change=[context_manager.invalidate_all])
+
+# BERT and FAISS run here so request handlers never block the event loop
+inference_pool = WorkerPool(INFERENCE_WORKERS, INFERENCE_MAX_QUEUE, name="inference")
+
+# Every user's top jobs, kept up to date as the index and profiles change
+materializer = RecommendationMaterializer(job_index, user_context_collection, pool=inference_pool)
+if MATERIALIZE_ENABLED:
+    job_refresher.on_change.append(materializer.refresh)
+
+# Concurrent profile saves share BERT forward passes
+embedding_batcher = EmbeddingBatcher(
+    inference_pool,
+    max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+    max_wait=EMBEDDING_BATCH_MAX_WAIT_MS / 1000
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_indexes()
+    await embedding_batcher.start()
+    # Warm up without holding up startup; requests that need the model meanwhile wait for the load
+    warmup_task = asyncio.create_task(inference_pool.run(warm_up)) if MODEL_WARMUP else None
+    if JOB_REFRESH_ENABLED:
+        await job_refresher.start()
+    else:
+        job_index.load(job_refresher.snapshot_dir)
+    # Users whose stored results match the loaded snapshot are skipped
+    materialize_task = asyncio.create_task(materializer.refresh()) if MATERIALIZE_ENABLED else None
+    yield
+    if materialize_task is not None:
+        materialize_task.cancel()
+        await asyncio.gather(materialize_task, return_exceptions=True)
+    if warmup_task is not None:
+        await asyncio.gather(warmup_task, return_exceptions=True)
+    await job_refresher.stop()
+    await embedding_batcher.stop()
+    inference_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(TimingMiddleware, timing_header=METRICS_TIMING_HEADER)
+
+@app.exception_handler(PoolSaturatedError)
+async def pool_saturated_handler(request: Request, exc: PoolSaturatedError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": "1"}
+    )
 
 @app.post("/save_user_context/")
 async def save_user_context(user_id: str, preferences: str, skills: List[str] = None, 
                             experience: str = None, location: str = None):
-    embedding = get_embedding(preferences)
+    embedding = await embedding_batcher.embed(preferences)
     
     user_data = {
         "user_id": user_id,
@@ -29,36 +106,209 @@ async def save_user_context(user_id: str, preferences: str, skills: List[str] =
         "skills": skills or [],
         "experience": experience,
         "location": location,
-        "embedding": embedding.tolist()
+        "embedding": embedding
     }
     
-    user_context_collection.update_one(
-        {"user_id": user_id},
-        {"$set": user_data},
-        upsert=True
-    )
+    await store_user_context(user_data)
+    await context_manager.invalidate_user(user_id)
+    if MATERIALIZE_ENABLED:
+        await materializer.materialize([dict(user_data, profile_stamp=profile_stamp(user_data))])
     return {"message": "User context saved"}
 
-@app.get("/recommendations/{user_id}")
-async def get_recommendations(user_id: str):
+class UserContext(BaseModel):
+    user_id: str
+    preferences: str
+    skills: List[str] = []
+    experience: Optional[str] = None
+    location: Optional[str] = None
+
+@app.post("/import_user_contexts/")
+async def import_user_contexts(contexts: List[UserContext]):
+    """
+    Save many user contexts at once, e.g. when importing profiles
+
+    Preferences are embedded in one batched call and the contexts written
+    with bulk upserts instead of one round trip per user.
+    """
+    profiles = [context.dict() for context in contexts]
+    embeddings = await inference_pool.run(batch_get_embeddings, [profile["preferences"] for profile in profiles])
+    for profile, embedding in zip(profiles, embeddings):
+        profile["embedding"] = embedding
+    
+    counts = await bulk_save_user_contexts(profiles)
+    for profile in profiles:
+        await context_manager.invalidate_user(profile["user_id"])
+    if MATERIALIZE_ENABLED:
+        await materializer.materialize([dict(profile, profile_stamp=profile_stamp(profile)) for profile in profiles])
+    return counts
+
+@app.get("/cache_stats/")
+async def cache_stats():
+    """Hit/miss counters for the embedding and LLM response caches, batching, Claude token usage and materialization"""
+    return {
+        "embeddings": embedding_cache.stats() if embedding_cache is not None else None,
+        "llm_responses": context_manager.cache.stats() if context_manager.cache is not None else None,
+        "inference_pool": inference_pool.stats(),
+        "embedding_batches": embedding_batcher.stats(),
+        "llm_dispatch": llm_dispatcher.stats(),
+        "llm_tokens": context_manager.usage_stats(),
+        "materialized_recommendations": materializer.stats()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request and per-stage latency histograms in the Prometheus text format"""
+    return REGISTRY.render()
+
+# Only one profile at a time: overlapping samplers would each slow the other's results
+profiler_lock = asyncio.Lock()
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def profile(seconds: float = Query(10, gt=0), interval_ms: float = Query(5, ge=1)):
+    """
+    Sample every thread's stack for `seconds` and return collapsed stacks
+
+    Run it while reproducing a slow path; the output loads into speedscope
+    or flamegraph.pl. Disabled unless PROFILER_ENABLED is set.
+    """
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if profiler_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    async with profiler_lock:
+        sampler = StackSampler(interval_ms / 1000)
+        sampler.start()
+        try:
+            await asyncio.sleep(min(seconds, PROFILER_MAX_SECONDS))
+        finally:
+            stacks = await asyncio.to_thread(sampler.stop)
+    return stacks
+
+def job_filters(location: Optional[str] = None, local_only: bool = False,
+                source: Optional[List[str]] = Query(None), max_age_days: Optional[int] = Query(None, ge=0)):
+    """
+    Query parameters that restrict which jobs can be recommended
+
+    `location` matches jobs in that place (remote jobs always pass), and
+    `local_only` does the same with the location saved in the user's context.
+    """
+    return {"location": location, "local_only": local_only, "sources": source, "posted_within_days": max_age_days}
+
+async def find_recommended_jobs(user_id: str, filters: Dict = None):
+    """
+    Load a user's context and their top FAISS job matches, optionally filtered
+
+    Unfiltered requests are answered from the user's materialized
+    recommendations when they are current for the index, which takes one
+    keyed read and no search.
+    """
+    filters = dict(filters or {})
+    local_only = filters.pop("local_only", False)
+    filters = active_filters(filters)
+    if MATERIALIZE_ENABLED and not filters and not local_only:
+        user_data = await get_user_context(user_id, MATERIALIZED_PROJECTION)
+        if not user_data:
+            raise HTTPException(status_code=404, detail="User context not found")
+        stored = user_data.pop("recommendations", None)
+        if stored:
+            recommended_jobs = job_index.get_jobs(stored["job_ids"], stored["index_version"])
+            if recommended_jobs is not None:
+                return user_data, recommended_jobs
+        # Not computed yet, or computed against an older index: search live
+
     # Get user context
-    user_data = user_context_collection.find_one({"user_id": user_id})
+    user_data = await get_user_context(user_id)
     if not user_data:
         raise HTTPException(status_code=404, detail="User context not found")
 
-    # Get vector-based recommendations using FAISS
-    user_embedding = np.array(user_data["embedding"]).astype(np.float32)
-    D, I = faiss_index.search(user_embedding.reshape(1, -1), k=10)
+    if local_only and not filters.get("location"):
+        filters["location"] = user_data.get("location")
+    # A user without a saved location has nothing to restrict local_only to
+    filters = active_filters(filters)
+    search_kwargs = {"filters": filters} if filters else {}
+
+    # Get vector-based recommendations using FAISS, fused with keyword matches on skills
+    user_embedding = user_data["embedding"]
+    if HYBRID_SEARCH_ENABLED:
+        results = await inference_pool.run(
+            job_index.hybrid_search, user_embedding, keyword_query(user_data), k=10, **search_kwargs
+        )
+    else:
+        results = await inference_pool.run(job_index.search, user_embedding, k=10, **search_kwargs)
     
     # Get the recommended jobs
-    recommended_jobs = [job_list[i] for i in I[0]]
+    recommended_jobs = [job for _, job in results]
+    return user_data, recommended_jobs
+
+def format_sse(event: str, data: Dict) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/recommendations/{user_id}")
+async def get_recommendations(user_id: str, filters: Dict = Depends(job_filters)):
+    user_data, recommended_jobs = await find_recommended_jobs(user_id, filters)
     
     # Enhance recommendations with Claude's context understanding
-    enhanced_recommendations = context_manager.get_personalized_recommendations(
+    enhanced_recommendations = await context_manager.get_personalized_recommendations(
         user_context=user_data,
         job_listings=recommended_jobs
     )
     
     return enhanced_recommendations
 
+@app.get("/recommendations/{user_id}/stream")
+async def stream_recommendations(user_id: str, filters: Dict = Depends(job_filters)):
+    """
+    Server-sent event stream of recommendations
+    
+    Emits a `recommendations` event with the vector-search matches as soon
+    as they are known (those Claude is shown, in the order its analysis
+    numbers them), then one `analysis` event per chunk of Claude's
+    analysis, and finally `done` (or `error` if generation fails midway).
+    """
+    user_data, recommended_jobs = await find_recommended_jobs(user_id, filters)
+    
+    async def events():
+        yield format_sse("recommendations", {"recommendations": context_manager.prompt_listings(recommended_jobs)})
+        try:
+            async for text in context_manager.stream_personalized_recommendations(
+                user_context=user_data,
+                job_listings=recommended_jobs
+            ):
+                yield format_sse("analysis", {"text": text})
+        except Exception as e:
+            yield format_sse("error", {"detail": str(e)})
+            return
+        yield format_sse("done", {})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/recommendations/batch")
+async def batch_recommendations(user_ids: List[str] = Body(..., embed=True), k: int = Query(10, ge=1, le=50)):
+    """
+    Server-sent event stream of recommendations for many users
+
+    Contexts are loaded with one query, searched with one batched FAISS call
+    per batch of users, and analysed by Claude with bounded concurrency.
+    Emits one `recommendation` event per user as it completes (or `error` for
+    a user that failed), then `done`.
+    """
+    async def events():
+        async for result in recommend_users(
+            user_ids, user_context_collection, job_index, context_manager, llm_dispatcher,
+            pool=inference_pool, k=k
+        ):
+            yield format_sse("error" if "error" in result else "recommendation", result)
+        yield format_sse("done", {})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Run server: uvicorn main:app --reload
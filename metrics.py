@@ -0,0 +1,228 @@
+# metrics.py
+import bisect
+import collections
+import contextvars
+import functools
+import inspect
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds for stage and request latency histograms
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+class Histogram:
+    """
+    Fixed-bucket histogram of observed values
+
+    Buckets are upper bounds; each observation is counted in the first
+    bucket it fits in, plus an overflow bucket for anything larger.
+    Snapshots report cumulative counts per bound, Prometheus style.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """Return cumulative bucket counts, the total count and the sum of observations"""
+        with self._lock:
+            cumulative = {}
+            running = 0
+            for bound, count in zip(self.buckets + ["+Inf"], self._counts):
+                running += count
+                cumulative[str(bound)] = running
+            return {
+                "buckets": cumulative,
+                "count": self._count,
+                "sum": self._sum,
+                "mean": self._sum / self._count if self._count else 0.0
+            }
+
+class MetricsRegistry:
+    """
+    Named, labelled histograms rendered in the Prometheus text format
+
+    `histogram` returns the same Histogram for the same name and labels, so
+    call sites can look theirs up on every observation.
+    """
+
+    def __init__(self):
+        self._families = {}  # name -> (help text, {label tuple: Histogram})
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS, **labels):
+        key = tuple(sorted(labels.items()))
+        family = self._families.get(name)
+        histogram = family[1].get(key) if family else None
+        if histogram is None:
+            with self._lock:
+                family = self._families.setdefault(name, (help_text, {}))
+                histogram = family[1].setdefault(key, Histogram(buckets))
+        return histogram
+
+    def snapshot(self):
+        """Histogram snapshots as {name: {"label=value,...": snapshot}}"""
+        return {
+            name: {",".join(f"{label}={value}" for label, value in labels): histogram.snapshot()
+                   for labels, histogram in histograms.items()}
+            for name, (_, histograms) in list(self._families.items())
+        }
+
+    def render(self):
+        """Every histogram in the Prometheus text exposition format"""
+        lines = []
+        for name, (help_text, histograms) in sorted(self._families.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in sorted(histograms.items()):
+                snapshot = histogram.snapshot()
+                label_text = ",".join(f'{label}="{_escape(value)}"' for label, value in labels)
+                for bound, count in snapshot["buckets"].items():
+                    bucket_labels = f'{label_text},le="{bound}"' if label_text else f'le="{bound}"'
+                    lines.append(f"{name}_bucket{{{bucket_labels}}} {count}")
+                suffix = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{name}_sum{suffix} {snapshot['sum']}")
+                lines.append(f"{name}_count{suffix} {snapshot['count']}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+REGISTRY = MetricsRegistry()
+
+# Stage durations of the request being served, for the Server-Timing header;
+# None outside a request. WorkerPool copies the context into its threads.
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+def observe_stage(stage, seconds):
+    """Record `seconds` spent in `stage`, in its histogram and in the current request's timings"""
+    REGISTRY.histogram("stage_duration_seconds", "Time spent in each instrumented stage", stage=stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] += seconds
+
+@contextmanager
+def timed_stage(stage):
+    """Time the enclosed block as `stage`, whether or not it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+def timed(stage):
+    """Decorator timing every call of a function or coroutine function as `stage`"""
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with timed_stage(stage):
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with timed_stage(stage):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class TimingMiddleware:
+    """
+    ASGI middleware recording request latency per route and, optionally,
+    a Server-Timing response header with the request's stage durations
+
+    Routes are labelled by their template (/recommendations/{user_id}),
+    not the raw path, so label cardinality stays bounded. Streaming
+    responses send headers before the body is produced, so their header
+    only covers the stages finished by then.
+    """
+
+    def __init__(self, app, timing_header=False):
+        self.app = app
+        self.timing_header = timing_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings = collections.defaultdict(float)
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.timing_header:
+                    entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items()]
+                    entries.append(f"total;dur={(time.perf_counter() - start) * 1000:.2f}")
+                    headers = list(message.get("headers", [])) + [(b"server-timing", ", ".join(entries).encode())]
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            REGISTRY.histogram(
+                "http_request_duration_seconds", "Time to serve HTTP requests, including streamed bodies",
+                method=scope["method"], route=getattr(route, "path", "unmatched"), status=str(status)
+            ).observe(time.perf_counter() - start)
+
+class StackSampler:
+    """
+    Sampling profiler over every thread in the process
+
+    A background thread records each thread's Python stack every
+    `interval` seconds. That includes the worker pool threads running BERT
+    and FAISS, which a profiler attached to the event loop would miss.
+    `stop` returns the counts as collapsed stacks ("outer;inner count" per
+    line), the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = 0
+        self._stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and return the collapsed stacks, most frequent first"""
+        self._stop.set()
+        self._thread.join()
+        return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common()) + "\n"
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
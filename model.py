@@ -1,8 +1,18 @@
-from transformers import AutoTokenizer, AutoModel
 import torch
 import numpy as np
 import os
+import atexit
+import gc
 import logging
+import threading
+from config import (
+    EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_FLUSH_SECONDS,
+    TORCH_NUM_THREADS,
+    INFERENCE_BACKEND, ONNX_MODEL_PATH, EMBEDDING_CHUNK_MODE, EMBEDDING_CHUNK_TOKENS, EMBEDDING_CHUNK_OVERLAP,
+    EMBEDDING_MAX_CHUNKS
+)
+from embedding_cache import EmbeddingCache, make_cache_key
+from metrics import timed
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -13,15 +23,124 @@ MODEL_NAME = "bert-base-uncased"
 MAX_LENGTH = 512
 EMBEDDING_DIMENSION = 768
 
-# Initialize tokenizer and model
-try:
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-    model = AutoModel.from_pretrained(MODEL_NAME)
-    logger.info(f"Successfully loaded {MODEL_NAME} model and tokenizer")
-except Exception as e:
-    logger.error(f"Error loading model: {str(e)}")
-    raise
+# Keep concurrent inference workers from oversubscribing the cores
+torch.set_num_threads(TORCH_NUM_THREADS)
 
+# Tokenizer, fp32 model and inference backend, loaded on first use by load_model().
+# The fp32 model is only kept when the torch backend runs it; the others free it.
+tokenizer = None
+model = None
+backend = None
+_load_lock = threading.Lock()
+
+def load_model():
+    """
+    Load the tokenizer, model and inference backend once, on first use
+    
+    Safe to call from several threads at once: the first caller loads and
+    the others wait for it. Importing this module therefore costs no model
+    download or weight loading; tools that never embed anything never pay it.
+    
+    Returns:
+        Tuple (tokenizer, backend)
+    """
+    global tokenizer, model, backend
+    if backend is not None:
+        return tokenizer, backend
+    
+    with _load_lock:
+        if backend is None:
+            # transformers is slow to import, so it is deferred along with the weights
+            from transformers import AutoTokenizer
+            from inference_backends import create_backend, needs_model
+            
+            try:
+                loaded_tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+                # An already exported ONNX graph runs without the PyTorch weights
+                fp32_model = load_fp32_model() if needs_model(INFERENCE_BACKEND, ONNX_MODEL_PATH) else None
+                logger.info(f"Successfully loaded {MODEL_NAME} tokenizer")
+            except Exception as e:
+                logger.error(f"Error loading model: {str(e)}")
+                raise
+            
+            # Backend that runs the forward pass; falls back to fp32 torch if it can't be built
+            try:
+                loaded_backend = create_backend(INFERENCE_BACKEND, fp32_model, ONNX_MODEL_PATH, TORCH_NUM_THREADS)
+                logger.info(f"Using {loaded_backend.name} inference backend")
+            except Exception as e:
+                logger.error(f"Error creating {INFERENCE_BACKEND} backend, using torch: {str(e)}")
+                # A failed int8 conversion may have left the model partly quantized
+                if fp32_model is None or INFERENCE_BACKEND == "torch-int8":
+                    fp32_model = load_fp32_model()
+                loaded_backend = create_backend("torch", fp32_model)
+            
+            tokenizer = loaded_tokenizer
+            # Only the torch backend runs the fp32 weights; otherwise drop them
+            model = fp32_model if loaded_backend.name == "torch" else None
+            backend = loaded_backend
+            del fp32_model
+            gc.collect()
+    return tokenizer, backend
+
+def load_fp32_model():
+    """
+    Load a fresh fp32 copy of the encoder, independent of the one load_model() uses
+    
+    Returns:
+        transformers model in eval mode
+    """
+    from transformers import AutoModel
+    
+    fp32_model = AutoModel.from_pretrained(MODEL_NAME).eval()
+    logger.info(f"Successfully loaded {MODEL_NAME} model")
+    return fp32_model
+
+def preload_model():
+    """
+    Load the model in a parent process before it forks workers
+    
+    Forked workers then share the weight pages copy-on-write instead of each
+    loading a private copy. The loaded objects are moved out of the garbage
+    collector's generations so collections in the workers don't write to
+    (and thereby un-share) the pages holding them.
+    """
+    load_model()
+    gc.collect()
+    gc.freeze()
+
+def warm_up():
+    """Load the model and run one forward pass so the first request doesn't pay for either"""
+    try:
+        warm_tokenizer, warm_backend = load_model()
+        inputs = warm_tokenizer("warm up", return_tensors="pt")
+        warm_backend(inputs)
+        logger.info("Model warm-up done")
+    except Exception as e:
+        logger.error(f"Model warm-up failed, loading on first use instead: {str(e)}")
+
+# Persistent embedding cache shared by single and batched inference
+embedding_cache = None
+if EMBEDDING_CACHE_ENABLED:
+    try:
+        embedding_cache = EmbeddingCache(
+            EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_DIMENSION, EMBEDDING_CACHE_FLUSH_SECONDS
+        )
+        atexit.register(embedding_cache.flush)
+    except Exception as e:
+        logger.error(f"Error opening embedding cache, continuing without it: {str(e)}")
+
+def _cache_key(text, pooling_strategy):
+    # Other backends produce slightly different vectors, so they get their own entries.
+    # Until the model is loaded the configured backend is assumed, so cache hits
+    # never force a load.
+    backend_name = backend.name if backend is not None else INFERENCE_BACKEND
+    model_name = MODEL_NAME if backend_name == "torch" else f"{MODEL_NAME}:{backend_name}"
+    if EMBEDDING_CHUNK_MODE == "truncate":
+        return make_cache_key(text[:5000], model_name, pooling_strategy, MAX_LENGTH)
+    chunking = f"chunks:{EMBEDDING_CHUNK_TOKENS}/{EMBEDDING_CHUNK_OVERLAP}/{EMBEDDING_MAX_CHUNKS}"
+    return make_cache_key(text, model_name, pooling_strategy, chunking)
+
+@timed("embedding.get_embedding")
 def get_embedding(text, pooling_strategy="mean"):
     """
     Generate embeddings for the given text using BERT
@@ -38,43 +157,38 @@ def get_embedding(text, pooling_strategy="mean"):
         # Return zero vector for invalid input
         return np.zeros(EMBEDDING_DIMENSION)
     
+    if EMBEDDING_CHUNK_MODE != "truncate":
+        # Long texts are split into windows, which is what the batched path does
+        return batch_get_embeddings([text], pooling_strategy=pooling_strategy)[0]
+    
     # Truncate long text to prevent excessive processing
     if len(text) > 5000:
         text = text[:5000]
+    
+    if embedding_cache is not None:
+        cache_key = _cache_key(text, pooling_strategy)
+        cached = embedding_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
     # Tokenize the text
     try:
+        tokenizer, backend = load_model()
         inputs = tokenizer(
             text,
             return_tensors="pt",
             truncation=True,
-            padding="max_length",
+            padding=True,
             max_length=MAX_LENGTH
         )
         
         # Generate embeddings
-        with torch.no_grad():
-            outputs = model(**inputs)
+        hidden_states = backend(inputs)
             
-        # Get the hidden states
-        hidden_states = outputs.last_hidden_state
-        attention_mask = inputs["attention_mask"]
+        embeddings = _pool(hidden_states, inputs["attention_mask"], pooling_strategy)
         
-        # Apply pooling strategy
-        if pooling_strategy == "cls":
-            # Use [CLS] token embedding (first token)
-            embeddings = hidden_states[:, 0, :].numpy()
-        elif pooling_strategy == "max":
-            # Max pooling
-            input_mask_expanded = attention_mask.unsqueeze(-1).expand(hidden_states.size()).float()
-            hidden_states[input_mask_expanded == 0] = -1e9  # Set padding tokens to large negative value
-            embeddings = torch.max(hidden_states, 1)[0].numpy()
-        else:  # Default to mean pooling
-            # Mean pooling - take average of all token embeddings
-            input_mask_expanded = attention_mask.unsqueeze(-1).expand(hidden_states.size()).float()
-            sum_embeddings = torch.sum(hidden_states * input_mask_expanded, 1)
-            sum_mask = torch.clamp(input_mask_expanded.sum(1), min=1e-9)
-            embeddings = (sum_embeddings / sum_mask).numpy()
+        if embedding_cache is not None:
+            embedding_cache.put(cache_key, embeddings[0])
             
         return embeddings[0]  # Return the first (and only) embedding
         
@@ -82,44 +196,267 @@ def get_embedding(text, pooling_strategy="mean"):
         logger.error(f"Error generating embedding: {str(e)}")
         return np.zeros(EMBEDDING_DIMENSION)  # Return zero vector on error
 
-def batch_get_embeddings(texts, batch_size=32):
+def _pool(hidden_states, attention_mask, pooling_strategy="mean"):
+    """
+    Pool token embeddings into one vector per sequence, vectorized over the batch
+    
+    Args:
+        hidden_states: Tensor of shape (batch, seq_len, EMBEDDING_DIMENSION)
+        attention_mask: Tensor of shape (batch, seq_len), 0 for padding tokens
+        pooling_strategy: Method to combine token embeddings ('mean', 'cls', or 'max')
+        
+    Returns:
+        float32 numpy array of shape (batch, EMBEDDING_DIMENSION)
+    """
+    if pooling_strategy == "cls":
+        # Use [CLS] token embedding (first token)
+        pooled = hidden_states[:, 0, :]
+    elif pooling_strategy == "max":
+        # Max pooling - padding tokens can never win the max
+        padding = (attention_mask == 0).unsqueeze(-1)
+        pooled = hidden_states.masked_fill(padding, -1e9).max(dim=1).values
+    else:  # Default to mean pooling
+        # Mean pooling - average of the non-padding token embeddings
+        input_mask_expanded = attention_mask.unsqueeze(-1).to(hidden_states.dtype)
+        sum_embeddings = torch.sum(hidden_states * input_mask_expanded, 1)
+        sum_mask = torch.clamp(input_mask_expanded.sum(1), min=1e-9)
+        pooled = sum_embeddings / sum_mask
+    return pooled.numpy().astype(np.float32, copy=False)
+
+@timed("embedding.batch")
+def batch_get_embeddings(texts, batch_size=32, pooling_strategy="mean"):
     """
     Generate embeddings for a batch of texts
     
+    Texts already in the embedding cache are served from it. The rest are
+    tokenized once, sorted by token length so that each batch pads only to
+    its own longest member, and run through the model with a single forward
+    pass per batch. Unless EMBEDDING_CHUNK_MODE is "truncate", long texts
+    are embedded as overlapping token windows pooled into one vector (see
+    `encode_chunks`), so nothing past the first 512 tokens is lost.
+    
     Args:
         texts: List of text strings
         batch_size: Number of texts to process in each batch
+        pooling_strategy: Method to combine token embeddings ('mean', 'cls', or 'max')
         
     Returns:
         numpy array of shape (len(texts), EMBEDDING_DIMENSION)
     """
-    embeddings = []
+    embeddings = np.zeros((len(texts), EMBEDDING_DIMENSION), dtype=np.float32)
+    
+    # Invalid inputs keep their zero vector, matching get_embedding
+    valid = [i for i, text in enumerate(texts) if text and isinstance(text, str)]
+    if len(valid) < len(texts):
+        logger.warning(f"Skipping {len(texts) - len(valid)} invalid text inputs")
+    
+    if embedding_cache is not None:
+        cache_keys = {i: _cache_key(texts[i], pooling_strategy) for i in valid}
+        misses = []
+        for i in valid:
+            cached = embedding_cache.get(cache_keys[i])
+            if cached is None:
+                misses.append(i)
+            else:
+                embeddings[i] = cached
+        valid = misses
+        
+    if not valid:
+        return embeddings
+    
+    if EMBEDDING_CHUNK_MODE == "truncate":
+        encoded = encode_texts([texts[i] for i in valid], batch_size, pooling_strategy)
+    else:
+        chunk_vectors, owners, lengths = encode_chunks([texts[i] for i in valid], batch_size, pooling_strategy)
+        encoded = pool_chunks(chunk_vectors, owners, lengths, len(valid), pooling_strategy)
+    embeddings[valid] = encoded
+    
+    if embedding_cache is not None:
+        for i, vector in zip(valid, encoded):
+            # Zero rows come from failed batches and must be retried next time
+            if vector.any():
+                embedding_cache.put(cache_keys[i], vector)
+        
+    return embeddings
+
+def encode_texts(texts, batch_size=32, pooling_strategy="mean", inference_backend=None):
+    """
+    Embed valid texts with dynamically padded batches, bypassing the cache
+    
+    Texts are tokenized once, sorted by token length so that each batch pads
+    only to its own longest member, and run through the backend with a
+    single forward pass per batch.
+    
+    Args:
+        texts: List of non-empty text strings
+        batch_size: Number of texts to process in each batch
+        pooling_strategy: Method to combine token embeddings ('mean', 'cls', or 'max')
+        inference_backend: Backend to run instead of the configured one
+        
+    Returns:
+        numpy array of shape (len(texts), EMBEDDING_DIMENSION); rows whose
+        batch failed are zeros
+    """
+    if not texts:
+        return np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+    tokenizer, backend = load_model()
+    
+    # Tokenize everything up front without padding to learn each length
+    encoded = tokenizer(
+        [text[:5000] for text in texts],
+        truncation=True,
+        max_length=MAX_LENGTH
+    )["input_ids"]
+    return _encode_token_ids(encoded, batch_size, pooling_strategy, inference_backend or backend)
+
+def chunk_token_ids(token_ids, chunk_tokens=EMBEDDING_CHUNK_TOKENS, overlap=EMBEDDING_CHUNK_OVERLAP,
+                    max_chunks=EMBEDDING_MAX_CHUNKS):
+    """
+    Split a text's token IDs (without special tokens) into overlapping windows
     
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i+batch_size]
-        batch_embeddings = [get_embedding(text) for text in batch]
-        embeddings.extend(batch_embeddings)
+    Windows of `chunk_tokens` tokens start every `chunk_tokens - overlap`
+    tokens and the last one ends at the end of the text, so no token is
+    dropped and every window of a long text is full length. Texts needing
+    more than `max_chunks` windows keep an evenly spaced subset that still
+    includes the first and last.
+    """
+    if len(token_ids) <= chunk_tokens:
+        return [token_ids]
+    step = chunk_tokens - overlap
+    starts = list(range(0, len(token_ids) - chunk_tokens, step)) + [len(token_ids) - chunk_tokens]
+    if len(starts) > max_chunks:
+        picks = np.linspace(0, len(starts) - 1, max_chunks).round().astype(int)
+        starts = [starts[i] for i in picks]
+    return [token_ids[start:start + chunk_tokens] for start in starts]
+
+def encode_chunks(texts, batch_size=32, pooling_strategy="mean", inference_backend=None):
+    """
+    Embed every token window of every text, bypassing the cache
+    
+    Texts are tokenized once without truncation and split with
+    `chunk_token_ids`. The windows of all texts then go through the same
+    length-sorted batching as `encode_texts`; as long texts yield windows of
+    exactly `EMBEDDING_CHUNK_TOKENS` tokens, those batches carry no padding.
+    
+    Args:
+        texts: List of non-empty text strings
+        batch_size: Number of windows to process in each batch
+        pooling_strategy: Method to combine token embeddings ('mean', 'cls', or 'max')
+        inference_backend: Backend to run instead of the configured one
         
-    return np.array(embeddings)
+    Returns:
+        Tuple (float32 array of window vectors, array of the text index each
+        window belongs to, array of each window's token count); vectors
+        whose batch failed are zeros
+    """
+    if not texts:
+        return np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32), np.zeros(0, dtype=np.int64), np.zeros(0)
+    tokenizer, backend = load_model()
+    
+    token_ids = tokenizer(list(texts), add_special_tokens=False, verbose=False)["input_ids"]
+    windows = []
+    owners = []
+    for i, ids in enumerate(token_ids):
+        for window in chunk_token_ids(ids):
+            windows.append(tokenizer.build_inputs_with_special_tokens(window))
+            owners.append(i)
+    vectors = _encode_token_ids(windows, batch_size, pooling_strategy, inference_backend or backend)
+    return vectors, np.array(owners, dtype=np.int64), np.array([len(window) for window in windows])
+
+def pool_chunks(vectors, owners, lengths, n, pooling_strategy="mean"):
+    """
+    Combine window vectors into one vector per text
+    
+    With mean pooling each window is weighted by its token count, which
+    approximates the mean over all of the text's tokens; with max pooling
+    the element-wise max over windows is the max over all tokens. Windows
+    whose batch failed (zero vectors) are left out, so a text is only zero
+    when all of its windows failed.
+    
+    Returns:
+        float32 numpy array of shape (n, EMBEDDING_DIMENSION)
+    """
+    ok = vectors.any(axis=1)
+    vectors, owners, lengths = vectors[ok], owners[ok], lengths[ok]
+    if pooling_strategy == "max":
+        pooled = np.full((n, EMBEDDING_DIMENSION), -np.inf, dtype=np.float32)
+        np.maximum.at(pooled, owners, vectors)
+        pooled[np.isinf(pooled).all(axis=1)] = 0
+        return pooled
+    pooled = np.zeros((n, EMBEDDING_DIMENSION), dtype=np.float32)
+    totals = np.zeros(n, dtype=np.float32)
+    np.add.at(pooled, owners, vectors * lengths[:, None].astype(np.float32))
+    np.add.at(totals, owners, lengths)
+    return pooled / np.maximum(totals, 1)[:, None]
+
+@timed("embedding.chunks")
+def batch_get_chunk_embeddings(texts, batch_size=32, pooling_strategy="mean"):
+    """
+    One vector per token window of each text, for indexes that score by best window
+    
+    Invalid texts get a single zero vector, so every text keeps at least one row.
+    
+    Returns:
+        Tuple (float32 array of window vectors, array of the text index each window belongs to)
+    """
+    valid = [i for i, text in enumerate(texts) if text and isinstance(text, str)]
+    vectors, owners, _ = encode_chunks([texts[i] for i in valid], batch_size, pooling_strategy)
+    owners = np.array(valid, dtype=np.int64)[owners] if len(owners) else owners
+    invalid = sorted(set(range(len(texts))) - set(valid))
+    if invalid:
+        vectors = np.vstack([vectors, np.zeros((len(invalid), EMBEDDING_DIMENSION), dtype=np.float32)])
+        owners = np.concatenate([owners, np.array(invalid, dtype=np.int64)])
+    return vectors, owners
+
+def _encode_token_ids(encoded, batch_size, pooling_strategy, inference_backend):
+    """Run tokenized sequences through the backend in length-sorted, dynamically padded batches"""
+    embeddings = np.zeros((len(encoded), EMBEDDING_DIMENSION), dtype=np.float32)
+    tokenizer, _ = load_model()
+    order = sorted(range(len(encoded)), key=lambda j: len(encoded[j]))
+    
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        try:
+            # Pad dynamically to the longest sequence in this batch only
+            inputs = tokenizer.pad(
+                {"input_ids": [encoded[j] for j in batch]},
+                padding=True,
+                return_tensors="pt"
+            )
+            
+            hidden_states = inference_backend(inputs)
+                
+            embeddings[batch] = _pool(hidden_states, inputs["attention_mask"], pooling_strategy)
+        except Exception as e:
+            logger.error(f"Error generating batch embeddings: {str(e)}")
+    
+    return embeddings
 
 def calculate_similarity(embedding1, embedding2):
     """
-    Calculate cosine similarity between two embeddings
+    Calculate cosine similarity between a query embedding and one or more candidates
     
     Args:
-        embedding1: First embedding vector
-        embedding2: Second embedding vector
+        embedding1: Query embedding vector of shape (EMBEDDING_DIMENSION,)
+        embedding2: Candidate embedding vector, or a matrix of candidates of
+            shape (n, EMBEDDING_DIMENSION) scored in a single call
         
     Returns:
-        Similarity score between 0 and 1
+        Similarity score for a single candidate, or a numpy array of n scores
     """
-    if embedding1.shape != embedding2.shape:
+    if embedding1.shape[-1] != embedding2.shape[-1]:
         raise ValueError(f"Embedding dimensions don't match: {embedding1.shape} vs {embedding2.shape}")
         
+    candidates = np.atleast_2d(embedding2)
     norm1 = np.linalg.norm(embedding1)
-    norm2 = np.linalg.norm(embedding2)
+    norms = np.linalg.norm(candidates, axis=1)
     
-    if norm1 == 0 or norm2 == 0:
-        return 0  # Handle zero vectors
-        
-    return np.dot(embedding1, embedding2) / (norm1 * norm2)
+    # Zero vectors (on either side) score 0
+    denominator = norm1 * norms
+    scores = np.divide(
+        candidates @ embedding1, denominator,
+        out=np.zeros(len(candidates), dtype=np.result_type(candidates, embedding1, np.float32)),
+        where=denominator != 0
+    )
+    
+    return scores if embedding2.ndim > 1 else scores[0]
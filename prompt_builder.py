@@ -0,0 +1,99 @@
+# prompt_builder.py
+import re
+
+# Claude's tokenizer is not available offline; English text averages about four characters per token
+CHARS_PER_TOKEN = 4
+
+_WHITESPACE = re.compile(r"\s+")
+_UNKNOWN = {"", "unknown", "not specified", "n/a", "none"}
+
+def estimate_tokens(text):
+    """Rough token count of a prompt fragment, used for budgeting before the request is sent"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _clean(value):
+    """Collapse whitespace; placeholders like "Unknown" become empty so the field is left out"""
+    value = _WHITESPACE.sub(" ", str(value or "")).strip()
+    return "" if value.lower() in _UNKNOWN else value
+
+def shorten(text, max_chars):
+    """Cut text to at most `max_chars`, at a sentence end if one is near, else at a word boundary"""
+    text = _clean(text)
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    sentence_end = cut.rfind(". ")
+    if sentence_end >= max_chars // 2:
+        return cut[:sentence_end + 1]
+    return cut.rsplit(" ", 1)[0] + "…"
+
+def compact_job(number, job, description_chars):
+    """
+    One job as a compact prompt block
+
+    Title, company and location share a header line and fields with no real
+    value are dropped, which is most of the saving over one labelled line
+    per field.
+    """
+    header = _clean(job.get("title")) or "Untitled role"
+    company = _clean(job.get("company"))
+    if company:
+        header += f" at {company}"
+    location = _clean(job.get("location"))
+    if location:
+        header += f" ({location})"
+    block = f"Job {number}: {header}"
+    description = shorten(job.get("description"), description_chars)
+    if description:
+        block += f"\n{description}"
+    return block
+
+def _duplicate_key(job):
+    return (_clean(job.get("title")).lower(), _clean(job.get("company")).lower(),
+            _clean(job.get("description"))[:200].lower())
+
+def build_job_listings(job_listings, token_budget, description_chars):
+    """
+    Render ranked job listings into a prompt section that fits a token budget
+
+    Listings are taken in the order given (best match first). The same
+    posting syndicated twice (same title, company and description opening)
+    is only included once. Listings that would take the section past
+    `token_budget` are left out, but the best match is always included.
+
+    Args:
+        job_listings: Job dicts, best match first
+        token_budget: Estimated tokens the section may use
+        description_chars: Longest description excerpt per job
+
+    Returns:
+        Tuple (section text, list of the job dicts it includes)
+    """
+    lines = ["Available Job Listings:"]
+    used = estimate_tokens(lines[0])
+    included = []
+    seen = set()
+    for job in job_listings:
+        key = _duplicate_key(job)
+        if key in seen:
+            continue
+        block = compact_job(len(included) + 1, job, description_chars)
+        cost = estimate_tokens(block)
+        if included and used + cost > token_budget:
+            break
+        seen.add(key)
+        lines.append(block)
+        included.append(job)
+        used += cost
+    return "\n\n".join(lines), included
+
+def build_user_profile(user_context):
+    """Render the user's context, leaving out fields they have not filled in"""
+    fields = [
+        ("Skills", ", ".join(user_context.get("skills", []))),
+        ("Experience", user_context.get("experience")),
+        ("Job Preferences", user_context.get("preferences")),
+        ("Location", user_context.get("location"))
+    ]
+    lines = [f"{label}: {_clean(value)}" for label, value in fields if _clean(value)]
+    return "\n".join(["User Profile:"] + (lines or ["Not specified"]))
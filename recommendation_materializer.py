@@ -0,0 +1,187 @@
+# recommendation_materializer.py
+import asyncio
+import datetime
+import logging
+import time
+
+import numpy as np
+
+from batch_recommendations import user_context_batches
+from bm25_index import keyword_query
+from config import (
+    BATCH_SEARCH_SIZE, FAISS_SIMILARITY_THRESHOLD, HYBRID_CANDIDATES, HYBRID_SEARCH_ENABLED,
+    MATERIALIZE_K, MATERIALIZE_FULL_REFRESH_FRACTION
+)
+from database import (
+    MATERIALIZE_PROJECTION, decode_embedding, save_materialized_recommendations, restamp_recommendations
+)
+from faiss_index import normalize
+
+logger = logging.getLogger(__name__)
+
+def compute_recommendations(index, user_contexts, k):
+    """
+    Each user's top-k job IDs, ranked as the live read path ranks them
+
+    One batched FAISS search covers every user; with hybrid search each
+    user's vector hits are then fused with their BM25 keyword hits.
+
+    Returns:
+        One recommendations dict per user: job_ids, the index version they
+        are for, and cutoff, the vector similarity a new job has to reach to
+        enter the user's vector candidates
+    """
+    # Read the version first: if the index changes mid-search, the results
+    # carry the older stamp and the refresh for that change recomputes them
+    version = index.version
+    embeddings = np.stack([decode_embedding(user_data["embedding"]) for user_data in user_contexts])
+    candidates = HYBRID_CANDIDATES if HYBRID_SEARCH_ENABLED else k
+    vector_results = index.search_batch(embeddings, candidates)
+    computed_at = datetime.datetime.now(datetime.timezone.utc)
+
+    records = []
+    for user_data, vector_hits in zip(user_contexts, vector_results):
+        hits = index.fuse(vector_hits, keyword_query(user_data), k) if HYBRID_SEARCH_ENABLED else vector_hits
+        # With fewer hits than asked for, anything over the similarity threshold gets in
+        cutoff = vector_hits[-1][0] if len(vector_hits) == candidates else FAISS_SIMILARITY_THRESHOLD
+        records.append({
+            "job_ids": [job["job_id"] for _, job in hits],
+            "cutoff": float(cutoff),
+            "index_version": version,
+            "computed_at": computed_at
+        })
+    return records
+
+def _beaten(user_contexts, new_vectors):
+    """Which users some new job vector scores at or above their stored cutoff for"""
+    if len(new_vectors) == 0:
+        return np.zeros(len(user_contexts), dtype=bool)
+    embeddings = normalize(np.stack([decode_embedding(user_data["embedding"]) for user_data in user_contexts]))
+    cutoffs = np.array([user_data["recommendations"]["cutoff"] for user_data in user_contexts], dtype=np.float32)
+    return (embeddings @ new_vectors.T).max(axis=1) >= cutoffs
+
+class RecommendationMaterializer:
+    """
+    Keeps every user's top-k jobs precomputed in their context document
+
+    Results are stamped with `JobIndex.version` and written only while the
+    user's profile still has the stamp it was computed from (saving a
+    profile clears them), so the read path can serve them after a single
+    keyed lookup and a version comparison.
+
+    `refresh` runs after the index changes. When only a small share of jobs
+    changed, users are not searched again wholesale: the new and changed
+    job vectors are scored against each batch of user embeddings in one
+    matrix product, and only users for whom a new job beats their cutoff, or
+    whose results include a removed or changed job, are recomputed. The
+    rest are restamped. With hybrid search this catches every change to the
+    vector candidates; a new job that would only rank through keywords
+    waits for the next full recompute (a large refresh, an index rebuild or
+    a restart).
+    """
+
+    def __init__(self, index, collection, pool=None, k=MATERIALIZE_K, batch_size=BATCH_SEARCH_SIZE,
+                 full_refresh_fraction=MATERIALIZE_FULL_REFRESH_FRACTION):
+        self.index = index
+        self.collection = collection
+        self.pool = pool
+        self.k = k
+        self.batch_size = batch_size
+        self.full_refresh_fraction = full_refresh_fraction
+        self.recomputed = 0
+        self.restamped = 0
+        self.last_refresh = None  # {"mode", "seconds", "recomputed", "restamped"} of the last refresh
+        self._version = None  # index version the stored results were last brought up to
+        self._known_hashes = None  # job content hashes at that version
+        self._lock = asyncio.Lock()
+
+    async def _run(self, func, *args):
+        if self.pool is not None:
+            return await self.pool.run(func, *args)
+        return await asyncio.to_thread(func, *args)
+
+    async def materialize(self, user_contexts):
+        """
+        Compute and store recommendations for the given users, e.g. right after a profile save
+
+        Args:
+            user_contexts: User context dicts with embedding and profile_stamp
+
+        Returns:
+            Number of users whose recommendations were stored
+        """
+        user_contexts = [user_data for user_data in user_contexts if user_data.get("embedding") is not None]
+        if not user_contexts or len(self.index) == 0:
+            return 0
+        records = await self._run(compute_recommendations, self.index, user_contexts, self.k)
+        stored = await save_materialized_recommendations([
+            (user_data["user_id"], user_data.get("profile_stamp"), record)
+            for user_data, record in zip(user_contexts, records)
+        ])
+        self.recomputed += len(user_contexts)
+        return stored
+
+    async def refresh(self):
+        """Bring every user's stored recommendations up to date with the index"""
+        async with self._lock:
+            if len(self.index) == 0:
+                return
+            start = time.perf_counter()
+            version = self.index.version
+            hashes = await asyncio.to_thread(self.index.content_hashes)
+
+            # Incremental only if we know what changed and can score it against users
+            new_vectors = None
+            dropped = set()
+            if self._known_hashes is not None:
+                changed = [job_id for job_id, content in hashes.items() if self._known_hashes.get(job_id) != content]
+                dropped = {job_id for job_id, content in self._known_hashes.items() if hashes.get(job_id) != content}
+                if len(changed) + len(dropped) <= self.full_refresh_fraction * len(hashes):
+                    new_vectors = await self._run(self.index.reconstruct, changed)
+
+            recomputed = restamped = 0
+            async for batch in user_context_batches(self.collection, None, self.batch_size, MATERIALIZE_PROJECTION):
+                stale = []
+                checked = []
+                for user_data in batch:
+                    stored = user_data.get("recommendations")
+                    if user_data.get("embedding") is None or (stored and stored["index_version"] == version):
+                        continue
+                    if (new_vectors is not None and stored and stored["index_version"] == self._version
+                            and not dropped.intersection(stored["job_ids"])):
+                        checked.append(user_data)
+                    else:
+                        stale.append(user_data)
+                if checked:
+                    beaten = await self._run(_beaten, checked, new_vectors)
+                    stale.extend(user_data for user_data, hit in zip(checked, beaten) if hit)
+                    unaffected = [user_data["user_id"] for user_data, hit in zip(checked, beaten) if not hit]
+                    if unaffected:
+                        await restamp_recommendations(unaffected, self._version, version)
+                        restamped += len(unaffected)
+                if stale:
+                    await self.materialize(stale)
+                    recomputed += len(stale)
+
+            self._version = version
+            self._known_hashes = hashes
+            self.restamped += restamped
+            self.last_refresh = {
+                "mode": "incremental" if new_vectors is not None else "full",
+                "seconds": time.perf_counter() - start,
+                "recomputed": recomputed,
+                "restamped": restamped
+            }
+            logger.info(
+                f"Materialized recommendations for index {version} ({self.last_refresh['mode']}): "
+                f"{recomputed} users recomputed, {restamped} unaffected"
+            )
+
+    def stats(self):
+        """Return counters and the outcome of the last refresh"""
+        return {
+            "index_version": self._version,
+            "users_recomputed": self.recomputed,
+            "users_restamped": self.restamped,
+            "last_refresh": self.last_refresh
+        }
@@ -0,0 +1,230 @@
+# response_cache.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DISK_FILE = "responses.sqlite3"
+
+def make_response_key(model, system, max_tokens, prompt):
+    """
+    Build a cache key for an LLM response
+
+    Args:
+        model: Model ID the request is sent to
+        system: System prompt
+        max_tokens: Output token limit
+        prompt: User message, which already embeds the user profile and job listings
+
+    Returns:
+        Hex digest identifying the request
+    """
+    payload = f"{model}\x1f{system}\x1f{max_tokens}\x1f{prompt}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class SQLiteResponseStore:
+    """Disk tier: responses in a SQLite table indexed by user so they can be invalidated per user"""
+
+    def __init__(self, cache_dir, max_entries):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, DISK_FILE), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, user_id TEXT, created REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_user ON responses (user_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+
+    def get(self, key):
+        """Return (value, user_id, created) for `key`, or None"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT value, user_id, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+    def put(self, key, value, user_id, created):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, user_id, created, value) VALUES (?, ?, ?, ?)",
+                (key, user_id, created, value)
+            )
+            # Keep the newest max_entries rows
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def delete_user(self, user_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE user_id = ?", (user_id,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+class MongoResponseStore:
+    """Shared tier: responses in a MongoDB collection that expires entries with a TTL index"""
+
+    def __init__(self, collection, ttl):
+        self.collection = collection
+        self.collection.create_index("user_id")
+        self.collection.create_index("created_at", expireAfterSeconds=int(ttl))
+
+    def get(self, key):
+        doc = self.collection.find_one({"_id": key}, {"value": 1, "user_id": 1, "created": 1})
+        return (doc["value"], doc.get("user_id"), doc["created"]) if doc else None
+
+    def put(self, key, value, user_id, created):
+        from datetime import datetime, timezone
+        self.collection.replace_one(
+            {"_id": key},
+            {
+                "value": value,
+                "user_id": user_id,
+                "created": created,
+                "created_at": datetime.fromtimestamp(created, timezone.utc)
+            },
+            upsert=True
+        )
+
+    def delete(self, key):
+        self.collection.delete_one({"_id": key})
+
+    def delete_user(self, user_id):
+        self.collection.delete_many({"user_id": user_id})
+
+    def clear(self):
+        self.collection.delete_many({})
+
+class ResponseCache:
+    """
+    Two-tier TTL/LRU cache of LLM responses
+
+    Entries live in an in-memory LRU bounded by `max_entries`, optionally
+    backed by a persistent store (SQLite on disk or a MongoDB collection)
+    that survives restarts and can be shared between workers. Every entry
+    records the user it was generated for so a profile update can drop
+    just that user's responses; `clear` drops everything, e.g. after the
+    job index changes.
+    """
+
+    def __init__(self, ttl, max_entries, store=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.store = store
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, user_id, created), least recently used first
+
+    def _expired(self, created):
+        return time.time() - created > self.ttl
+
+    def _remember(self, key, value, user_id, created):
+        self._entries[key] = (value, user_id, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        """Return the cached response for `key`, or None on a miss or expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, _, created = entry
+                if not self._expired(created):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.store is not None:
+            try:
+                stored = self.store.get(key)
+                if stored is not None:
+                    value, user_id, created = stored
+                    if not self._expired(created):
+                        with self._lock:
+                            self._remember(key, value, user_id, created)
+                            self.store_hits += 1
+                        return value
+                    self.store.delete(key)
+            except Exception as e:
+                logger.error(f"Error reading response cache store: {str(e)}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value, user_id=None):
+        """Store a response generated for `user_id`"""
+        created = time.time()
+        with self._lock:
+            self._remember(key, value, user_id, created)
+        if self.store is not None:
+            try:
+                self.store.put(key, value, user_id, created)
+            except Exception as e:
+                logger.error(f"Error writing response cache store: {str(e)}")
+
+    def invalidate_user(self, user_id):
+        """Drop every response generated for `user_id`"""
+        with self._lock:
+            keys = [key for key, (_, owner, _) in self._entries.items() if owner == user_id]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += 1
+        if self.store is not None:
+            try:
+                self.store.delete_user(user_id)
+            except Exception as e:
+                logger.error(f"Error invalidating response cache store: {str(e)}")
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+        if self.store is not None:
+            try:
+                self.store.clear()
+            except Exception as e:
+                logger.error(f"Error clearing response cache store: {str(e)}")
+
+    def stats(self):
+        """Return hit/miss counters and occupancy"""
+        with self._lock:
+            hits = self.hits + self.store_hits
+            lookups = hits + self.misses
+            return {
+                "hits": hits,
+                "memory_hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries
+            }
+
+    def __len__(self):
+        return len(self._entries)
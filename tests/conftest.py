@@ -0,0 +1,72 @@
+# tests/conftest.py
+import asyncio
+import hashlib
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+# Modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DIMENSION = 768
+
+def word_vector(word):
+    seed = int.from_bytes(hashlib.sha1(word.encode("utf-8")).digest()[:4], "big")
+    return np.random.default_rng(seed).standard_normal(DIMENSION).astype(np.float32)
+
+def embed(texts, *args, **kwargs):
+    """Deterministic bag-of-words embeddings: equal texts get equal vectors, unrelated texts near-orthogonal ones"""
+    return np.stack([
+        np.sum([word_vector(word) for word in text.lower().split()] or [np.zeros(DIMENSION, np.float32)], axis=0)
+        for text in texts
+    ])
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    """Replace BERT in faiss_index with `embed`"""
+    import faiss_index
+    monkeypatch.setattr(faiss_index, "batch_get_embeddings", embed)
+    return embed
+
+class StubMessages:
+    """Messages API stand-in that records each request and replies with fixed text chunks"""
+
+    def __init__(self, chunks=("Job 1 ", "fits ", "best.")):
+        self.chunks = list(chunks)
+        self.requests = []
+
+    def _message(self):
+        return types.SimpleNamespace(content=[types.SimpleNamespace(text="".join(self.chunks))], usage=None)
+
+    async def create(self, **params):
+        self.requests.append(params)
+        return self._message()
+
+    def stream(self, **params):
+        self.requests.append(params)
+        messages = self
+
+        class Stream:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            @property
+            async def text_stream(self):
+                for chunk in messages.chunks:
+                    await asyncio.sleep(0)
+                    yield chunk
+
+            async def get_final_message(self):
+                return messages._message()
+
+        return Stream()
+
+@pytest.fixture
+def stub_client():
+    return types.SimpleNamespace(messages=StubMessages())
@@ -0,0 +1,50 @@
+# tests/test_bm25_index.py
+from bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCS = {
+    1: "Rust engineer for embedded systems",
+    2: "Kubernetes platform engineer, Go and Rust",
+    3: "Frontend developer with React",
+    4: "Data engineer, Python and Spark"
+}
+
+def build():
+    index = BM25Index()
+    for job_id, text in DOCS.items():
+        index.add(job_id, tokenize(text))
+    index.add(3, tokenize("Frontend developer with React and Rust"))  # leaves a dead row
+    index.remove(4)
+    return index
+
+def test_saved_index_scores_like_the_original(tmp_path):
+    index = build()
+    path = str(tmp_path / "keywords.npz")
+    index.save(path)
+    loaded = BM25Index.load(path)
+
+    for query in ("rust", "engineer python", "kubernetes rust react", "spark"):
+        assert loaded.search(query, k=5) == index.search(query, k=5)
+    assert len(loaded) == len(index) == 3
+    assert loaded.dead_fraction == index.dead_fraction
+    assert 4 not in loaded and 3 in loaded
+
+def test_loaded_index_keeps_accepting_documents(tmp_path):
+    path = str(tmp_path / "keywords.npz")
+    build().save(path)
+    loaded = BM25Index.load(path)
+    loaded.add(5, tokenize("Rust compiler engineer"))
+    assert loaded.search("compiler", k=5)[0][1] == 5
+
+def test_empty_index_round_trips(tmp_path):
+    path = str(tmp_path / "keywords.npz")
+    BM25Index().save(path)
+    assert BM25Index.load(path).search("rust") == []
+
+def test_fusion_favours_ids_ranked_by_both_retrievers():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [4, 3, 5]], k=60)
+    assert [job_id for _, job_id in fused] == [3, 1, 4, 2, 5]
+    assert fused[0][0] == 1 / 63 + 1 / 62
+
+def test_fusion_of_a_single_ranking_keeps_its_order():
+    assert [job_id for _, job_id in reciprocal_rank_fusion([[7, 3, 9]])] == [7, 3, 9]
+    assert reciprocal_rank_fusion([[], []]) == []
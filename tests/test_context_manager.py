@@ -0,0 +1,40 @@
+# tests/test_context_manager.py
+import asyncio
+
+from context_manager import ContextManager
+
+USER = {"user_id": "u1", "skills": ["python"], "preferences": "backend work"}
+
+def job(n, description=None):
+    return {"job_id": n, "title": f"Engineer {n}", "company": f"Company {n}", "location": "Berlin",
+            "description": description or f"Build service number {n}. " * 20}
+
+def listings_in_prompt(request):
+    return request["messages"][0]["content"][0]["text"]
+
+def test_recommendations_are_the_listings_claude_was_shown(stub_client):
+    # Job 2 repeats job 1's posting, and the budget only leaves room for a few jobs
+    jobs = [job(1), dict(job(1), job_id=2)] + [job(n) for n in range(3, 12)]
+    manager = ContextManager("test", client=stub_client, token_budget=300, description_chars=200)
+
+    result = asyncio.run(manager.get_personalized_recommendations(USER, jobs))
+
+    shown = result["recommendations"]
+    assert [j["job_id"] for j in shown][:2] == [1, 3]
+    assert len(shown) < len(jobs) - 1
+    prompt = listings_in_prompt(stub_client.messages.requests[0])
+    for number, listed in enumerate(shown, start=1):
+        assert f"Job {number}: {listed['title']}" in prompt
+    assert f"Job {len(shown) + 1}:" not in prompt
+
+def test_streamed_prompt_numbers_match_prompt_listings(stub_client):
+    jobs = [job(1), dict(job(1), job_id=2), job(3)]
+    manager = ContextManager("test", client=stub_client, token_budget=1000, description_chars=200)
+
+    async def consume():
+        return [text async for text in manager.stream_personalized_recommendations(USER, jobs)]
+
+    assert "".join(asyncio.run(consume())) == "Job 1 fits best."
+    shown = manager.prompt_listings(jobs)
+    assert [j["job_id"] for j in shown] == [1, 3]
+    assert "Job 2: Engineer 3" in listings_in_prompt(stub_client.messages.requests[0])
@@ -0,0 +1,52 @@
+# tests/test_database.py
+import pytest
+
+import database
+
+def test_user_data_stays_in_its_original_database():
+    # Moving these would orphan existing users, jobs and chat history
+    for collection in (database.users_collection, database.jobs_collection,
+                       database.chat_collection, database.chat_summary_collection):
+        assert collection.database.name == "personalized_agent"
+    assert database.user_context_collection.database.name == "job_recommendations"
+
+def test_legacy_chat_history_is_migrated_from_the_legacy_database(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(database, "client", client)
+    monkeypatch.setattr(database, "chat_collection", client["personalized_agent"]["chat_buckets"])
+    monkeypatch.setattr(database, "CHAT_BUCKET_SIZE", 2)
+
+    # Written the way the original save_chat_message did
+    legacy = client["personalized_agent"]["chat_history"]
+    for i in range(5):
+        legacy.update_one({"user_id": "u1"}, {"$push": {"chat": {"role": "user", "message": f"m{i}"}}}, upsert=True)
+
+    assert database.migrate_legacy_chat_history() == 1
+    assert legacy.count_documents({}) == 0
+    assert [m["message"] for m in database.get_chat_history("u1", limit=10)] == [f"m{i}" for i in range(5)]
+    assert database.chat_collection.count_documents({"user_id": "u1"}) == 3
+
+def test_chat_pages_split_messages_sharing_a_timestamp(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    import datetime
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(database, "chat_collection", client["personalized_agent"]["chat_buckets"])
+    monkeypatch.setattr(database, "CHAT_BUCKET_SIZE", 3)
+    monkeypatch.setattr(database, "CHAT_MAX_BUCKETS", 0)
+
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    stamps = [start, start, start, start, start + datetime.timedelta(milliseconds=1), start, start]
+    for i, stamp in enumerate(stamps):
+        monkeypatch.setattr(database, "_utcnow", lambda stamp=stamp: stamp)
+        database.save_chat_message("u1", f"m{i}")
+
+    seen = []
+    before = None
+    while True:
+        messages, before = database.get_chat_page("u1", before, limit=2)
+        seen = [m["message"] for m in messages] + seen
+        if before is None:
+            break
+    assert sorted(seen) == [f"m{i}" for i in range(7)]
+    assert len(seen) == len(set(seen))
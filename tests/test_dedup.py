@@ -0,0 +1,39 @@
+# tests/test_dedup.py
+import dedup
+from dedup import deduplicate_jobs, shingle_hashes
+
+DESCRIPTION = ("We are hiring a senior backend engineer to build scalable payment services "
+               "in Python and Go, working closely with product and infrastructure teams.")
+
+def job(job_id, location, description=DESCRIPTION, source="Jooble"):
+    return {"job_id": job_id, "title": "Senior Backend Engineer", "company": "Acme",
+            "location": location, "description": description, "source": source,
+            "url": f"https://example.com/{job_id}"}
+
+def by_location(jobs):
+    return sorted(j["location"] for j in jobs)
+
+def test_unlocated_posting_does_not_bridge_two_cities():
+    for order in ([1, 2, 3], [2, 1, 3], [3, 2, 1], [1, 3, 2]):
+        postings = {1: job(1, "Berlin"), 2: job(2, "Not specified"), 3: job(3, "Paris")}
+        deduplicated, stats = deduplicate_jobs([postings[n] for n in order])
+        locations = by_location(deduplicated)
+        assert "Berlin" in locations and "Paris" in locations
+        assert len(deduplicated) == 2 and stats["near_duplicates"] == 1
+
+def test_near_duplicates_in_one_city_merge_their_sources():
+    deduplicated, _ = deduplicate_jobs([
+        job(1, "Berlin"), job(2, "Berlin", DESCRIPTION + " Apply now.", source="CareerJet"), job(3, "Paris")
+    ])
+    assert by_location(deduplicated) == ["Berlin", "Paris"]
+    berlin = next(j for j in deduplicated if j["location"] == "Berlin")
+    assert sorted(berlin["sources"]) == ["CareerJet", "Jooble"]
+    assert len(berlin["source_urls"]) == 2
+
+
+def test_word_hash_memo_is_bounded(monkeypatch):
+    monkeypatch.setattr(dedup, "_word_hash", dedup.functools.lru_cache(maxsize=4)(dedup._word_hash.__wrapped__))
+    first = shingle_hashes("alpha beta gamma delta")
+    shingle_hashes(" ".join(f"word{n}" for n in range(100)))
+    assert dedup._word_hash.cache_info().currsize == 4
+    assert (shingle_hashes("alpha beta gamma delta") == first).all()
@@ -0,0 +1,83 @@
+# tests/test_embedding_cache.py
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingCache
+
+DIMENSION = 8
+
+def vector(i):
+    return np.full(DIMENSION, i, dtype=np.float32)
+
+def test_entries_survive_reopening(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), 100, DIMENSION)
+    cache.put("a", vector(1))
+    assert np.array_equal(cache.get("a"), vector(1))  # served from the write buffer
+    cache.flush()
+
+    reopened = EmbeddingCache(str(tmp_path), 100, DIMENSION)
+    assert np.array_equal(reopened.get("a"), vector(1))
+    assert reopened.get("b") is None
+
+def test_hits_are_not_written_one_by_one(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), 100, DIMENSION, flush_interval=3600, flush_size=1000)
+    cache.put("a", vector(1))
+    cache.flush()
+    for _ in range(100):
+        cache.get("a")
+    assert len(cache._touched) == 1
+    cache.flush()
+    assert not cache._touched
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), 3, DIMENSION, flush_interval=3600, flush_size=1000)
+    for i in range(3):
+        cache.put(str(i), vector(i))
+        cache.flush()
+    cache.get("0")  # "1" is now the least recently used
+    cache.flush()
+    cache.put("3", vector(3))
+    cache.flush()
+
+    assert cache.get("1") is None
+    assert [cache.get(key)[0] for key in ("0", "2", "3")] == [0, 2, 3]
+    assert cache.evictions == 1
+
+def _write_range(cache_dir, start, count):
+    cache = EmbeddingCache(cache_dir, 10000, DIMENSION, flush_interval=3600, flush_size=7)
+    for i in range(start, start + count):
+        cache.put(f"key-{i}", vector(i))
+    cache.flush()
+
+def test_concurrent_processes_never_mix_up_vectors(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_write_range, args=(str(tmp_path), n * 200, 200)) for n in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    cache = EmbeddingCache(str(tmp_path), 10000, DIMENSION)
+    assert len(cache) == 800
+    for i in range(800):
+        assert np.array_equal(cache.get(f"key-{i}"), vector(i))
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_forked_worker_uses_its_own_connection(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), 100, DIMENSION)
+    cache.put("parent", vector(1))
+    cache.flush()
+
+    def child():
+        cache.put("child", vector(2))
+        cache.flush()
+
+    process = multiprocessing.get_context("fork").Process(target=child)
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+    assert np.array_equal(cache.get("child"), vector(2))
+    assert np.array_equal(cache.get("parent"), vector(1))
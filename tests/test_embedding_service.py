@@ -0,0 +1,70 @@
+# tests/test_embedding_service.py
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")  # embedding_service imports the embedding model
+
+from embedding_service import EmbeddingBatcher
+
+class StubPool:
+    """Worker pool that embeds each text as a vector filled with its length"""
+
+    workers = 1
+
+    def __init__(self):
+        self.batches = []
+        self.release = None  # asyncio.Event each batch waits for, if set
+
+    async def run(self, fn, texts, *args):
+        self.batches.append(list(texts))
+        if self.release is not None:
+            await self.release.wait()
+        await asyncio.sleep(0)
+        return [np.full(3, len(text), dtype=np.float32) for text in texts]
+
+def test_stop_embeds_the_batch_being_collected():
+    async def scenario():
+        pool = StubPool()
+        batcher = EmbeddingBatcher(pool, max_batch_size=8, max_wait=60)
+        await batcher.start()
+        requests = [asyncio.create_task(batcher.embed(text)) for text in ("a", "bb")]
+        await asyncio.sleep(0.01)  # both taken off the queue, batch still collecting
+        await batcher.stop()
+        return pool, await asyncio.wait_for(asyncio.gather(*requests), 1)
+
+    pool, vectors = asyncio.run(scenario())
+    assert pool.batches == [["a", "bb"]]
+    assert [float(v[0]) for v in vectors] == [1.0, 2.0]
+
+def test_embed_after_stop_is_rejected():
+    async def scenario():
+        batcher = EmbeddingBatcher(StubPool(), max_batch_size=8, max_wait=60)
+        await batcher.start()
+        await batcher.stop()
+        with pytest.raises(RuntimeError):
+            await batcher.embed("late")
+
+    asyncio.run(scenario())
+
+def test_batches_wait_for_a_free_worker_and_keep_collecting():
+    async def scenario():
+        pool = StubPool()
+        pool.release = asyncio.Event()
+        batcher = EmbeddingBatcher(pool, max_batch_size=8, max_wait=0)
+        await batcher.start()
+        first = asyncio.create_task(batcher.embed("a"))
+        await asyncio.sleep(0.01)
+        rest = [asyncio.create_task(batcher.embed(text)) for text in ("bb", "ccc")]
+        await asyncio.sleep(0.01)
+        in_flight = list(pool.batches)
+        pool.release.set()
+        vectors = await asyncio.wait_for(asyncio.gather(first, *rest), 1)
+        await batcher.stop()
+        return in_flight, pool.batches, vectors
+
+    in_flight, batches, vectors = asyncio.run(scenario())
+    assert in_flight == [["a"]]
+    assert batches == [["a"], ["bb", "ccc"]]
+    assert [float(v[0]) for v in vectors] == [1.0, 2.0, 3.0]
@@ -0,0 +1,293 @@
+# tests/test_faiss_index.py
+import importlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")  # faiss_index imports the embedding model
+
+from faiss_index import JobIndex, normalize
+from tests.conftest import DIMENSION, embed
+
+def make_job(job_id, description, location="Berlin"):
+    return {"job_id": job_id, "title": f"Job {job_id}", "company": "Acme", "location": location,
+            "description": description, "source": "jooble", "url": f"https://example.com/{job_id}"}
+
+def corpus(n=40):
+    return [make_job(i, f"role{i} team{i % 7} stack{i % 5}", "Berlin" if i % 2 else "Paris") for i in range(n)]
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_reembedded_job_does_not_match_its_old_vector(fake_embeddings, index_type):
+    index = JobIndex(DIMENSION, index_type)
+    index.upsert(corpus())
+    old_text = index.jobs[5]["description"]
+    index.upsert([make_job(5, "completely different words here", "Paris")])
+
+    hits = index.search(embed([old_text])[0], k=5, min_similarity=None)
+    assert all(not (job["job_id"] == 5 and similarity > 0.99) for similarity, job in hits)
+
+    similarity, job = index.search(embed(["completely different words here"])[0], k=1)[0]
+    assert job["job_id"] == 5 and similarity == pytest.approx(1.0, abs=1e-4)
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_filtered_paths_agree_after_reembedding(fake_embeddings, index_type, monkeypatch):
+    index = JobIndex(DIMENSION, index_type)
+    index.upsert(corpus())
+    old_text = index.jobs[5]["description"]
+    index.upsert([make_job(5, "completely different words here")])
+    query = embed([old_text])[0]
+    filters = {"location": "Berlin"}
+
+    import faiss_index
+    exact = index.search(query, k=5, min_similarity=None, filters=filters)
+    monkeypatch.setattr(faiss_index, "FILTER_EXACT_MAX", 0)  # force the selector path through the index
+    graph = index.search(query, k=5, min_similarity=None, filters=filters)
+    assert [job["job_id"] for _, job in exact] == [job["job_id"] for _, job in graph]
+    assert np.allclose([s for s, _ in exact], [s for s, _ in graph], atol=1e-4)
+
+def test_deleted_job_is_not_returned_after_reload(fake_embeddings, tmp_path):
+    index = JobIndex(DIMENSION, "hnsw")
+    index.upsert(corpus())
+    old_text = index.jobs[3]["description"]
+    index.upsert([make_job(3, "replacement description text")])
+    index.delete([8])
+    index.save(str(tmp_path))
+
+    loaded = JobIndex(DIMENSION, "hnsw")
+    assert loaded.load(str(tmp_path))
+    hits = loaded.search(embed([old_text])[0], k=10, min_similarity=None)
+    assert all(not (job["job_id"] == 3 and similarity > 0.99) for similarity, job in hits)
+    assert 8 not in [job["job_id"] for _, job in loaded.search(embed([corpus()[8]["description"]])[0], k=10)]
+    assert loaded.version == index.version
+
+@pytest.mark.parametrize("filters", [{"location": ""}, {"sources": []}, {"location": "", "sources": []}])
+def test_empty_filter_values_search_unfiltered(fake_embeddings, filters):
+    index = JobIndex(DIMENSION, "flat")
+    index.upsert(corpus())
+    query = embed([index.jobs[7]["description"]])[0]
+
+    unfiltered = [job["job_id"] for _, job in index.search(query, k=5, min_similarity=None)]
+    assert [job["job_id"] for _, job in index.search(query, k=5, min_similarity=None, filters=filters)] == unfiltered
+    assert index.hybrid_search(query, "role7", k=5, min_similarity=None, filters=filters)
+
+def test_concurrent_searches_run_in_parallel(fake_embeddings):
+    import threading
+
+    index = JobIndex(DIMENSION, "flat")
+    index.upsert(corpus())
+    barrier = threading.Barrier(2, timeout=5)
+    inner = index.index
+
+    class BlockingIndex:
+        """Makes each FAISS search wait until the other one has started too"""
+        def __getattr__(self, name):
+            return getattr(inner, name)
+
+        def search(self, *args, **kwargs):
+            barrier.wait()
+            return inner.search(*args, **kwargs)
+
+    index.index = BlockingIndex()
+    query = embed([index.jobs[1]["description"]])[0]
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(index.search(query, k=3))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert not barrier.broken and len(results) == 2
+
+def snapshot_dirs(directory):
+    return sorted(p.name for p in directory.iterdir() if p.name.startswith("snapshot-"))
+
+def test_save_publishes_one_versioned_snapshot(fake_embeddings, tmp_path):
+    import faiss_index
+    index = JobIndex(DIMENSION, "flat")
+    index.upsert(corpus())
+    index.save(str(tmp_path))
+    index.delete([4])
+    index.save(str(tmp_path))
+
+    assert snapshot_dirs(tmp_path) == [faiss_index.current_snapshot(str(tmp_path))]
+    assert faiss_index.saved_version(str(tmp_path)) == index.version
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(faiss_index.STAGING_PREFIX)]
+    loaded = JobIndex(DIMENSION, "flat")
+    assert loaded.load(str(tmp_path)) and 4 not in loaded.jobs and len(loaded.jobs) == 39
+
+def test_failed_save_keeps_previous_snapshot_live(fake_embeddings, tmp_path, monkeypatch):
+    import faiss_index
+    index = JobIndex(DIMENSION, "flat")
+    index.upsert(corpus())
+    index.save(str(tmp_path))
+    saved = faiss_index.current_snapshot(str(tmp_path))
+
+    def crash(directory):
+        raise OSError("disk full")
+
+    index.delete([4])
+    monkeypatch.setattr(faiss_index.JobCatalog, "commit_save", staticmethod(crash))
+    with pytest.raises(OSError):
+        index.save(str(tmp_path))
+
+    assert faiss_index.current_snapshot(str(tmp_path)) == saved
+    assert snapshot_dirs(tmp_path) == [saved]
+    loaded = JobIndex(DIMENSION, "flat")
+    assert loaded.load(str(tmp_path)) and 4 in loaded.jobs
+
+def test_refresher_skips_save_when_version_is_unchanged(fake_embeddings, tmp_path, monkeypatch):
+    from job_refresher import JobRefresher
+    index = JobIndex(DIMENSION, "flat")
+    refresher = JobRefresher(index=index, snapshot_dir=str(tmp_path))
+    saves = []
+    save = index.save
+    monkeypatch.setattr(index, "save", lambda directory: saves.append(save(directory)))
+
+    refresher._apply(corpus())
+    refresher._apply(corpus())
+    assert len(saves) == 1
+    # Another process reaching the same jobs finds them on disk already
+    other = JobIndex(DIMENSION, "flat")
+    monkeypatch.setattr(other, "save", lambda directory: saves.append(directory))
+    JobRefresher(index=other, snapshot_dir=str(tmp_path))._apply(corpus())
+    assert len(saves) == 1
+    refresher._apply(corpus()[:-1])
+    assert len(saves) == 2
+
+def test_upsert_into_trained_ivfpq_index_keeps_other_vectors(fake_embeddings, tmp_path):
+    jobs = corpus(300)
+    index = JobIndex(DIMENSION, "ivfpq")
+    index.upsert(jobs)
+    assert index.index_type == "ivfpq" and index.index.ntotal == 300
+    query = embed([jobs[17]["description"]])[0]
+    before = [job["job_id"] for _, job in index.search(query, k=5, min_similarity=None)]
+
+    index.upsert([make_job(5, "completely different words here")])
+    assert index.index.ntotal == 300
+    assert [job["job_id"] for _, job in index.search(query, k=5, min_similarity=None)] == before
+
+    index.save(str(tmp_path))
+    loaded = JobIndex(DIMENSION, "ivfpq")
+    assert loaded.load(str(tmp_path))
+    loaded.upsert([make_job(6, "another replacement description")])
+    assert loaded.index.ntotal == 300
+
+def test_wrapped_ivfpq_snapshot_is_marked_for_rebuild(fake_embeddings, tmp_path):
+    import faiss
+    index = JobIndex(DIMENSION, "ivfpq")
+    index.upsert(corpus(300))
+    # As snapshots written before IVF lists held the job IDs themselves
+    ivf = faiss.clone_index(index.index)
+    ivf.reset()
+    wrapped = faiss.IndexIDMap2(ivf)
+    wrapped.add_with_ids(normalize(embed([job["description"] for job in index.jobs.values()])),
+                         np.array(list(index.jobs), dtype=np.int64))
+    index.index = wrapped
+    index.save(str(tmp_path))
+
+    loaded = JobIndex(DIMENSION, "ivfpq")
+    assert loaded.load(str(tmp_path))
+    assert loaded.stale_fraction == 1.0
+
+def test_searches_run_and_upserts_survive_while_saving(fake_embeddings, tmp_path, monkeypatch):
+    import threading
+    import faiss_index
+    index = JobIndex(DIMENSION, "flat")
+    index.upsert(corpus())
+    query = embed([index.jobs[1]["description"]])[0]
+    searched = []
+    searched_during_save = []
+    upsert = threading.Thread(target=lambda: index.upsert([make_job(99, "added during the save")]))
+    write_index = faiss_index.faiss.write_index
+
+    def slow_write_index(*args):
+        search = threading.Thread(target=lambda: searched.append(index.search(query, k=3)))
+        search.start()
+        search.join(2)
+        searched_during_save.append(len(searched))
+        upsert.start()
+        write_index(*args)
+
+    monkeypatch.setattr(faiss_index.faiss, "write_index", slow_write_index)
+    index.save(str(tmp_path))
+    upsert.join(5)
+
+    assert searched_during_save == [1] and searched[0]
+    assert 99 in index.jobs and index.jobs[99]["description"] == "added during the save"
+    assert index.search(embed(["added during the save"])[0], k=1)[0][1]["job_id"] == 99
+
+def test_load_restores_keyword_index_without_tokenizing(fake_embeddings, tmp_path, monkeypatch):
+    import faiss_index
+    index = JobIndex(DIMENSION, "flat")
+    index.upsert(corpus())
+    index.save(str(tmp_path))
+    query = embed([index.jobs[3]["description"]])[0]
+    expected = index.hybrid_search(query, "role3 team3", k=5, min_similarity=None)
+
+    def no_tokenizing(job):
+        raise AssertionError("snapshot load re-tokenized a job")
+
+    import bm25_index
+    monkeypatch.setattr(faiss_index, "job_tokens", no_tokenizing)
+    monkeypatch.setattr(bm25_index, "job_tokens", no_tokenizing)
+    loaded = JobIndex(DIMENSION, "flat")
+    assert loaded.load(str(tmp_path))
+    assert loaded.hybrid_search(query, "role3 team3", k=5, min_similarity=None) == expected
+
+def test_hybrid_search_surfaces_exact_keyword_matches(fake_embeddings):
+    index = JobIndex(DIMENSION, "flat")
+    index.upsert(corpus() + [make_job(100, "kubernetes operator in rust")])
+    user_embedding = embed(["role3 team3 stack3"])[0]
+
+    vector_ids = [job["job_id"] for _, job in index.search(user_embedding, k=5, min_similarity=None)]
+    hybrid = index.hybrid_search(user_embedding, "role3 kubernetes", k=5, min_similarity=None)
+    hybrid_ids = [job["job_id"] for _, job in hybrid]
+
+    assert 100 not in vector_ids
+    assert hybrid_ids[0] == 3  # first in both rankings
+    assert 100 in hybrid_ids
+    assert [score for score, _ in hybrid] == sorted((score for score, _ in hybrid), reverse=True)
+
+def test_truncate_mode_is_the_default_and_embeds_one_vector_per_job(fake_embeddings, monkeypatch):
+    import config
+    import faiss_index
+
+    def no_chunking(texts):
+        raise AssertionError("truncate mode must not split descriptions into windows")
+
+    monkeypatch.setattr(faiss_index, "batch_get_chunk_embeddings", no_chunking)
+    monkeypatch.delenv("EMBEDDING_CHUNK_MODE", raising=False)
+    assert importlib.reload(config).EMBEDDING_CHUNK_MODE == "truncate"
+    monkeypatch.setattr(faiss_index, "EMBEDDING_CHUNK_MODE", "truncate")
+
+    index = JobIndex(DIMENSION, "flat")
+    index.upsert(corpus(10))
+    assert index._vectors_per_job == 1 and index.index.ntotal == 10
+
+def test_multi_mode_scores_each_job_by_its_best_window(fake_embeddings, monkeypatch):
+    import faiss_index
+
+    def sentence_windows(texts):
+        windows = [(i, sentence) for i, text in enumerate(texts) for sentence in text.split(". ")]
+        return embed([sentence for _, sentence in windows]), np.array([i for i, _ in windows], dtype=np.int64)
+
+    monkeypatch.setattr(faiss_index, "EMBEDDING_CHUNK_MODE", "multi")
+    monkeypatch.setattr(faiss_index, "EMBEDDING_MAX_CHUNKS", 4)
+    monkeypatch.setattr(faiss_index, "batch_get_chunk_embeddings", sentence_windows)
+    index = JobIndex(DIMENSION, "flat")
+    jobs = corpus(10) + [make_job(50, "intro words here. middle part text. rust kubernetes requirements")]
+    index.upsert(jobs)
+
+    assert index.index.ntotal == 13 and index._vector_counts == {50: 3}
+    hits = index.search(embed(["rust kubernetes requirements"])[0], k=5, min_similarity=None)
+    assert hits[0][1]["job_id"] == 50 and hits[0][0] == pytest.approx(1.0, abs=1e-4)
+    assert len({job["job_id"] for _, job in hits}) == len(hits) == 5
+
+def test_changing_chunk_mode_re_embeds_every_job(fake_embeddings, monkeypatch):
+    import faiss_index
+
+    index = JobIndex(DIMENSION, "flat")
+    jobs = corpus(10)
+    index.upsert(jobs)
+    assert index.upsert(jobs) == 0
+    monkeypatch.setattr(faiss_index, "EMBEDDING_CHUNK_MODE", "pooled")
+    assert index.upsert(jobs) == 10
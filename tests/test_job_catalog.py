@@ -0,0 +1,53 @@
+# tests/test_job_catalog.py
+import pytest
+
+from job_catalog import JobCatalog
+
+def job(job_id, description=None, company="Acme", **extra):
+    return dict({"job_id": job_id, "title": f"Engineer {job_id}", "company": company, "location": "Berlin",
+                 "url": f"https://example.com/{job_id}", "date_posted": "2024-01-01", "source": "Jooble",
+                 "description": description or f"Build service number {job_id}."}, **extra)
+
+def saved(catalog, directory):
+    directory.mkdir(exist_ok=True)
+    rows, blob_size = catalog.save(str(directory))
+    JobCatalog.commit_save(str(directory))
+    return JobCatalog.load(str(directory), rows, blob_size)
+
+def test_jobs_round_trip_through_the_blob(tmp_path):
+    jobs = [job(1), job(2, "Café in Zürich — ünïcode"), job(3, sources=["Jooble", "Greenhouse"])]
+    loaded = saved(JobCatalog.from_jobs(jobs), tmp_path)
+
+    assert len(loaded) == 3 and sorted(loaded) == [1, 2, 3]
+    for original in jobs:
+        assert loaded[original["job_id"]] == original
+    assert loaded.get(4) is None and 4 not in loaded
+    # Served straight from the memory-mapped blob
+    assert bytes(loaded.description_bytes(2)) == "Café in Zürich — ünïcode".encode("utf-8")
+    assert loaded.description_bytes(2).obj is loaded._base
+
+def test_shared_strings_are_stored_once():
+    catalog = JobCatalog.from_jobs([job(1, company="".join(["Ac", "me"])), job(2, company="".join(["Acm", "e"]))])
+    assert catalog._records[1].company is catalog._records[2].company
+
+def test_changes_after_load_and_compaction_on_save(tmp_path):
+    loaded = saved(JobCatalog.from_jobs([job(n) for n in range(1, 5)]), tmp_path / "first")
+
+    loaded[1] = job(1, title="Staff Engineer")  # same description: no new bytes
+    assert loaded.blob_garbage() == 0
+    loaded[2] = job(2, "A rewritten description")
+    del loaded[3]
+    loaded[5] = job(5)
+    assert loaded.blob_garbage() == len(job(2)["description"]) + len(job(3)["description"])
+    assert loaded[2]["description"] == "A rewritten description" and loaded[5] == job(5)
+
+    compacted = saved(loaded, tmp_path / "second")
+    assert compacted.blob_garbage() == 0
+    assert {job_id: compacted[job_id] for job_id in compacted} == {job_id: loaded[job_id] for job_id in loaded}
+
+def test_load_rejects_a_blob_that_does_not_match_the_rows(tmp_path):
+    catalog = JobCatalog.from_jobs([job(1)])
+    rows, blob_size = catalog.save(str(tmp_path))
+    JobCatalog.commit_save(str(tmp_path))
+    with pytest.raises(ValueError):
+        JobCatalog.load(str(tmp_path), rows, blob_size + 1)
@@ -0,0 +1,176 @@
+# tests/test_job_fetcher.py
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+
+import job_fetcher
+
+class ScriptedServer:
+    """
+    Local HTTP server whose answers are scripted per path
+
+    `routes` maps a path such as "/jooble" to a function taking the 1-based
+    page number and returning (status, jobs); a handler may block on
+    `release` to stand in for a source that never answers.
+    """
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.requests = []
+        self.release = threading.Event()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._respond(self, int(parse_qs(urlparse(self.path).query).get("page", ["1"])[0]))
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server._respond(self, int(body.get("page", 1)))
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def close(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _respond(self, handler, page):
+        path = urlparse(handler.path).path
+        self.requests.append((path, page))
+        status, jobs = self.routes[path](page)
+        body = json.dumps({"jobs": jobs}).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(routes):
+        servers.append(ScriptedServer(routes))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """Upper bounds of the jittered retry delays, which are then skipped"""
+    bounds = []
+
+    def uniform(low, high):
+        bounds.append(high)
+        return 0.0
+
+    monkeypatch.setattr(job_fetcher.random, "uniform", uniform)
+    return bounds
+
+def posting(source, n):
+    return {"title": f"{source} role {n}", "company": f"{source} co", "location": "Berlin",
+            "description": f"{source} posting number {n} with its own text", "url": f"https://{source}.example/{n}"}
+
+def request_json(server, path, method="GET"):
+    async def run():
+        async with httpx.AsyncClient(timeout=5) as client:
+            return await job_fetcher._request_json(client, "Stub", asyncio.Semaphore(1), method, server.url(path))
+    return asyncio.run(run())
+
+def test_transient_failures_are_retried_with_exponential_backoff(serve, backoffs, monkeypatch):
+    monkeypatch.setattr(job_fetcher, "JOB_FETCH_RETRIES", 3)
+    monkeypatch.setattr(job_fetcher, "JOB_FETCH_BACKOFF", 0.5)
+    answers = iter([(503, []), (429, []), (200, [posting("jooble", 1)])])
+    server = serve({"/flaky": lambda page: next(answers)})
+
+    assert request_json(server, "/flaky")["jobs"] == [posting("jooble", 1)]
+    assert len(server.requests) == 3
+    assert backoffs == [0.5, 1.0]
+
+def test_source_error_after_retries_run_out(serve, backoffs, monkeypatch):
+    monkeypatch.setattr(job_fetcher, "JOB_FETCH_RETRIES", 2)
+    server = serve({"/down": lambda page: (502, [])})
+
+    with pytest.raises(job_fetcher.JobSourceError, match="3 attempts"):
+        request_json(server, "/down")
+    assert len(server.requests) == 3 and len(backoffs) == 2
+
+def test_client_errors_are_not_retried(serve, backoffs):
+    server = serve({"/missing": lambda page: (404, [])})
+
+    with pytest.raises(httpx.HTTPStatusError):
+        request_json(server, "/missing")
+    assert len(server.requests) == 1 and backoffs == []
+
+def test_source_deadline_keeps_partial_results(serve, backoffs, monkeypatch):
+    server = None
+
+    def jooble(page):
+        if page > 1:
+            server.release.wait(10)  # never answers within the deadline
+        return 200, [posting("jooble", page * 10 + n) for n in range(3)]
+
+    server = serve({
+        "/jooble/key": jooble,
+        "/careerjet": lambda page: (500, []),
+        "/greenhouse": lambda page: (200, [posting("greenhouse", n) for n in range(2)]),
+        "/web3career": lambda page: (200, [posting("web3career", n) for n in range(2)] if page == 1 else [])
+    })
+    monkeypatch.setitem(job_fetcher.API_KEYS, "jooble", "key")
+    monkeypatch.setitem(job_fetcher.API_KEYS, "careerjet", "affiliate")
+    for source in ("careerjet", "greenhouse", "web3career"):
+        monkeypatch.setitem(job_fetcher.JOB_API_URLS, source, server.url(f"/{source}"))
+    monkeypatch.setitem(job_fetcher.JOB_API_URLS, "jooble", server.url("/jooble"))
+    monkeypatch.setattr(job_fetcher, "JOB_SOURCE_DEADLINE", 0.5)
+    monkeypatch.setattr(job_fetcher, "JOB_FETCH_CONCURRENCY", 1)
+    monkeypatch.setattr(job_fetcher, "JOB_FETCH_RETRIES", 1)
+
+    started = time.perf_counter()
+    jobs = asyncio.run(job_fetcher.fetch_jobs_from_apis_async("engineer", limit=100))
+    elapsed = time.perf_counter() - started
+
+    titles = sorted(job["title"] for job in jobs)
+    assert titles == sorted(
+        [f"jooble role {n}" for n in (10, 11, 12)]
+        + [f"greenhouse role {n}" for n in range(2)]
+        + [f"web3career role {n}" for n in range(2)]
+    )
+    assert ("/careerjet", 1) in server.requests
+    assert elapsed < 3
+
+def test_limit_is_shared_across_sources(monkeypatch):
+    def source(name, count):
+        async def fetch(client, keywords, location, limit, out):
+            out.extend(dict(posting(name, n), source=name) for n in range(min(count, limit)))
+        fetch.__name__ = f"fetch_from_{name}"
+        return fetch
+
+    monkeypatch.setattr(job_fetcher, "fetch_from_jooble", source("jooble", 50))
+    monkeypatch.setattr(job_fetcher, "fetch_from_careerjet", source("careerjet", 50))
+    monkeypatch.setattr(job_fetcher, "fetch_from_greenhouse", source("greenhouse", 2))
+    monkeypatch.setattr(job_fetcher, "fetch_from_web3career", source("web3career", 0))
+
+    jobs = asyncio.run(job_fetcher.fetch_jobs_from_apis_async("engineer", limit=10, client=object()))
+
+    counts = {}
+    for job in jobs:
+        counts[job["source"]] = counts.get(job["source"], 0) + 1
+    assert len(jobs) == 10
+    assert counts == {"jooble": 4, "careerjet": 4, "greenhouse": 2}
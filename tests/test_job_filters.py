@@ -0,0 +1,44 @@
+# tests/test_job_filters.py
+import datetime
+
+from job_filters import JobAttributeIndex, active_filters
+
+TODAY = datetime.date(2024, 6, 1)
+
+def make_index():
+    return JobAttributeIndex.from_jobs([
+        {"job_id": 1, "location": "Berlin, Germany", "source": "Jooble", "date_posted": "2024-06-01"},
+        {"job_id": 2, "location": "Paris", "source": "CareerJet", "date_posted": "2024-05-01"},
+        {"job_id": 3, "location": "Remote", "source": "Greenhouse", "date_posted": "2024-05-30"},
+        # A posting merged from two sources by dedup
+        {"job_id": 4, "location": "Paris", "source": "Jooble", "sources": ["Jooble", "Web3Career"],
+         "date_posted": "not a date"},
+    ])
+
+def test_empty_values_do_not_filter():
+    index = make_index()
+    assert index.select(location="") is None
+    assert index.select(sources=[]) is None
+    assert index.select(location="", sources=[]) is None
+    assert active_filters({"location": "", "sources": [], "posted_within_days": None}) == {}
+
+def test_zero_days_is_a_filter():
+    assert active_filters({"posted_within_days": 0}) == {"posted_within_days": 0}
+    assert make_index().select(posted_within_days=0, today=TODAY).tolist() == [1]
+
+def test_location_matches_parts_and_remote():
+    index = make_index()
+    assert index.select(location="germany").tolist() == [1, 3]
+    assert index.select(location="Germany", include_remote=False).tolist() == [1]
+
+def test_every_source_of_a_merged_posting_is_indexed():
+    index = make_index()
+    assert index.select(sources=["web3career"]).tolist() == [4]
+    assert index.select(sources=["Jooble"]).tolist() == [1, 4]
+    index.remove(4)
+    assert index.select(sources=["web3career"]).tolist() == []
+
+def test_filters_combine():
+    index = make_index()
+    assert index.select(location="Paris", sources=["Web3Career"], include_remote=False).tolist() == [4]
+    assert index.select(location="Paris", posted_within_days=7, today=TODAY).tolist() == [3]
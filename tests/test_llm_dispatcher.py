@@ -0,0 +1,99 @@
+# tests/test_llm_dispatcher.py
+import asyncio
+import time
+
+import anthropic
+import httpx
+import pytest
+
+from context_manager import ContextManager
+from llm_dispatcher import LLMDispatcher
+
+USER = {"user_id": "u1", "skills": ["python"], "preferences": "backend work"}
+JOBS = [{"job_id": 1, "title": "Engineer", "company": "Acme", "location": "Berlin", "description": "Build services."}]
+REPLY = {
+    "id": "msg_1", "type": "message", "role": "assistant", "model": ContextManager.MODEL,
+    "content": [{"type": "text", "text": "Job 1 fits."}], "stop_reason": "end_turn", "stop_sequence": None,
+    "usage": {"input_tokens": 10, "output_tokens": 3}
+}
+
+def status_error(status, retry_after=None):
+    headers = {} if retry_after is None else {"retry-after": str(retry_after)}
+    response = httpx.Response(status, headers=headers, request=httpx.Request("POST", "https://api.anthropic.com"))
+    return anthropic.APIStatusError("error", response=response, body=None)
+
+def scripted_call(outcomes):
+    """Async function returning or raising the given outcomes in turn, recording when it was called"""
+    calls = []
+
+    async def call():
+        calls.append(time.monotonic())
+        outcome = outcomes[len(calls) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return call, calls
+
+def test_rate_limited_call_waits_out_retry_after_then_succeeds():
+    dispatcher = LLMDispatcher(max_concurrency=2, max_retries=3)
+    call, calls = scripted_call([status_error(429, retry_after=0.2), "done"])
+
+    assert asyncio.run(dispatcher.run(call)) == "done"
+    assert len(calls) == 2 and calls[1] - calls[0] >= 0.2
+    assert dispatcher.stats()["rate_limited"] == 1 and dispatcher.stats()["completed"] == 1
+
+def test_pause_holds_back_every_call_until_it_ends():
+    async def scenario():
+        dispatcher = LLMDispatcher(max_concurrency=2, max_retries=3)
+        limited, _ = scripted_call([status_error(529, retry_after=0.3), "retried"])
+        other, other_calls = scripted_call(["other"])
+        first = asyncio.create_task(dispatcher.run(limited))
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        results = await asyncio.gather(first, dispatcher.run(other))
+        return results, other_calls[0] - started
+
+    results, waited = asyncio.run(scenario())
+    assert results == ["retried", "other"]
+    assert waited >= 0.2
+
+def test_error_is_raised_once_retries_run_out():
+    dispatcher = LLMDispatcher(max_retries=2, base_delay=0.01)
+    call, calls = scripted_call([status_error(429)] * 3)
+
+    with pytest.raises(anthropic.APIStatusError):
+        asyncio.run(dispatcher.run(call))
+    assert len(calls) == 3
+    assert dispatcher.stats()["failed"] == 1 and dispatcher.stats()["rate_limited"] == 2
+
+def test_non_retryable_error_is_raised_straight_away():
+    dispatcher = LLMDispatcher(max_retries=5)
+    call, calls = scripted_call([status_error(400)])
+
+    with pytest.raises(anthropic.APIStatusError):
+        asyncio.run(dispatcher.run(call))
+    assert len(calls) == 1
+
+def test_dispatched_calls_are_not_also_retried_by_the_client():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if len(requests) <= 2:
+            return httpx.Response(429, headers={"retry-after": "0"}, json={"type": "error", "error": {}})
+        return httpx.Response(200, json=REPLY)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+            client = anthropic.AsyncAnthropic(api_key="test", http_client=http_client, max_retries=5)
+            manager = ContextManager("test", client=client)
+            dispatcher = LLMDispatcher(max_retries=2)
+            return await dispatcher.run(
+                manager.get_personalized_recommendations, user_context=USER, job_listings=JOBS, max_retries=0
+            ), dispatcher
+
+    result, dispatcher = asyncio.run(scenario())
+    assert result["claude_analysis"] == "Job 1 fits."
+    assert len(requests) == 3
+    assert dispatcher.stats()["rate_limited"] == 2
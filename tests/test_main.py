@@ -0,0 +1,70 @@
+# tests/test_main.py
+import json
+
+import pytest
+
+pytest.importorskip("torch")  # main loads the embedding model
+
+from fastapi.testclient import TestClient
+
+import main
+from tests.conftest import StubMessages
+
+USER = {"user_id": "u1", "skills": ["python"], "preferences": "backend work"}
+JOBS = [
+    {"job_id": n, "title": f"Engineer {n}", "company": f"Company {n}", "location": "Berlin",
+     "description": f"Build service number {n}."}
+    for n in (1, 2, 3)
+]
+
+class FailingMessages(StubMessages):
+    """Streams its chunks, then fails as a dropped connection would"""
+
+    def stream(self, **params):
+        stream = super().stream(**params)
+        chunks = stream.text_stream
+
+        class Failing(type(stream)):
+            @property
+            async def text_stream(self):
+                async for chunk in chunks:
+                    yield chunk
+                raise ConnectionError("stream dropped")
+
+        return Failing()
+
+def sse_events(body):
+    """Parse a server-sent event stream into (event, data) pairs"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+@pytest.fixture
+def stream_client(monkeypatch, stub_client):
+    async def find_recommended_jobs(user_id, filters=None):
+        return dict(USER), list(JOBS)
+
+    monkeypatch.setattr(main, "find_recommended_jobs", find_recommended_jobs)
+    monkeypatch.setattr(main.context_manager, "client", stub_client)
+    monkeypatch.setattr(main.context_manager, "cache", None)
+    return TestClient(main.app)
+
+def test_stream_sends_listings_then_analysis_then_done(stream_client, stub_client):
+    response = stream_client.get("/recommendations/u1/stream")
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = sse_events(response.text)
+    assert [name for name, _ in events] == ["recommendations", "analysis", "analysis", "analysis", "done"]
+    assert [job["job_id"] for job in events[0][1]["recommendations"]] == [1, 2, 3]
+    assert "".join(data["text"] for name, data in events if name == "analysis") == "Job 1 fits best."
+    assert len(stub_client.messages.requests) == 1
+
+def test_stream_ends_with_error_when_generation_fails(stream_client, stub_client):
+    stub_client.messages = FailingMessages()
+
+    events = sse_events(stream_client.get("/recommendations/u1/stream").text)
+    names = [name for name, _ in events]
+    assert names == ["recommendations", "analysis", "analysis", "analysis", "error"]
+    assert events[-1][1] == {"detail": "stream dropped"}
@@ -0,0 +1,85 @@
+# tests/test_model.py
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+import inference_backends
+import model
+
+def tiny_bert():
+    config = transformers.BertConfig(
+        vocab_size=64, hidden_size=32, num_hidden_layers=1, num_attention_heads=2, intermediate_size=64
+    )
+    return transformers.BertModel(config).eval()
+
+@pytest.fixture
+def fresh_load(monkeypatch):
+    loads = []
+
+    def load_fp32_model():
+        loads.append(1)
+        return tiny_bert()
+
+    monkeypatch.setattr(model, "tokenizer", None)
+    monkeypatch.setattr(model, "model", None)
+    monkeypatch.setattr(model, "backend", None)
+    monkeypatch.setattr(model, "load_fp32_model", load_fp32_model)
+    monkeypatch.setattr(transformers.AutoTokenizer, "from_pretrained", staticmethod(lambda name: object()))
+    return loads
+
+def test_int8_backend_keeps_no_fp32_model(monkeypatch, fresh_load):
+    monkeypatch.setattr(model, "INFERENCE_BACKEND", "torch-int8")
+    _, backend = model.load_model()
+    assert backend.name == "torch-int8"
+    assert model.model is None
+    assert not any(isinstance(m, torch.nn.Linear) for m in backend.model.modules())
+
+def test_exported_onnx_backend_never_loads_fp32_model(monkeypatch, tmp_path, fresh_load):
+    onnx_path = tmp_path / "encoder.onnx"
+    onnx_path.write_bytes(b"")
+
+    class Session:
+        name = "onnx"
+
+        def __init__(self, fp32_model, path, num_threads=None):
+            assert fp32_model is None
+
+    monkeypatch.setattr(model, "INFERENCE_BACKEND", "onnx")
+    monkeypatch.setattr(model, "ONNX_MODEL_PATH", str(onnx_path))
+    monkeypatch.setattr(inference_backends, "OnnxBackend", Session)
+    _, backend = model.load_model()
+    assert backend.name == "onnx"
+    assert fresh_load == [] and model.model is None
+
+def test_torch_backend_keeps_fp32_model(monkeypatch, fresh_load):
+    monkeypatch.setattr(model, "INFERENCE_BACKEND", "torch")
+    _, backend = model.load_model()
+    assert model.model is backend.model and len(fresh_load) == 1
+
+def test_windows_overlap_and_cover_every_token():
+    token_ids = list(range(1000))
+    windows = model.chunk_token_ids(token_ids, chunk_tokens=256, overlap=64, max_chunks=16)
+    assert all(len(window) == 256 for window in windows)
+    assert windows[0][0] == 0 and windows[-1][-1] == 999
+    assert [window[0] for window in windows] == [0, 192, 384, 576, 744]
+    assert model.chunk_token_ids(token_ids[:100], chunk_tokens=256, overlap=64) == [token_ids[:100]]
+
+def test_long_texts_keep_evenly_spaced_windows_including_first_and_last():
+    windows = model.chunk_token_ids(list(range(5000)), chunk_tokens=256, overlap=64, max_chunks=4)
+    assert len(windows) == 4
+    assert windows[0][0] == 0 and windows[-1][-1] == 4999
+
+def test_pooled_windows_are_weighted_by_length_and_skip_failed_batches():
+    dimension = model.EMBEDDING_DIMENSION
+    vectors = np.stack([
+        np.full(dimension, 1.0), np.full(dimension, 4.0), np.zeros(dimension), np.full(dimension, 2.0)
+    ]).astype(np.float32)
+    owners = np.array([0, 0, 1, 1])
+    lengths = np.array([300, 100, 256, 50])
+
+    pooled = model.pool_chunks(vectors, owners, lengths, 2)
+    assert pooled[0] == pytest.approx(np.full(dimension, (300 * 1.0 + 100 * 4.0) / 400))
+    assert pooled[1] == pytest.approx(np.full(dimension, 2.0))  # the failed, all-zero window is left out
+    assert model.pool_chunks(vectors, owners, lengths, 2, "max")[0] == pytest.approx(np.full(dimension, 4.0))
@@ -0,0 +1,111 @@
+# tests/test_recommendation_materializer.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("torch")  # faiss_index imports the embedding model
+mongomock = pytest.importorskip("mongomock")
+
+import database
+import recommendation_materializer
+from faiss_index import JobIndex
+from recommendation_materializer import RecommendationMaterializer
+from tests.conftest import DIMENSION, embed
+
+class AsyncCollection:
+    """The few Motor collection methods the materializer uses, over a mongomock collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, query, projection=None, batch_size=None):
+        documents = list(self.collection.find(query, projection))
+
+        async def cursor():
+            for document in documents:
+                yield document
+
+        return cursor()
+
+    async def bulk_write(self, operations, ordered=True):
+        return self.collection.bulk_write(operations, ordered=ordered)
+
+    async def update_many(self, query, update):
+        return self.collection.update_many(query, update)
+
+# Shared by every job and user, so similarities clear the search threshold
+COMMON = "senior backend engineer python django postgres remote team"
+
+def make_job(job_id, description):
+    return {"job_id": job_id, "title": f"Job {job_id}", "company": "Acme", "location": "Berlin",
+            "description": description, "source": "jooble", "url": f"https://example.com/{job_id}"}
+
+def corpus(n):
+    return [make_job(i, f"{COMMON} role{i} stack{i % 5}") for i in range(n)]
+
+def make_user(user_id, preferences):
+    user = {"user_id": user_id, "skills": [], "preferences": preferences, "embedding": embed([preferences])[0]}
+    stamp = database.profile_stamp(user)
+    return dict(user, embedding=database.encode_embedding(user["embedding"]), profile_stamp=stamp)
+
+@pytest.fixture
+def users(monkeypatch):
+    collection = AsyncCollection(mongomock.MongoClient()["job_recommendations"]["user_contexts"])
+    monkeypatch.setattr(database, "user_context_collection", collection)
+    monkeypatch.setattr(recommendation_materializer, "HYBRID_SEARCH_ENABLED", False)
+    collection.collection.insert_many([
+        make_user("near", f"{COMMON} role3 stack3"),
+        make_user("far1", f"{COMMON} role11 stack1"),
+        make_user("far2", f"{COMMON} role20 stack0")
+    ])
+    return collection
+
+def stored(collection, user_id):
+    return collection.collection.find_one({"user_id": user_id})["recommendations"]
+
+def test_new_job_recomputes_only_the_users_it_beats(fake_embeddings, users):
+    index = JobIndex(DIMENSION, "flat")
+    index.upsert(corpus(40))
+    materializer = RecommendationMaterializer(index, users, k=5, batch_size=2, full_refresh_fraction=0.5)
+
+    asyncio.run(materializer.refresh())
+    assert materializer.last_refresh["mode"] == "full" and materializer.last_refresh["recomputed"] == 3
+    before = {user_id: stored(users, user_id) for user_id in ("near", "far1", "far2")}
+    assert all(record["index_version"] == index.version for record in before.values())
+    assert all(len(record["job_ids"]) == 5 for record in before.values())
+
+    index.upsert([make_job(100, f"{COMMON} role3 stack3")])
+    asyncio.run(materializer.refresh())
+
+    assert materializer.last_refresh["mode"] == "incremental"
+    assert materializer.last_refresh["recomputed"] == 1 and materializer.last_refresh["restamped"] == 2
+    assert 100 in stored(users, "near")["job_ids"]
+    for user_id in ("far1", "far2"):
+        record = stored(users, user_id)
+        assert record["index_version"] == index.version
+        assert record["job_ids"] == before[user_id]["job_ids"]
+
+def test_removed_job_recomputes_the_users_it_was_recommended_to(fake_embeddings, users):
+    index = JobIndex(DIMENSION, "flat")
+    index.upsert(corpus(40))
+    materializer = RecommendationMaterializer(index, users, k=5, full_refresh_fraction=0.5)
+    asyncio.run(materializer.refresh())
+    removed = stored(users, "near")["job_ids"][0]
+
+    index.delete([removed])
+    asyncio.run(materializer.refresh())
+
+    assert materializer.last_refresh["mode"] == "incremental" and materializer.last_refresh["restamped"] == 2
+    assert removed not in stored(users, "near")["job_ids"]
+    assert all(stored(users, user_id)["index_version"] == index.version for user_id in ("near", "far1", "far2"))
+
+def test_results_for_an_outdated_profile_are_not_stored(fake_embeddings, users):
+    index = JobIndex(DIMENSION, "flat")
+    index.upsert(corpus(10))
+    materializer = RecommendationMaterializer(index, users, k=3)
+    user = users.collection.find_one({"user_id": "near"})
+
+    stale = dict(user, profile_stamp="profile saved since")
+    assert asyncio.run(materializer.materialize([stale])) == 0
+    assert asyncio.run(materializer.materialize([user])) == 1
+    assert len(stored(users, "near")["job_ids"]) == 3
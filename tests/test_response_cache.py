@@ -0,0 +1,63 @@
+# tests/test_response_cache.py
+import asyncio
+
+from context_manager import ContextManager
+from response_cache import ResponseCache, SQLiteResponseStore
+
+JOBS = [{"job_id": 1, "title": "Engineer", "company": "Acme", "location": "Berlin", "description": "Build services."}]
+
+def user(user_id):
+    return {"user_id": user_id, "skills": ["python"], "preferences": f"backend work for {user_id}"}
+
+def test_repeated_request_is_served_from_the_cache(stub_client):
+    manager = ContextManager("test", client=stub_client, cache=ResponseCache(ttl=3600, max_entries=10))
+
+    async def scenario():
+        first = await manager.get_personalized_recommendations(user("u1"), JOBS)
+        second = await manager.get_personalized_recommendations(user("u1"), JOBS)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert second["claude_analysis"] == first["claude_analysis"]
+    assert len(stub_client.messages.requests) == 1
+    assert second["usage"] is None
+    assert manager.cache.stats()["hits"] == 1
+
+def test_invalidating_a_user_keeps_other_users_cached(stub_client):
+    manager = ContextManager("test", client=stub_client, cache=ResponseCache(ttl=3600, max_entries=10))
+
+    async def scenario():
+        for user_id in ("u1", "u2"):
+            await manager.get_personalized_recommendations(user(user_id), JOBS)
+        await manager.invalidate_user("u1")
+        for user_id in ("u1", "u2"):
+            await manager.get_personalized_recommendations(user(user_id), JOBS)
+        await manager.invalidate_all()
+        await manager.get_personalized_recommendations(user("u2"), JOBS)
+
+    asyncio.run(scenario())
+    # u1 and u2, then u1 again after its invalidation, then u2 after the full clear
+    assert len(stub_client.messages.requests) == 4
+    assert manager.cache.stats()["invalidations"] == 2
+
+def test_disk_tier_serves_and_invalidates_after_a_restart(tmp_path):
+    cache = ResponseCache(ttl=3600, max_entries=10, store=SQLiteResponseStore(str(tmp_path), 10))
+    cache.put("k1", "analysis one", "u1")
+    cache.put("k2", "analysis two", "u2")
+
+    restarted = ResponseCache(ttl=3600, max_entries=10, store=SQLiteResponseStore(str(tmp_path), 10))
+    assert restarted.get("k1") == "analysis one"
+    assert restarted.stats()["store_hits"] == 1
+    restarted.invalidate_user("u2")
+    assert restarted.get("k2") is None
+    assert restarted.store.get("k1") is not None
+
+def test_expired_and_evicted_entries_miss():
+    cache = ResponseCache(ttl=3600, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.upper())
+    assert cache.get("a") is None and cache.get("c") == "C"
+    assert cache.stats()["evictions"] == 1
+
+    cache.ttl = -1
+    assert cache.get("c") is None
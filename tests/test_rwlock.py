@@ -0,0 +1,51 @@
+# tests/test_rwlock.py
+import threading
+import time
+
+from rwlock import ReadWriteLock
+
+def run(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+def test_readers_share_the_lock():
+    lock = ReadWriteLock()
+    barrier = threading.Barrier(3, timeout=5)
+
+    def reader():
+        with lock.read():
+            barrier.wait()  # breaks unless all three readers are inside together
+
+    threads = [run(reader) for _ in range(3)]
+    for thread in threads:
+        thread.join(5)
+    assert not barrier.broken
+
+def test_writer_excludes_readers_and_is_preferred():
+    lock = ReadWriteLock()
+    events = []
+    lock.acquire_read()
+    writer = run(lambda: (lock.acquire_write(), events.append("write"), lock.release_write()))
+    time.sleep(0.05)
+    late_reader = run(lambda: (lock.acquire_read(), events.append("read"), lock.release_read()))
+    time.sleep(0.05)
+    assert events == []  # the writer waits for the first reader, the late reader waits for the writer
+    lock.release_read()
+    writer.join(5)
+    late_reader.join(5)
+    assert events == ["write", "read"]
+
+def test_reentrant_within_a_thread():
+    lock = ReadWriteLock()
+    with lock.read():
+        with lock.read():
+            pass
+    with lock.write():
+        with lock.write():
+            with lock.read():
+                pass
+    # Fully released: another thread can write
+    writer = run(lambda: lock.write().__enter__())
+    writer.join(5)
+    assert not writer.is_alive()
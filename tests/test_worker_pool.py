@@ -0,0 +1,38 @@
+# tests/test_worker_pool.py
+import asyncio
+import threading
+
+import pytest
+
+from worker_pool import PoolSaturatedError, WorkerPool
+
+def test_calls_run_in_parallel():
+    pool = WorkerPool(2, 0)
+    barrier = threading.Barrier(2, timeout=5)
+
+    async def scenario():
+        return await asyncio.gather(pool.run(barrier.wait), pool.run(barrier.wait))
+
+    try:
+        assert sorted(asyncio.run(scenario())) == [0, 1]
+    finally:
+        pool.shutdown()
+    assert not barrier.broken
+
+def test_full_pool_rejects_new_work():
+    pool = WorkerPool(1, 1)
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.ensure_future(pool.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(PoolSaturatedError):
+            await pool.run(release.wait, 5)
+        release.set()
+        await asyncio.gather(*running)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert pool.stats()["rejected"] == 1 and pool.stats()["completed"] == 2
@@ -0,0 +1,67 @@
+# worker_pool.py
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class PoolSaturatedError(Exception):
+    """Raised when a WorkerPool's queue is full and new work is turned away"""
+
+class WorkerPool:
+    """
+    Bounded thread pool for CPU-bound work called from async handlers
+
+    BERT forward passes and FAISS searches release the GIL inside torch and
+    FAISS, so a small thread pool runs them in parallel without blocking
+    the event loop; JobIndex searches only share its read lock, so they
+    overlap too and queue only behind an index update. At most `workers` calls run at once and at most
+    `max_queue` more wait for a thread; beyond that `run` raises
+    PoolSaturatedError straight away so the server can shed load instead of
+    letting latency grow without bound.
+    """
+
+    def __init__(self, workers, max_queue, name="worker"):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rejected = 0
+        self.completed = 0
+        self._in_flight = 0  # Only touched from the event loop thread
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run `func(*args, **kwargs)` on the pool and return its result
+
+        Raises:
+            PoolSaturatedError: If `workers + max_queue` calls are already in flight
+        """
+        if self._in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PoolSaturatedError(f"{self._in_flight} tasks in flight, try again later")
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # Carry the caller's context over so per-request stage timings reach the thread
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor, functools.partial(context.run, func, *args, **kwargs))
+        finally:
+            self._in_flight -= 1
+            self.completed += 1
+
+    def stats(self):
+        """Return occupancy and rejection counters"""
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self):
+        """Stop accepting work and wait for running calls to finish"""
+        self._executor.shutdown(wait=True)